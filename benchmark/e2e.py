@@ -0,0 +1,72 @@
+"""
+Benchmarks OneBotClient end to end against the local OneBot server, including websocket
+framing, JSON encoding and correlation of action responses.
+
+    > python benchmark/e2e.py --count 5000 --rate 0 --latency 0.005 --failure-rate 0.01
+"""
+
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import statistics
+from pathlib import Path
+
+from shirasu import AddonPool, OneBotClient, logger
+from shirasu.server import OneBotServer
+
+
+async def run(count: int, rate: float, latency: float, failure_rate: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        async with OneBotServer(latency=latency, failure_rate=failure_rate, seed=1883) as server:
+            (config := Path(tmp) / 'shirasu.yml').write_text(
+                f'ws: {server.url}\nwatch_config: false\nstorage: ":memory:"\naction_timeout: 10'
+            )
+            client = asyncio.create_task(OneBotClient.listen(AddonPool.from_modules('shirasu.addons.echo'), config))
+            await asyncio.wait_for(server.wait_connected(), 5)
+
+            loop = asyncio.get_running_loop()
+            sent: dict[str, float] = {}
+            latencies: list[float] = []
+
+            async def collect() -> None:
+                while len(latencies) < count:
+                    action = await server.actions.get()
+                    text = action['message']['data']['text']
+                    latencies.append(loop.time() - sent[text])
+
+            collector = asyncio.create_task(collect())
+            begin = loop.time()
+            for i in range(count):
+                if rate and (delay := begin + i / rate - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+                sent[str(i)] = loop.time()
+                await server.post_message(f'/echo {i}')
+
+            await asyncio.wait_for(collector, 60)
+            duration = loop.time() - begin
+
+            client.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await client
+
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    print(f'{count} round trips in {duration:.3f}s, {count / duration:.1f}/s, '
+          f'latency p50 {quantiles[49] * 1000:.2f}ms, p90 {quantiles[89] * 1000:.2f}ms, '
+          f'p99 {quantiles[98] * 1000:.2f}ms, max {max(latencies) * 1000:.2f}ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=2000, help='the count of messages')
+    parser.add_argument('--rate', type=float, default=0., help='the messages per second, or 0 for the maximum')
+    parser.add_argument('--latency', type=float, default=0., help='the latency in seconds of answering actions')
+    parser.add_argument('--failure-rate', type=float, default=0., help='the probability of failed actions')
+    args = parser.parse_args()
+
+    logger.remove()
+    asyncio.run(run(args.count, args.rate, args.latency, args.failure_rate))
+
+
+if __name__ == '__main__':
+    main()
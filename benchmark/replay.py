@@ -0,0 +1,75 @@
+"""
+Replays recorded frames through the addon pipeline, and reports the throughput and latency.
+
+Record frames by setting `record` in `shirasu.yml`, or generate synthetic ones:
+
+    > python benchmark/replay.py frames.log --generate 10000 --rate 1000
+    > python benchmark/replay.py frames.log --speed 0 --modules shirasu.addons.echo shirasu.addons.square
+"""
+
+import time
+import ujson
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+from shirasu import AddonPool, MockClient, logger
+from shirasu.record import FrameRecorder, replay
+
+
+MESSAGES = ['/echo hello', '/square 3', '/help', 'hello world', '[CQ:at,qq=1883] hi', '/manage disable echo']
+
+
+def generate(path: Path, count: int, rate: float, compress: bool) -> None:
+    rng = random.Random(1883)
+    recorder = FrameRecorder(path, compress=compress)
+    now = time.time()
+    for i in range(count):
+        message_type = rng.choice(['private', 'group'])
+        recorder.write(ujson.dumps({
+            'time': int(now),
+            'self_id': 1883,
+            'post_type': 'message',
+            'message_type': message_type,
+            'sub_type': 'normal',
+            'message_id': i,
+            'user_id': rng.randrange(10000, 10100),
+            'group_id': rng.randrange(20000, 20010) if message_type == 'group' else None,
+            'raw_message': rng.choice(MESSAGES),
+            'sender': {'user_id': 0, 'nickname': 'bench'},
+        }), now + i / rate)
+    recorder.close()
+
+
+async def run(path: Path, modules: list[str], speed: float) -> None:
+    client = MockClient(AddonPool.from_modules(*modules))
+    report = await replay(client, path, speed=speed)
+    print(report)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', type=Path, help='the path to the log')
+    parser.add_argument('--generate', type=int, metavar='COUNT', help='generate a synthetic log instead of replaying')
+    parser.add_argument('--rate', type=float, default=1000., help='the events per second of the generated log')
+    parser.add_argument('--compress', action='store_true', help='compress the generated log')
+    parser.add_argument('--speed', type=float, default=1., help='the replay speed, or 0 for the maximum speed')
+    parser.add_argument('--modules', nargs='+', default=[
+        'shirasu.addons.echo',
+        'shirasu.addons.square',
+        'shirasu.addons.help',
+        'shirasu.addons.reject_tome',
+    ], help='the addon modules to load')
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.log, args.generate, args.rate, args.compress)
+        return
+
+    logger.remove()
+    asyncio.run(run(args.log, args.modules, args.speed))
+
+
+if __name__ == '__main__':
+    main()
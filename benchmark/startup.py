@@ -0,0 +1,113 @@
+"""
+Measures the startup time of loading addons eagerly and lazily.
+
+It generates synthetic addon modules in a temporary directory, and each run happens
+in a fresh interpreter without bytecode caches, so the numbers are reproducible.
+
+    > python benchmark/startup.py --addons 200 --repeat 5
+"""
+
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+
+ADDON_TEMPLATE = '''
+from shirasu import Addon, Client, command
+
+addon_{i} = Addon(name='addon_{i}', usage='/cmd{i}', description='Synthetic addon {i}.')
+
+{body}
+
+@addon_{i}.receive(command('cmd{i}'))
+async def handle(client: Client) -> None:
+    await client.send('{i}')
+'''
+
+# Emulates the heavy imports and definitions in real addon modules.
+BODY_TEMPLATE = '''
+def helper_{j}(x: int) -> int:
+    return sum(i * {j} for i in range(x) if i % 3 == 0)
+'''
+
+MANIFEST_TEMPLATE = '''
+- module: {module}
+  name: addon_{i}
+  usage: /cmd{i}
+  description: Synthetic addon {i}.
+  commands: [cmd{i}]
+'''
+
+EAGER = '''
+import time
+begin = time.perf_counter()
+from shirasu import AddonPool
+AddonPool.from_modules(*{modules!r})
+print(time.perf_counter() - begin)
+'''
+
+LAZY = '''
+import time
+begin = time.perf_counter()
+from shirasu import AddonPool
+AddonPool.from_manifest({manifest!r})
+print(time.perf_counter() - begin)
+'''
+
+
+def generate(root: Path, count: int, size: int) -> tuple[list[str], Path]:
+    package = root / 'bench_addons'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+
+    body = ''.join(BODY_TEMPLATE.format(j=j) for j in range(size))
+    modules = []
+    for i in range(count):
+        (package / f'addon_{i}.py').write_text(ADDON_TEMPLATE.format(i=i, body=body))
+        modules.append(f'bench_addons.addon_{i}')
+
+    manifest = root / 'manifest.yml'
+    manifest.write_text(''.join(MANIFEST_TEMPLATE.format(module=m, i=i) for i, m in enumerate(modules)))
+    return modules, manifest
+
+
+def measure(code: str, cwd: Path, repeat: int) -> list[float]:
+    results = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-B', '-c', code],
+            cwd=cwd,
+            check=True,
+            capture_output=True,
+            text=True,
+            env={'PYTHONPATH': f'{cwd}:{Path(__file__).parent.parent}', 'PYTHONDONTWRITEBYTECODE': '1'},
+        )
+        # The logger writes to stdout as well, so the elapsed time is the last line.
+        results.append(float(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--addons', type=int, default=200, help='the count of synthetic addons')
+    parser.add_argument('--size', type=int, default=50, help='the count of helper functions in each addon')
+    parser.add_argument('--repeat', type=int, default=5, help='the count of runs for each mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        modules, manifest = generate(root, args.addons, args.size)
+        for mode, code in (
+            ('eager', EAGER.format(modules=modules)),
+            ('lazy', LAZY.format(manifest=str(manifest))),
+        ):
+            results = measure(code, root, args.repeat)
+            print(f'{mode:<6} median {statistics.median(results) * 1000:8.1f} ms, '
+                  f'min {min(results) * 1000:8.1f} ms, max {max(results) * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
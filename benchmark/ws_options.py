@@ -0,0 +1,77 @@
+"""
+Compares the bandwidth and CPU time of websocket options by sending recorded frames through
+a local websocket connection, with compression turned on and off.
+
+Record frames by setting `record` in `shirasu.yml`, or generate synthetic ones by `replay.py`:
+
+    > python benchmark/replay.py frames.log --generate 10000
+    > python benchmark/ws_options.py frames.log --max-size 16777216
+"""
+
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any
+from websockets.legacy.client import connect
+from websockets.legacy.server import serve, WebSocketServerProtocol
+
+from shirasu.config import GlobalConfig
+from shirasu.record import read_frames
+
+
+async def run(frames: list[str], config: GlobalConfig) -> tuple[int, float, float]:
+    options = config.ws_options
+    sent = 0
+
+    async def handle(ws: WebSocketServerProtocol, _: str) -> None:
+        write = ws.transport.write
+
+        def count(data: Any) -> None:
+            nonlocal sent
+            sent += len(data)
+            write(data)
+
+        # Count the bytes on the wire, after compression and framing.
+        ws.transport.write = count  # type: ignore[method-assign]
+        for frame in frames:
+            await ws.send(frame)
+        await ws.close()
+
+    async with serve(handle, '127.0.0.1', 0, **options) as server:
+        port = next(iter(server.sockets)).getsockname()[1]
+        begin, cpu = time.perf_counter(), time.process_time()
+        async with connect(f'ws://127.0.0.1:{port}', **options) as ws:
+            async for _ in ws:
+                pass
+        return sent, time.perf_counter() - begin, time.process_time() - cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', type=Path, help='the path to the recorded log')
+    parser.add_argument('--max-size', type=int, default=2 ** 20, help='the max size of frames')
+    parser.add_argument('--limit', type=int, default=2 ** 16, help='the read and write buffer limits')
+    args = parser.parse_args()
+
+    frames = [frame.decode('utf8') for _, frame in read_frames(args.log)]
+    if too_large := sum(len(frame.encode('utf8')) > args.max_size for frame in frames):
+        print(f'{too_large} frames are larger than the max size, which would close the connection.')
+        frames = [frame for frame in frames if len(frame.encode('utf8')) <= args.max_size]
+
+    raw = sum(len(frame.encode('utf8')) for frame in frames)
+    print(f'{len(frames)} frames, {raw / 1024:.1f} KiB of payload')
+    for compression in (False, True):
+        config = GlobalConfig(
+            ws_compression=compression,
+            ws_max_size=args.max_size,
+            ws_read_limit=args.limit,
+            ws_write_limit=args.limit,
+        )
+        sent, duration, cpu = asyncio.run(run(frames, config))
+        print(f'compression {"on " if compression else "off"}: {sent / 1024:.1f} KiB on the wire '
+              f'({sent / raw:.1%}), {duration:.3f}s, CPU {cpu:.3f}s, {len(frames) / duration:.1f} frames/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+from typing import TYPE_CHECKING, Any
+
 from .logger import logger as logger
 from .event import (
     Event as Event,
@@ -8,13 +10,19 @@ from .event import (
 )
 from .addon import (
     Addon as Addon,
+    LazyAddon as LazyAddon,
     AddonPool as AddonPool,
     Rule as Rule,
     lifecycle as lifecycle,
     superuser as superuser,
     command as command,
     notice as notice,
+    request as request,
+    event_type as event_type,
     regex as regex,
+    keyword as keyword,
+    rate_limit as rate_limit,
+    cooldown as cooldown,
     tome as tome,
     meta as meta,
 )
@@ -30,17 +38,33 @@ from .message import (
     json as json,
 )
 
+from .scheduler import (
+    Scheduler as Scheduler,
+    every as every,
+    cron as cron,
+)
 from .client import (
     Client as Client,
-    OneBotClient as OneBotClient,
     MockClient as MockClient,
 )
 
+if TYPE_CHECKING:
+    from .client import OneBotClient as OneBotClient, OneBotSupervisor as OneBotSupervisor
+
+
+def __getattr__(name: str) -> Any:
+    # See shirasu.client, OneBotClient is imported lazily to speed up the startup.
+    if name in ('OneBotClient', 'OneBotSupervisor'):
+        from . import client
+        return getattr(client, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 __all__ = [
     'logger',
     'Client',
     'OneBotClient',
+    'OneBotSupervisor',
     'MockClient',
     'Event',
     'MessageEvent',
@@ -48,15 +72,24 @@ __all__ = [
     'NoticeEvent',
     'MetaEvent',
     'Addon',
+    'LazyAddon',
     'AddonPool',
     'Rule',
     'lifecycle',
     'superuser',
     'command',
     'notice',
+    'request',
+    'event_type',
     'regex',
+    'keyword',
+    'rate_limit',
+    'cooldown',
     'tome',
     'meta',
+    'Scheduler',
+    'every',
+    'cron',
     'MessageSegment',
     'Message',
     'text',
@@ -1,12 +1,19 @@
 from .pool import AddonPool as AddonPool
 from .addon import Addon as Addon
+from .state import MatchState as MatchState
+from .lazy import LazyAddon as LazyAddon, AddonManifest as AddonManifest
 from .rule import (
     Rule as Rule,
     lifecycle as lifecycle,
     superuser as superuser,
     command as command,
     notice as notice,
+    request as request,
+    event_type as event_type,
     regex as regex,
+    keyword as keyword,
+    rate_limit as rate_limit,
+    cooldown as cooldown,
     tome as tome,
     meta as meta,
 )
@@ -20,11 +27,19 @@ from .exceptions import (
 __all__ = [
     'AddonPool',
     'Addon',
+    'MatchState',
+    'LazyAddon',
+    'AddonManifest',
     'Rule',
     'superuser',
     'command',
     'notice',
+    'request',
+    'event_type',
     'regex',
+    'keyword',
+    'rate_limit',
+    'cooldown',
     'tome',
     'meta',
     'lifecycle',
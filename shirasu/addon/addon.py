@@ -1,10 +1,24 @@
+import re
+from functools import cache
+from contextvars import ContextVar
 from typing import Callable, Awaitable, Any, Type
 from pydantic import BaseModel
 
 from .rule import Rule
+from .state import MatchState, current_state
 from ..di import di
 from ..logger import logger
 from ..config import GlobalConfig
+from ..scheduler import Trigger
+
+
+@cache
+def _frozen_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    # Configurations are shared by all events, so they should not be modified by receivers.
+    class Config:
+        allow_mutation = False
+
+    return type(model.__name__, (model,), {'Config': Config, '__module__': model.__module__})
 
 
 class Addon:
@@ -13,7 +27,16 @@ class Addon:
     Note: functions decorated by `receive` will also be injected.
     """
 
-    def __init__(self, *, name: str, usage: str, description: str, config_model: Type[BaseModel] = BaseModel) -> None:
+    def __init__(
+            self,
+            *,
+            name: str,
+            usage: str,
+            description: str,
+            config_model: Type[BaseModel] = BaseModel,
+            priority: int = 1,
+            block: bool = False,
+    ) -> None:
         """
         Initializes an addon. If the config model is absent, it will use `pydantic.BaseModel` by
         default, from which you cannot get any custom properties.
@@ -21,13 +44,20 @@ class Addon:
         :param usage: the usage of the addon.
         :param description: the description of the addon.
         :param config_model: optional, the pydantic model of the addon's configurations.
+        :param priority: optional, addons with smaller priority are matched earlier.
+        :param block: optional, whether to skip addons with greater priority after this addon received the event.
         """
 
         self._name = name
         self._usage = usage
         self._config_model = config_model
         self._description = description
+        self._priority = priority
+        self._block = block
         self._rule_receiver: tuple[Rule, Callable[[], Awaitable[None]]] | None = None
+        self._jobs: dict[str, tuple[Trigger, float, Callable[[], Awaitable[None]]]] = {}
+        self._config: BaseModel | None = None
+        self._config_source: GlobalConfig | None = None
 
     @property
     def name(self) -> str:
@@ -41,6 +71,62 @@ class Addon:
     def description(self) -> str:
         return self._description
 
+    @property
+    def priority(self) -> int:
+        return self._priority
+
+    @property
+    def block(self) -> bool:
+        return self._block
+
+    @property
+    def rule(self) -> Rule | None:
+        return self._rule_receiver[0] if self._rule_receiver else None
+
+    @property
+    def config_model(self) -> Type[BaseModel]:
+        return self._config_model
+
+    @property
+    def jobs(self) -> dict[str, tuple[Trigger, float]]:
+        """
+        The triggers and jitters of jobs by their names.
+        """
+
+        return {name: (trigger, jitter) for name, (trigger, jitter, _) in self._jobs.items()}
+
+    def validate_config(self, global_config: GlobalConfig) -> BaseModel | None:
+        """
+        Validates the configurations of this addon without caching them.
+        :param global_config: the global configurations.
+        :return: the configurations, or None if they are unknown yet.
+        :raise ValidationError: the configurations are invalid.
+        """
+
+        return _frozen_model(self._config_model).parse_obj(global_config.addons.get(self._name, {}))
+
+    def reload_config(self, global_config: GlobalConfig, config: BaseModel | None = None) -> None:
+        """
+        Validates and caches the configurations of this addon, which are immutable.
+        It is called when the addon is loaded and when the global config is reloaded.
+        :param global_config: the global configurations.
+        :param config: optional, the configurations validated by `validate_config` already.
+        """
+
+        self._config = config if config is not None else self.validate_config(global_config)
+        self._config_source = global_config
+
+    def get_config(self, global_config: GlobalConfig) -> BaseModel:
+        """
+        Gets the cached configurations, which are validated again only if the global config is replaced.
+        :param global_config: the global configurations.
+        :return: the configurations of this addon.
+        """
+
+        if self._config is None or self._config_source is not global_config:
+            self.reload_config(global_config)
+        return self._config  # type: ignore[return-value]
+
     def receive(self, rule: Rule) -> Callable[[Callable[..., Awaitable[None]]], Callable[[], Awaitable[None]]]:
         """
         Defines a receiver with itself injected. It detects whether your function is async
@@ -59,36 +145,108 @@ class Addon:
 
         return wrapper
 
-    def _provide_config(self) -> None:
-        async def provide(global_config: GlobalConfig) -> Any:
-            return self._config_model.parse_obj(global_config.addons.get(self._name, {}))
-        di.provide('config', provide, check_duplicate=False)
+    def schedule(
+            self,
+            trigger: Trigger,
+            *,
+            name: str | None = None,
+            jitter: float = 0.,
+    ) -> Callable[[Callable[..., Awaitable[None]]], Callable[[], Awaitable[None]]]:
+        """
+        Defines a job with itself injected, which is run by the scheduler while this addon is enabled.
+        :param trigger: the trigger, such as `every(60)` or `cron('0 8 * * *')`.
+        :param name: optional, the name of the job, or the name of the function by default.
+        :param jitter: optional, the max random delay in seconds of each run.
+        :return: injected job.
+        """
+
+        def wrapper(func: Any) -> Any:
+            job = di.inject(func)
+            self._jobs[name or func.__name__] = trigger, jitter, job
+            return job
 
-    async def do_match(self) -> bool:
+        return wrapper
+
+    async def do_job(self, name: str) -> None:
+        """
+        Runs the job. There is no event when jobs are running, so the event injected is None.
+        :param name: the name of the job.
+        """
+
+        _, _, job = self._jobs[name]
+        addon_token = current_addon.set(self)
+        state_token = current_state.set(MatchState())
+        try:
+            await job()
+        finally:
+            current_state.reset(state_token)
+            current_addon.reset(addon_token)
+
+    async def do_match(self) -> MatchState | None:
         """
         Applies the matcher to match whether this addon is matched.
         It will log a warning message if the matcher is absent.
-        :return: whether it is matched.
+        :return: the state of matching, which should be passed to `do_receive`, or None if it is not matched.
         """
 
         if not self._rule_receiver:
             logger.warning(f'Attempted to match addon {self._name} when the rule is absent.')
-            return False
+            return None
 
-        self._provide_config()
         rule, _ = self._rule_receiver
-        return await rule.match()
-
-    async def do_receive(self) -> None:
+        state = MatchState()
+        addon_token = current_addon.set(self)
+        state_token = current_state.set(state)
+        try:
+            return state if await rule.match() and state.commit() else None
+        finally:
+            current_state.reset(state_token)
+            current_addon.reset(addon_token)
+
+    async def do_receive(self, state: MatchState | None = None) -> None:
         """
         Applies the receiver to receive events.
         It will log a warning message if the receiver is absent.
+        :param state: optional, the state returned by `do_match`.
         """
 
         if not self._rule_receiver:
             logger.warning(f'Attempted to receive for addon {self._name} when the receiver is absent.')
             return
 
-        self._provide_config()
         _, receiver = self._rule_receiver
-        await receiver()
+        addon_token = current_addon.set(self)
+        state_token = current_state.set(state or MatchState())
+        try:
+            await receiver()
+        finally:
+            current_state.reset(state_token)
+            current_addon.reset(addon_token)
+
+
+current_addon: ContextVar[Addon] = ContextVar('current_addon')
+"""
+The addon which is matching or receiving the current event.
+"""
+
+
+async def _provide_config(global_config: GlobalConfig) -> Any:
+    return current_addon.get().get_config(global_config)
+
+
+async def _provide_arg() -> str:
+    return current_state.get().arg
+
+
+async def _provide_args() -> list[str]:
+    return current_state.get().args
+
+
+async def _provide_match() -> re.Match[str] | None:
+    return current_state.get().match
+
+
+di.provide('config', _provide_config, check_duplicate=False)
+di.provide('arg', _provide_arg, check_duplicate=False)
+di.provide('args', _provide_args, check_duplicate=False)
+di.provide('match', _provide_match, check_duplicate=False)
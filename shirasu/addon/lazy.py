@@ -0,0 +1,147 @@
+import importlib
+from functools import reduce
+from operator import or_
+from pathlib import Path
+from pydantic import BaseModel
+
+from .addon import Addon
+from .state import MatchState, current_state
+from ..config import GlobalConfig
+from ..scheduler import Trigger
+from .rule import Rule, command
+from .exceptions import LoadAddonError
+from ..logger import logger
+
+
+class AddonManifest(BaseModel):
+    """
+    The manifest of an addon, which describes it without importing its module.
+    """
+
+    module: str
+    name: str
+    usage: str = ''
+    description: str = ''
+    priority: int = 1
+    block: bool = False
+    commands: list[str] = []
+
+
+class LazyAddon(Addon):
+    """
+    The addon whose module is imported when it is matched for the first time.
+    If the commands are given in the manifest, the module will not be imported
+    until one of the commands is received. If the module fails to load, the error
+    is logged once, and the addon never matches again.
+    """
+
+    def __init__(self, manifest: AddonManifest) -> None:
+        """
+        Initializes the lazy addon.
+        :param manifest: the manifest of the addon.
+        """
+
+        super().__init__(
+            name=manifest.name,
+            usage=manifest.usage,
+            description=manifest.description,
+            priority=manifest.priority,
+            block=manifest.block,
+        )
+        self._manifest = manifest
+        self._module = manifest.module
+        self._addon: Addon | None = None
+        self._failed = False
+        self._prefilter: Rule | None = reduce(or_, map(command, manifest.commands)) if manifest.commands else None
+
+    @property
+    def manifest(self) -> AddonManifest:
+        return self._manifest
+
+    @property
+    def module(self) -> str:
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._addon is not None
+
+    def load(self) -> Addon:
+        """
+        Imports the module and gets the real addon, which has the same name with this one.
+        :return: the real addon.
+        """
+
+        if self._addon:
+            return self._addon
+
+        try:
+            module = importlib.import_module(self._module)
+        except ImportError as e:
+            raise LoadAddonError(f'failed to load addons in module {self._module}') from e
+
+        for p in module.__dict__.values():
+            if isinstance(p, Addon) and not isinstance(p, LazyAddon) and p.name == self.name:
+                self._addon = p
+                logger.success(f'Imported lazy addon {self.name}.')
+                return p
+
+        raise LoadAddonError(f'no addon named {self.name} in module {self._module}')
+
+    def validate_config(self, global_config: GlobalConfig) -> BaseModel | None:
+        # The config model is unknown until the module is imported.
+        return self._addon.validate_config(global_config) if self._addon else None
+
+    def reload_config(self, global_config: GlobalConfig, config: BaseModel | None = None) -> None:
+        if self._addon:
+            self._addon.reload_config(global_config, config)
+
+    def get_config(self, global_config: GlobalConfig) -> BaseModel:
+        return self.load().get_config(global_config)
+
+    @property
+    def jobs(self) -> dict[str, tuple[Trigger, float]]:
+        # Jobs are unknown until the module is imported.
+        return self._addon.jobs if self._addon else {}
+
+    async def do_job(self, name: str) -> None:
+        await self.load().do_job(name)
+
+    def _try_load(self) -> Addon | None:
+        if self._failed:
+            return None
+        try:
+            return self.load()
+        except LoadAddonError:
+            logger.exception(f'Failed to load lazy addon {self.name}, it is skipped from now on.')
+            self._failed = True
+            return None
+
+    async def do_match(self) -> MatchState | None:
+        if self._failed:
+            return None
+        if self._prefilter:
+            token = current_state.set(MatchState())
+            try:
+                if not await self._prefilter.match():
+                    return None
+            finally:
+                current_state.reset(token)
+        if not (addon := self._try_load()):
+            return None
+        return await addon.do_match()
+
+    async def do_receive(self, state: MatchState | None = None) -> None:
+        await self.load().do_receive(state)
+
+
+def load_manifest(path: str | Path) -> list[AddonManifest]:
+    """
+    Loads the manifests of addons from a yaml file, which is a list of manifests.
+    :param path: the path to the manifest file.
+    :return: the manifests.
+    """
+
+    import yaml
+    data = yaml.safe_load(Path(path).read_text('utf8')) or []
+    return [AddonManifest.parse_obj(item) for item in data]
@@ -1,26 +1,58 @@
+import sys
+import asyncio
 import importlib
-from typing import Iterator
+from pathlib import Path
+from types import ModuleType
+from typing import Iterable, Iterator
+from pydantic import BaseModel, ValidationError
 
 from .addon import Addon
+from .lazy import LazyAddon, load_manifest
 from ..logger import logger
+from ..util import FileWatcher
+from ..config import GlobalConfig
+from ..pattern import PatternIndex
+from ..storage import Storage
 from .exceptions import (
+    AddonError,
     LoadAddonError,
     DuplicateAddonError,
 )
 
 
+def _restore_module(module_name: str, module: ModuleType | None) -> None:
+    # The rejected module is not kept, so it is imported again next time.
+    if module is None:
+        sys.modules.pop(module_name, None)
+    else:
+        sys.modules[module_name] = module
+
+
 class AddonPool:
     """
     The addon pool to load and get addons.
+
+    Addons can be loaded, reloaded and unloaded at runtime. The pool never modifies
+    its indexes in place but replaces them, so the events in progress, which have got
+    the addons before, will finish on the old version.
     """
 
+    _NAMESPACE = 'shirasu.pool'
+
     def __init__(self) -> None:
         """
         Initializes the addon pool.
         """
 
         self._addons: dict[str, Addon] = {}
+        self._modules: dict[str, tuple[str, ...]] = {}
         self._disabled_addons: set[str] = set()
+        # Whether addons are disabled in groups or for users, which overrides the global one.
+        self._scoped: dict[tuple[str, int], dict[str, bool]] = {}
+        # The settings changed since they are saved, by their scopes, where None is global, and addons.
+        self._dirty: set[tuple[tuple[str, int] | None, str]] = set()
+        self._global_config: GlobalConfig | None = None
+        self._pattern_index = PatternIndex()
 
     @classmethod
     def from_modules(cls, *modules: str) -> 'AddonPool':
@@ -35,6 +67,62 @@ class AddonPool:
             pool.load_module(module)
         return pool
 
+    @classmethod
+    def from_manifest(cls, path: str | Path) -> 'AddonPool':
+        """
+        Creates a pool from the manifest file, whose addon modules are imported lazily.
+        :param path: the path to the manifest file.
+        :return: the pool.
+        """
+
+        return cls().load_manifest(path)
+
+    def _swap(self, addons: Iterable[Addon], modules: dict[str, tuple[str, ...]]) -> None:
+        # Keep addons sorted by priority, so that it is unnecessary to sort them for each event.
+        # The sort is stable, which means addons with the same priority are kept in loading order.
+        self._addons = {addon.name: addon for addon in sorted(addons, key=lambda a: a.priority)}
+        self._modules = modules
+        self._disabled_addons = self._disabled_addons & self._addons.keys()
+
+        rules = [rule for addon in self._addons.values() if (rule := addon.rule)]
+        self._pattern_index = PatternIndex(
+            (pattern for rule in rules for pattern in rule.patterns),
+            (keyword for rule in rules for keyword in rule.keywords),
+        )
+
+    def _configure(self, addons: Iterable[Addon], global_config: GlobalConfig | None = None) -> None:
+        if not (global_config := global_config or self._global_config):
+            return
+
+        # All configurations are validated before any of them is replaced, so they are never mixed.
+        configs: list[tuple[Addon, BaseModel | None]] = []
+        for addon in addons:
+            try:
+                configs.append((addon, addon.validate_config(global_config)))
+            except ValidationError as e:
+                raise LoadAddonError(f'invalid configurations for addon {addon.name}') from e
+        for addon, config in configs:
+            addon.reload_config(global_config, config)
+
+    def reload_config(self, global_config: GlobalConfig) -> None:
+        """
+        Validates and caches the configurations of all addons, including the ones loaded later.
+        It should be called when the global config is loaded or reloaded. If the configurations
+        of any addon are invalid, nothing is replaced.
+        :param global_config: the global configurations.
+        :raise LoadAddonError: the configurations of an addon are invalid.
+        """
+
+        self._configure(self._addons.values(), global_config)
+        self._global_config = global_config
+
+    def _check_duplicate(self, addons: Iterable[Addon], ignored: Iterable[str] = ()) -> None:
+        names = self._addons.keys() - set(ignored)
+        for addon in addons:
+            if addon.name in names:
+                raise DuplicateAddonError(addon.name)
+            names.add(addon.name)
+
     def load(self, addon: Addon) -> 'AddonPool':
         """
         Loads addon.
@@ -42,13 +130,29 @@ class AddonPool:
         :return: the pool itself to chain function calls.
         """
 
-        if addon.name in self._addons:
-            raise DuplicateAddonError(addon.name)
-
-        self._addons[addon.name] = addon
+        self._check_duplicate([addon])
+        self._configure([addon])
+        self._swap([*self._addons.values(), addon], self._modules)
         logger.success(f'Loaded addon {addon.name}.')
         return self
 
+    @staticmethod
+    def _get_module_addons(module: ModuleType) -> list[Addon]:
+        if not (addons := [p for p in module.__dict__.values() if isinstance(p, Addon)]):
+            raise LoadAddonError(f'no addons in module {module.__name__}')
+        return addons
+
+    def _load_addons(self, module_name: str, addons: list[Addon], replaced: Iterable[str] = ()) -> None:
+        replaced = set(replaced)
+        self._check_duplicate(addons, replaced)
+        self._configure(addons)
+        self._swap(
+            [*(a for a in self._addons.values() if a.name not in replaced), *addons],
+            self._modules | {module_name: tuple(addon.name for addon in addons)},
+        )
+        for addon in addons:
+            logger.success(f'Loaded addon {addon.name}.')
+
     def load_module(self, module_name: str) -> 'AddonPool':
         """
         Loads addons from module.
@@ -56,20 +160,127 @@ class AddonPool:
         :return: the pool itself to chain function calls.
         """
 
+        old_module = sys.modules.get(module_name)
         try:
             module = importlib.import_module(module_name)
-        except ImportError as e:
+        except Exception as e:
+            _restore_module(module_name, old_module)
             raise LoadAddonError(f'failed to load addons in module {module_name}') from e
 
-        addons = [p for p in module.__dict__.values() if isinstance(p, Addon)]
-        if not addons:
-            raise LoadAddonError(f'no addons in module {module_name}')
+        try:
+            self._load_addons(module_name, self._get_module_addons(module))
+        except AddonError:
+            _restore_module(module_name, old_module)
+            raise
+        return self
 
-        for addon in addons:
-            self.load(addon)
+    def load_manifest(self, path: str | Path) -> 'AddonPool':
+        """
+        Loads addons from the manifest file without importing their modules.
+        :param path: the path to the manifest file.
+        :return: the pool itself to chain function calls.
+        """
+
+        manifests: dict[str, list[Addon]] = {}
+        for manifest in load_manifest(path):
+            manifests.setdefault(manifest.module, []).append(LazyAddon(manifest))
 
+        for module_name, addons in manifests.items():
+            self._load_addons(module_name, addons)
         return self
 
+    def reload_module(self, module_name: str) -> 'AddonPool':
+        """
+        Reloads addons from the module. If it fails, the old addons are kept.
+        Lazy addons will be imported again when they are matched next time.
+        :param module_name: the module name.
+        :return: the pool itself to chain function calls.
+        """
+
+        if (names := self._modules.get(module_name)) is None:
+            raise LoadAddonError(f'module {module_name} is not loaded')
+
+        lazy_addons = [addon for name in names if isinstance(addon := self._addons[name], LazyAddon)]
+        if len(lazy_addons) == len(names):
+            sys.modules.pop(module_name, None)
+            self._load_addons(module_name, [LazyAddon(addon.manifest) for addon in lazy_addons], names)
+            return self
+
+        # A new module object is imported, so handlers in progress keep the globals of the old one.
+        old_module = sys.modules.pop(module_name, None)
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            _restore_module(module_name, old_module)
+            raise LoadAddonError(f'failed to reload addons in module {module_name}') from e
+
+        try:
+            self._load_addons(module_name, self._get_module_addons(module), names)
+        except AddonError:
+            _restore_module(module_name, old_module)
+            raise
+        return self
+
+    def unload_module(self, module_name: str) -> 'AddonPool':
+        """
+        Unloads addons from the module, and the module will be imported again when it is loaded next time.
+        :param module_name: the module name.
+        :return: the pool itself to chain function calls.
+        """
+
+        if (names := self._modules.get(module_name)) is None:
+            raise LoadAddonError(f'module {module_name} is not loaded')
+
+        self._swap(
+            [a for a in self._addons.values() if a.name not in names],
+            {k: v for k, v in self._modules.items() if k != module_name},
+        )
+        sys.modules.pop(module_name, None)
+        for name in names:
+            logger.success(f'Unloaded addon {name}.')
+        return self
+
+    def get_addon_module(self, addon: Addon | str) -> str | None:
+        """
+        Gets the module name of given addon, or None if it is not loaded from modules.
+        :param addon: the addon.
+        :return: the module name.
+        """
+
+        if isinstance(addon, Addon):
+            addon = addon.name
+
+        return next((module for module, names in self._modules.items() if addon in names), None)
+
+    async def watch(self, interval: float = 1.) -> None:
+        """
+        Watches the files of loaded modules, and reloads them once they are modified.
+        It runs forever, so it should be run as a task.
+        :param interval: the interval in seconds to check the files.
+        """
+
+        watcher = FileWatcher()
+        while True:
+            files = {
+                Path(file): name
+                for name in self._modules
+                if (module := sys.modules.get(name)) and (file := getattr(module, '__file__', None))
+            }
+            for path in watcher.changed(files):
+                try:
+                    self.reload_module(files[path])
+                except AddonError as e:
+                    logger.error(f'Failed to reload module {files[path]}: {e.__cause__ or e}')
+            await asyncio.sleep(interval)
+
+    @property
+    def pattern_index(self) -> PatternIndex:
+        """
+        The index of regex patterns and keywords used by the rules of addons.
+        """
+
+        return self._pattern_index
+
     def has_addon(self, name: str) -> bool:
         """
         Gets whether given addon name is in the pool.
@@ -88,28 +299,90 @@ class AddonPool:
 
         return self._addons.get(name)
 
-    def set_addon_disabled(self, addon: Addon | str, disabled: bool) -> None:
+    def _scoped_settings(
+            self,
+            group_id: int | None,
+            user_id: int | None,
+    ) -> tuple[dict[str, bool] | None, dict[str, bool] | None]:
+        group = self._scoped.get(('group', group_id)) if group_id is not None else None
+        user = self._scoped.get(('user', user_id)) if user_id is not None else None
+        return group, user
+
+    @staticmethod
+    def _is_disabled(
+            name: str,
+            disabled: set[str],
+            group: dict[str, bool] | None,
+            user: dict[str, bool] | None,
+    ) -> bool:
+        if user and name in user:
+            return user[name]
+        if group and name in group:
+            return group[name]
+        return name in disabled
+
+    @staticmethod
+    def _scope(group_id: int | None, user_id: int | None) -> tuple[str, int] | None:
+        if group_id is not None and user_id is not None:
+            raise ValueError('the scope should be either a group or a user')
+        if group_id is not None:
+            return 'group', group_id
+        if user_id is not None:
+            return 'user', user_id
+        return None
+
+    def set_addon_disabled(
+            self,
+            addon: Addon | str,
+            disabled: bool | None,
+            *,
+            group_id: int | None = None,
+            user_id: int | None = None,
+    ) -> None:
         """
-        Sets whether the given addon is disabled.
+        Sets whether the given addon is disabled, globally, in the group or for the user. The setting
+        for the user goes first, then the one in the group, and the global one at last.
         :param addon: the addon to set.
-        :param disabled: whether to set the addon is disabled.
+        :param disabled: whether to set the addon is disabled, or None to remove the setting of the scope.
+        :param group_id: optional, the group.
+        :param user_id: optional, the user.
         """
 
         if isinstance(addon, Addon):
             addon = addon.name
 
-        if addon not in self._addons:
-            raise NameError(f'addon {addon} does not exist')
+        self._dirty.add((scope := self._scope(group_id, user_id), addon))
+        if scope is None:
+            if disabled:
+                self._disabled_addons.add(addon)
+            else:
+                self._disabled_addons.discard(addon)
+            return
 
-        if disabled:
-            self._disabled_addons.add(addon)
+        # Replace the settings of the scope, so that the events in progress are not affected.
+        settings = self._scoped.get(scope, {})
+        if disabled is None:
+            settings = {k: v for k, v in settings.items() if k != addon}
         else:
-            self._disabled_addons.discard(addon)
+            settings = settings | {addon: disabled}
 
-    def get_addon_disabled(self, addon: Addon | str) -> bool:
+        if settings:
+            self._scoped[scope] = settings
+        else:
+            self._scoped.pop(scope, None)
+
+    def get_addon_disabled(
+            self,
+            addon: Addon | str,
+            *,
+            group_id: int | None = None,
+            user_id: int | None = None,
+    ) -> bool:
         """
-        Gets whether the given addon is disabled.
+        Gets whether the given addon is disabled for the event in the group from the user.
         :param addon: the addon to get.
+        :param group_id: optional, the group.
+        :param user_id: optional, the user.
         :return: whether it is disabled.
         """
 
@@ -118,23 +391,77 @@ class AddonPool:
 
         if addon not in self._addons:
             raise NameError(f'addon {addon} does not exist')
+        return self._is_disabled(addon, self._disabled_addons, *self._scoped_settings(group_id, user_id))
+
+    async def load_enablement(self, storage: Storage) -> None:
+        """
+        Loads the settings of whether addons are disabled from the storage, which replace
+        the settings of groups and users, so that it also reloads settings saved by other processes.
+        :param storage: the storage.
+        """
 
-        return addon in self._disabled_addons
+        disabled = set(self._disabled_addons)
+        scoped: dict[tuple[str, int], dict[str, bool]] = {}
+        for key in await storage.keys(self._NAMESPACE):
+            value = await storage.get(self._NAMESPACE, key)
+            kind, _, rest = key.partition(':')
+            if kind == 'global':
+                if value:
+                    disabled.add(rest)
+                else:
+                    disabled.discard(rest)
+            else:
+                scope_id, _, addon = rest.partition(':')
+                scoped.setdefault((kind, int(scope_id)), {})[addon] = value
+        self._disabled_addons = disabled
+        self._scoped = scoped
+        self._dirty.clear()
+
+    async def save_enablement(self, storage: Storage) -> None:
+        """
+        Saves the settings changed since the last time to the storage. Each addon in each scope
+        has its own key, and only the changed ones are written, so that processes changing
+        settings at the same time do not overwrite each other.
+        :param storage: the storage.
+        """
+
+        dirty, self._dirty = self._dirty, set()
+        for scope, addon in dirty:
+            if scope is None:
+                # Enabling is saved as well, so that it is reloaded by other processes.
+                await storage.set(self._NAMESPACE, f'global:{addon}', addon in self._disabled_addons)
+            elif (disabled := self._scoped.get(scope, {}).get(addon)) is not None:
+                await storage.set(self._NAMESPACE, f'{scope[0]}:{scope[1]}:{addon}', disabled)
+            else:
+                await storage.delete(self._NAMESPACE, f'{scope[0]}:{scope[1]}:{addon}')
 
     def get_addons(self) -> Iterator[Addon]:
         """
-        Gets all addons.
+        Gets all addons, sorted by priority.
         :return: all addons.
         """
 
         yield from self._addons.values()
 
-    def get_enabled_addons(self) -> Iterator[Addon]:
+    def get_enabled_addons(self, *, group_id: int | None = None, user_id: int | None = None) -> Iterator[Addon]:
         """
-        Gets enabled addons.
+        Gets enabled addons for the event in the group from the user, sorted by priority.
+        :param group_id: optional, the group.
+        :param user_id: optional, the user.
         :return: the enabled addons.
         """
 
-        for addon in self._addons.values():
-            if not self.get_addon_disabled(addon):
+        # Hold the current index, so it is not affected by reloading.
+        addons = self._addons
+        disabled = self._disabled_addons
+        # The settings of the group and the user are looked up once for each event.
+        group, user = self._scoped_settings(group_id, user_id)
+        if not group and not user:
+            for addon in addons.values():
+                if addon.name not in disabled:
+                    yield addon
+            return
+
+        for addon in addons.values():
+            if not self._is_disabled(addon.name, disabled, group, user):
                 yield addon
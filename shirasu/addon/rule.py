@@ -1,9 +1,12 @@
 import re
-from typing import cast, Union, Callable, Awaitable
+from typing import cast, Literal, Union, Callable, Awaitable, Iterable
 
+from .state import current_state
 from ..di import di
-from ..event import Event, MessageEvent, NoticeEvent, MetaEvent
+from ..event import Event, MessageEvent, NoticeEvent, RequestEvent, MetaEvent, event_class
 from ..config import GlobalConfig
+from ..pattern import PatternIndex
+from ..util import TokenBuckets
 
 
 class Rule:
@@ -12,22 +15,41 @@ class Rule:
     Note: the handler will be injected automatically.
     """
 
-    def __init__(self, handler: Callable[..., Awaitable[bool]]):
+    def __init__(
+            self,
+            handler: Callable[..., Awaitable[bool]],
+            *,
+            patterns: Iterable[re.Pattern[str]] = (),
+            keywords: Iterable[str] = (),
+    ):
+        """
+        Initializes the rule.
+        :param handler: the handler to match.
+        :param patterns: optional, the regex patterns used by the handler, which are indexed by the pool.
+        :param keywords: optional, the keywords used by the handler, which are indexed by the pool.
+        """
+
         self._handler = di.inject(handler)
+        self.patterns = frozenset(patterns)
+        self.keywords = frozenset(keywords)
 
     def __or__(self, rule: 'Rule') -> 'Rule':
         async def handler() -> bool:
+            commits = current_state.get().commits
+            count = len(commits)
             if await self.match():
                 return True
+            # Side effects of the unmatched branch are dropped.
+            del commits[count:]
             return await rule.match()
-        return Rule(handler)
+        return Rule(handler, patterns=self.patterns | rule.patterns, keywords=self.keywords | rule.keywords)
 
     def __and__(self, rule: 'Rule') -> 'Rule':
         async def handler() -> bool:
             if not await self.match():
                 return False
             return await rule.match()
-        return Rule(handler)
+        return Rule(handler, patterns=self.patterns | rule.patterns, keywords=self.keywords | rule.keywords)
 
     async def match(self) -> bool:
         """
@@ -51,29 +73,112 @@ def message() -> Rule:
 
 def command(cmd: str) -> Rule:
     """
-    The rule to match certain command.
+    The rule to match certain command. Its arguments can be injected by `arg` and `args` in the receiver.
     :param cmd: the command.
     :return: the rule.
     """
 
     async def handler(event: MessageEvent, global_config: GlobalConfig) -> bool:
-        return event.match_command(cmd, global_config.command_prefixes, global_config.command_separator)
+        if (parsed := event.parse_commands(global_config.command_parser).get(cmd)) is None:
+            return False
+
+        state = current_state.get()
+        state.arg, args = parsed
+        state.args = list(args)
+        return True
     return message() & Rule(handler)
 
 
 def regex(r: Union[str, re.Pattern[str]]) -> Rule:
     """
-    The rule to match certain regex.
+    The rule to match certain regex. The match object can be injected by `match` in the receiver.
     :param r: regex, whether or not compiled.
     :return: the rule.
     """
 
-    if isinstance(r, str):
-        r = re.compile(r)
+    pattern = re.compile(r) if isinstance(r, str) else r
 
-    async def handler(event: MessageEvent) -> bool:
-        return bool(r.match(event.message.plain_text))  # type: ignore
-    return message() & Rule(handler)
+    async def handler(event: MessageEvent, pattern_index: PatternIndex) -> bool:
+        # All patterns indexed by the pool are matched at once for each event.
+        if pattern in pattern_index:
+            m = event.scan_patterns(pattern_index).matches[pattern]
+        else:
+            m = pattern.match(event.message.plain_text)
+
+        if not m:
+            return False
+
+        current_state.get().match = m
+        return True
+    return message() & Rule(handler, patterns=[pattern])
+
+
+def keyword(*keywords: str) -> Rule:
+    """
+    The rule to match messages containing any of the keywords.
+    :param keywords: the keywords.
+    :return: the rule.
+    """
+
+    async def handler(event: MessageEvent, pattern_index: PatternIndex) -> bool:
+        if all(k in pattern_index for k in keywords):
+            found = event.scan_patterns(pattern_index).keywords
+            return any(k in found for k in keywords)
+
+        text = event.message.plain_text
+        return any(k in text for k in keywords)
+    return message() & Rule(handler, keywords=keywords)
+
+
+_buckets = TokenBuckets()
+"""
+The token buckets shared by all rate limits.
+"""
+
+
+def rate_limit(count: int, seconds: float, *, scope: Literal['user', 'group', 'addon'] = 'user') -> Rule:
+    """
+    The rule to match at most `count` events in `seconds` for each user, each group or the addon,
+    and a token is taken only if the whole rule is matched. Put it before other rules, so that
+    throttled events are dropped before doing expensive work, for example,
+    `rate_limit(3, 60) & command('search')`.
+    :param count: the max count of events, which can be received in a burst.
+    :param seconds: the period in seconds.
+    :param scope: the scope of the limit, and the group scope is the user for private messages.
+    :return: the rule.
+    """
+
+    # Buckets of different rules are separate.
+    token = object()
+    rate = count / seconds
+
+    async def handler(event: Event) -> bool:
+        user_id = getattr(event, 'user_id', None)
+        if scope == 'user':
+            key = token, user_id
+        elif scope == 'group':
+            # Private messages may carry group ids, e.g. temporary sessions.
+            group_id = getattr(event, 'group_id', None) if getattr(event, 'message_type', None) != 'private' else None
+            key = token, group_id or user_id
+        else:
+            key = token, None
+
+        if not _buckets.peek(key, count, rate):
+            return False
+        current_state.get().commits.append(lambda: _buckets.acquire(key, count, rate))
+        return True
+    return Rule(handler)
+
+
+def cooldown(seconds: float, *, scope: Literal['user', 'group', 'addon'] = 'user') -> Rule:
+    """
+    The rule to match at most one event in `seconds`, see `rate_limit`.
+    :param seconds: the cooldown in seconds.
+    :param scope: the scope of the cooldown.
+    :return: the rule.
+    """
+
+    return rate_limit(1, seconds, scope=scope)
 
 
 def tome() -> Rule:
@@ -107,6 +212,19 @@ def superuser() -> Rule:
     return message() & Rule(handler)
 
 
+def event_type(*classes: type[Event]) -> Rule:
+    """
+    The rule to match events of the given classes, such as `shirasu.event.GroupIncreaseNotice`,
+    whose fields are typed in the receiver taking `event`.
+    :param classes: the event classes.
+    :return: the rule.
+    """
+
+    async def handler(event: Event) -> bool:
+        return isinstance(event, classes)
+    return Rule(handler)
+
+
 def notice(notice_type: str) -> Rule:
     """
     The rule to match certain notice.
@@ -114,6 +232,10 @@ def notice(notice_type: str) -> Rule:
     :return the rule.
     """
 
+    # Registered notices are created as their classes, so checking the class is enough.
+    if (cls := event_class('notice', notice_type)) is not NoticeEvent:
+        return event_type(cast(type[Event], cls))
+
     async def handler(event: Event) -> bool:
         if event.post_type != 'notice':
             return False
@@ -122,6 +244,24 @@ def notice(notice_type: str) -> Rule:
     return Rule(handler)
 
 
+def request(request_type: str) -> Rule:
+    """
+    The rule to match certain request.
+    :param request_type: the request type.
+    :return the rule.
+    """
+
+    if (cls := event_class('request', request_type)) is not RequestEvent:
+        return event_type(cast(type[Event], cls))
+
+    async def handler(event: Event) -> bool:
+        if event.post_type != 'request':
+            return False
+        return cast(RequestEvent, event).request_type == request_type
+
+    return Rule(handler)
+
+
 def meta() -> Rule:
     """
     The rule to match meta events.
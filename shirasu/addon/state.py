@@ -0,0 +1,35 @@
+import re
+from contextvars import ContextVar
+from typing import Callable
+
+
+class MatchState:
+    """
+    The state of matching an addon against the current event. Rules write what they have
+    parsed into it, and the receiver of the same addon gets them by DI, so that addons
+    matching the same event do not overwrite each other.
+    """
+
+    def __init__(self) -> None:
+        self.arg: str = ''
+        self.args: list[str] = []
+        self.match: re.Match[str] | None = None
+        self.commits: list[Callable[[], bool]] = []
+        """
+        The side effects of rules, such as taking tokens of rate limits, which are
+        committed only if the whole rule is matched.
+        """
+
+    def commit(self) -> bool:
+        """
+        Commits the side effects of rules.
+        :return: whether all of them succeed, otherwise the addon is not matched.
+        """
+
+        return all(commit() for commit in self.commits)
+
+
+current_state: ContextVar[MatchState] = ContextVar('current_state')
+"""
+The state of the addon which is matching or receiving the current event.
+"""
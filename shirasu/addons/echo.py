@@ -1,13 +1,14 @@
-from shirasu import Client, Addon, MessageEvent, command
+from shirasu import Client, Addon, command
 
 
 echo = Addon(
     name='echo',
     usage='/echo text',
     description='Sends your text back.',
+    block=True,
 )
 
 
 @echo.receive(command('echo'))
-async def handle_echo(client: Client, event: MessageEvent) -> None:
-    await client.send(event.arg)
+async def handle_echo(client: Client, arg: str) -> None:
+    await client.send(arg)
@@ -1,15 +1,18 @@
+from typing import Iterator
 from pydantic import BaseModel
 from shirasu import Client, Addon, AddonPool, MessageEvent, command
 
 
 class HelpConfig(BaseModel):
     show_addon_list: bool = True
+    forward_addon_list: bool = False
 
 
 help_addon = Addon(
     name='help',
     usage='/help addon_name',
     description='Prints usage description for certain addon.',
+    block=True,
     config_model=HelpConfig,
 )
 
@@ -21,18 +24,23 @@ Description: {description}
 '''.strip()
 
 
+def _addon_list(pool: AddonPool, event: MessageEvent) -> Iterator[str]:
+    group_id, user_id = event.session_key
+    for addon in pool.get_addons():
+        disabled = pool.get_addon_disabled(addon, group_id=group_id, user_id=user_id)
+        yield f'{addon.name} {"disabled" if disabled else "enabled"}'
+
+
 @help_addon.receive(command('help'))
-async def handle_help(client: Client, config: HelpConfig, pool: AddonPool, event: MessageEvent) -> None:
-    name = event.arg
+async def handle_help(client: Client, config: HelpConfig, pool: AddonPool, event: MessageEvent, arg: str) -> None:
+    name = arg
     if not name:
         if not config.show_addon_list:
             await client.send('The configuration to show the addon list is turned off.')
             return
 
-        await client.send('\n'.join(
-            f'{addon.name} {"disabled" if pool.get_addon_disabled(addon) else "enabled"}'
-            for addon in pool.get_addons()
-        ))
+        # The list is split into messages if there are too many addons.
+        await client.send_chunks(_addon_list(pool, event), forward=config.forward_addon_list)
         return
 
     if addon := pool.get_addon(name):
@@ -1,29 +1,77 @@
 from shirasu import Addon, AddonPool, Client, MessageEvent, superuser, command
+from shirasu.addon import AddonError
 
 
 manage = Addon(
     name='manage',
-    usage='/manage disable|enable name',
+    usage='/manage disable|enable name [here|group id|user id|global], where here is the group, '
+          '/manage reload|unload name, or /manage load module',
     description='Manage your addons, including itself.',
+    block=True,
 )
 
 
+def _parse_scope(event: MessageEvent, args: list[str]) -> dict[str, int] | None:
+    if not args or args == ['global']:
+        return {}
+
+    if args == ['here']:
+        # The setting for a user applies in all groups, so here only means a group.
+        group_id, _ = event.session_key
+        return {'group_id': group_id} if group_id is not None else None
+
+    if len(args) == 2 and args[0] in ('group', 'user') and args[1].isdigit():
+        return {f'{args[0]}_id': int(args[1])}
+    return None
+
+
 @manage.receive(superuser() & command('manage'))
-async def handle_manage(client: Client, pool: AddonPool, event: MessageEvent) -> None:
-    if len(event.args) != 2:
-        await client.reject(f'Invalid arguments count: {len(event.args)}, expected 2.')
+async def handle_manage(client: Client, pool: AddonPool, event: MessageEvent, args: list[str]) -> None:
+    if len(args) < 2:
+        await client.reject(f'Invalid arguments count: {len(args)}, expected at least 2.')
+        return
+
+    mode, name, *rest = args
+    if rest and mode not in ('disable', 'enable'):
+        await client.reject(f'Invalid arguments count: {len(args)}, expected 2.')
+        return
+
+    if mode == 'load':
+        try:
+            pool.load_module(name)
+        except AddonError as e:
+            await client.reject(f'Failed to load module {name}: {e}')
+            return
+        await client.send(f'Loaded module {name} successfully.')
         return
 
-    mode, name = event.args
     if not pool.has_addon(name):
         await client.reject(f'Addon {name} does not exist.')
         return
 
-    if mode == 'disable':
-        pool.set_addon_disabled(name, disabled=True)
-        await client.send(f'Disabled addon {name} successfully.')
-    elif mode == 'enable':
-        pool.set_addon_disabled(name, disabled=False)
-        await client.send(f'Enabled addon {name} successfully.')
+    if mode in ('disable', 'enable'):
+        if (scope := _parse_scope(event, rest)) is None:
+            if rest == ['here']:
+                await client.reject('Scope here only works in groups, use user id for the user in all groups.')
+            else:
+                await client.reject(f'Invalid scope: {" ".join(rest)}, expected here, group id, user id or global.')
+            return
+
+        pool.set_addon_disabled(name, disabled=mode == 'disable', **scope)
+        # Settings are kept in the storage, so they are restored after restarting.
+        await client.save_enablement()
+        where = ' '.join(f'in {k.removesuffix("_id")} {v}' for k, v in scope.items()) or 'globally'
+        await client.send(f'{mode.capitalize()}d addon {name} {where} successfully.')
+    elif mode in ('reload', 'unload'):
+        if not (module := pool.get_addon_module(name)):
+            await client.reject(f'Addon {name} is not loaded from a module.')
+            return
+
+        try:
+            pool.reload_module(module) if mode == 'reload' else pool.unload_module(module)
+        except AddonError as e:
+            await client.reject(f'Failed to {mode} module {module}: {e}')
+            return
+        await client.send(f'{mode.capitalize()}ed module {module} successfully.')
     else:
-        await client.reject(f'Unknown mode: {mode}, expected disable or enable.')
+        await client.reject(f'Unknown mode: {mode}, expected disable, enable, load, reload or unload.')
@@ -4,7 +4,8 @@ from shirasu import Addon, Client, tome
 reject_tome = Addon(
     name='reject_tome',
     usage='At the bot or send private messages to the bot.',
-    description='Rejects if current event is to the bot.'
+    description='Rejects if current event is to the bot.',
+    priority=10,
 )
 
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from shirasu import Client, Addon, MessageEvent, command
+from shirasu import Client, Addon, command
 
 
 class SquareConfig(BaseModel):
@@ -10,14 +10,13 @@ square = Addon(
     name='square',
     usage='/square number',
     description='Calculates the square of given number.',
+    block=True,
     config_model=SquareConfig,
 )
 
 
 @square.receive(command('square'))
-async def handle_square(client: Client, event: MessageEvent, config: SquareConfig) -> None:
-    arg = event.arg
-
+async def handle_square(client: Client, arg: str, config: SquareConfig) -> None:
     try:
         result = round(float(arg) ** 2, config.precision)
         await client.send(f'{result:g}')
@@ -1,14 +1,35 @@
+from typing import TYPE_CHECKING, Any
+
 from .client import (
+    BroadcastResult as BroadcastResult,
+    BroadcastTarget as BroadcastTarget,
     ClientActionError as ClientActionError,
     Client as Client,
 )
 from .mock import MockClient as MockClient
-from .onebot import OneBotClient as OneBotClient
+
+if TYPE_CHECKING:
+    from .onebot import OneBotClient as OneBotClient
+    from .sharded import OneBotSupervisor as OneBotSupervisor
+
+
+def __getattr__(name: str) -> Any:
+    # Importing websockets takes time, so OneBotClient is only imported when it is used.
+    if name == 'OneBotClient':
+        from .onebot import OneBotClient
+        return OneBotClient
+    if name == 'OneBotSupervisor':
+        from .sharded import OneBotSupervisor
+        return OneBotSupervisor
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 __all__ = [
+    'BroadcastResult',
+    'BroadcastTarget',
     'Client',
     'ClientActionError',
     'MockClient',
     'OneBotClient',
+    'OneBotSupervisor',
 ]
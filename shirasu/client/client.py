@@ -1,16 +1,22 @@
 import asyncio
 
-from itertools import compress
-from typing import Any, Literal
+from itertools import groupby
+from collections import deque
+from dataclasses import dataclass
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, AsyncIterable, Iterable, Literal
 from abc import ABC, abstractmethod
 
 from ..di import di
-from ..util import asyncify
+from ..util import TokenBuckets, asyncify
 from ..addon import AddonPool
+from ..addon.addon import current_addon
 from ..config import GlobalConfig
 from ..logger import logger
+from ..storage import Storage
+from ..scheduler import Scheduler
 from ..event import Event, MessageEvent
-from ..message import Message, MessageSegment, text
+from ..message import Chunk, Message, MessageBuilder, MessageSegment, node, text
 
 
 class ClientActionError(Exception):
@@ -20,25 +26,103 @@ class ClientActionError(Exception):
         super().__init__(self.msg)
 
 
+BroadcastTarget = tuple[Literal['private', 'group'], int]
+
+
+@dataclass(frozen=True)
+class BroadcastResult:
+    """
+    The result of sending the broadcast message to a target.
+    """
+
+    target: BroadcastTarget
+    message_id: int | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+_curr_event: ContextVar[Event | None] = ContextVar('curr_event', default=None)
+
+
 class Client(ABC):
     """
     The client to send and receive messages.
     """
 
-    def __init__(self, pool: AddonPool, global_config: GlobalConfig):
+    def __init__(
+            self,
+            pool: AddonPool,
+            global_config: GlobalConfig,
+            storage: Storage | None = None,
+            scheduler: Scheduler | None = None,
+    ):
         """
         Initializes the client.
         :param pool: the addon pool.
         :param global_config: the global configurations.
+        :param storage: optional, the storage, or the one at the path in global config by default.
+        :param scheduler: optional, the scheduler, or a new one which is not started by default.
         """
 
-        self.curr_event: Event | None = None
         self._pool = pool
         self._global_config = global_config
+        self._storage = storage or Storage(global_config.storage)
+        self._scheduler = scheduler or Scheduler(self._storage, max_concurrency=global_config.scheduler_concurrency)
+        # The receivers waiting for replies, which are indexed by conversations.
+        self._sessions: dict[tuple[int | None, int], deque[asyncio.Future[MessageEvent]]] = {}
+        self._pool.reload_config(global_config)
         di.provide('client', asyncify(lambda: self), check_duplicate=False)
         di.provide('pool', asyncify(lambda: self._pool), check_duplicate=False)
+        di.provide('pattern_index', asyncify(lambda: self._pool.pattern_index), check_duplicate=False)
         di.provide('event', asyncify(lambda: self.curr_event), check_duplicate=False)
         di.provide('global_config', asyncify(lambda: self._global_config), check_duplicate=False)
+        di.provide('scheduler', asyncify(lambda: self._scheduler), check_duplicate=False)
+        di.provide('storage', asyncify(lambda: self._storage.namespace(current_addon.get().name)), check_duplicate=False)
+
+    @property
+    def curr_event(self) -> Event | None:
+        """
+        The event being handled. Events are handled concurrently in their own tasks,
+        so it is stored in a context variable, which is separate for each task.
+        """
+
+        return _curr_event.get()
+
+    @curr_event.setter
+    def curr_event(self, event: Event | None) -> None:
+        _curr_event.set(event)
+
+    @property
+    def global_config(self) -> GlobalConfig:
+        return self._global_config
+
+    @property
+    def storage(self) -> Storage:
+        return self._storage
+
+    @property
+    def scheduler(self) -> Scheduler:
+        return self._scheduler
+
+    def update_config(self, global_config: GlobalConfig) -> None:
+        """
+        Replaces the global config, and reloads the configurations of addons.
+        Events in progress keep using the config they have got.
+        :param global_config: the new global configurations.
+        """
+
+        self._pool.reload_config(global_config)
+        self._global_config = global_config
+
+    async def save_enablement(self) -> None:
+        """
+        Saves the settings of whether addons are disabled, which are changed by commands, to the storage.
+        """
+
+        await self._pool.save_enablement(self._storage)
 
     @abstractmethod
     async def call_action(self, action: str, **params: Any) -> dict[str, Any]:
@@ -75,6 +159,102 @@ class Client(ABC):
 
         raise NotImplementedError()
 
+    async def _send_to(self, target: BroadcastTarget, message: Message) -> int:
+        message_type, target_id = target
+        return await self.send_msg(
+            message_type=message_type,
+            user_id=target_id if message_type == 'private' else 0,
+            group_id=target_id if message_type == 'group' else None,
+            message=message,
+            is_rejected=False,
+        )
+
+    async def broadcast(
+            self,
+            message: Message | MessageSegment | str,
+            targets: Iterable[BroadcastTarget],
+            *,
+            key: str | None = None,
+            concurrency: int | None = None,
+            rate: float | None = None,
+    ) -> AsyncGenerator[BroadcastResult, None]:
+        """
+        Sends the message to many targets, such as `('group', 123456)`, yielding the results in the
+        order they are done. The message is encoded only once, and sends are pipelined instead of
+        waiting for each round trip, within the concurrency and the rate.
+
+        If the key is given, the targets sent successfully are saved in the storage, so calling it
+        again with the same key after a partial failure skips them and only retries the others.
+        Pending sends are canceled once the generator is closed.
+        >>> async for result in client.broadcast('Hello!', [('group', 123), ('private', 456)], key='hello'):
+        ...     print(result.target, result.ok)
+
+        :param message: the message to send.
+        :param targets: the targets.
+        :param key: optional, the unique key to resume the broadcast.
+        :param concurrency: the max count of sends waiting for responses, or `broadcast_concurrency` by default.
+        :param rate: the max count of sends per second, or `broadcast_rate` by default, and 0 for no limit.
+        :return: the results of targets, except the ones sent before.
+        """
+
+        if isinstance(message, str):
+            message = text(message)
+        if isinstance(message, MessageSegment):
+            message = Message(message)
+
+        namespace = f'shirasu.broadcast.{key}'
+        sent = set(await self._storage.keys(namespace)) if key else set()
+        # Each target is saved by its own key, so the progress is not rewritten for each send.
+        pending = iter([t for t in dict.fromkeys(targets) if f'{t[0]}:{t[1]}' not in sent])
+        results: asyncio.Queue[BroadcastResult | None] = asyncio.Queue()
+        rate = self._global_config.broadcast_rate if rate is None else rate
+        buckets = TokenBuckets(1)
+
+        async def throttle() -> None:
+            # Allow a burst of one second at most.
+            while rate and not buckets.acquire(None, max(rate, 1.), rate):
+                await asyncio.sleep(1 / rate)
+
+        async def work() -> None:
+            # Workers take targets from the shared iterator, which is safe as they never wait in between.
+            try:
+                for target in pending:
+                    await throttle()
+                    try:
+                        result = BroadcastResult(target, message_id=await self._send_to(target, message))
+                    except (ClientActionError, asyncio.TimeoutError) as e:
+                        result = BroadcastResult(target, error=e)
+                    if key and result.ok:
+                        await self._storage.set(namespace, f'{target[0]}:{target[1]}', result.message_id)
+                    results.put_nowait(result)
+            finally:
+                results.put_nowait(None)
+
+        count = concurrency or self._global_config.broadcast_concurrency
+        workers = [asyncio.create_task(work()) for _ in range(count)]
+        failed = False
+        try:
+            finished = 0
+            while finished < count:
+                if (result := await results.get()) is None:
+                    finished += 1
+                    continue
+                failed = failed or not result.ok
+                yield result
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        # Raise unexpected errors, such as the closed connection.
+        for worker in workers:
+            worker.result()
+
+        if key and not failed:
+            # The broadcast is complete, so the progress is no longer needed.
+            for sent_key in await self._storage.keys(namespace):
+                await self._storage.delete(namespace, sent_key)
+
     async def send(self, message: Message | str | MessageSegment, *, is_rejected: bool = False) -> int:
         """
         Sends a message back. The `is_reject` parameter is useful for unit testing.
@@ -101,6 +281,95 @@ class Client(ABC):
             is_rejected=is_rejected,
         )
 
+    async def send_forward(self, nodes: list[MessageSegment]) -> int:
+        """
+        Sends forwarded-message nodes back in one message.
+        :param nodes: the nodes, see `shirasu.message.node`.
+        :return: the message id.
+        """
+
+        if not isinstance(event := self.curr_event, MessageEvent):
+            logger.warning('Attempted to send forward message back when the current event is not message event.')
+            return -1
+
+        messages = [n.to_json_obj() for n in nodes]
+        if event.message_type == 'group':
+            res = await self.call_action('send_group_forward_msg', group_id=event.group_id, messages=messages)
+        else:
+            res = await self.call_action('send_private_forward_msg', user_id=event.user_id, messages=messages)
+        return int(res['message_id'])
+
+    async def send_chunks(
+            self,
+            chunks: Iterable[Chunk] | AsyncIterable[Chunk],
+            *,
+            forward: bool = False,
+            separator: str = '\n',
+    ) -> list[int]:
+        """
+        Sends the chunks back, which are split into messages by `max_message_length` and `max_message_segments`
+        in global config, so long output is neither rejected nor truncated. The chunks are consumed lazily,
+        and each message is sent while the next one is built, so large lists are never built fully in memory.
+        :param chunks: the text or segments, such as lines of a list.
+        :param forward: whether to fold the messages into forwarded-message nodes, which are sent
+            in as few messages as possible, with `max_forward_nodes` nodes in each.
+        :param separator: the separator between text chunks.
+        :return: the message ids.
+        """
+
+        config = self._global_config
+        builder = MessageBuilder(
+            max_length=config.max_message_length,
+            max_segments=config.max_message_segments,
+            separator=separator,
+        )
+        ids: list[int] = []
+        sending: asyncio.Task[int] | None = None
+        nodes: list[MessageSegment] = []
+
+        async def flush(content: list[MessageSegment] | Message) -> None:
+            nonlocal sending
+            # Messages are sent one by one to keep them in order, while the next one is built meanwhile.
+            if sending:
+                ids.append(await sending)
+            if isinstance(content, Message):
+                sending = asyncio.create_task(self.send(content))
+            else:
+                sending = asyncio.create_task(self.send_forward(content))
+
+        async def put(message: Message) -> None:
+            nonlocal nodes
+            if not forward:
+                await flush(message)
+                return
+
+            event = self.curr_event
+            nodes.append(node(message, 'shirasu', event.self_id if event else 0))
+            if len(nodes) >= config.max_forward_nodes:
+                await flush(nodes)
+                nodes = []
+
+        try:
+            if isinstance(chunks, AsyncIterable):
+                async for chunk in chunks:
+                    for message in builder.append(chunk):
+                        await put(message)
+            else:
+                for chunk in chunks:
+                    for message in builder.append(chunk):
+                        await put(message)
+
+            if rest := builder.build():
+                await put(rest)
+            if nodes:
+                await flush(nodes)
+            if sending:
+                ids.append(await sending)
+        finally:
+            if sending:
+                sending.cancel()
+        return ids
+
     async def reject(self, message: Message | MessageSegment | str) -> int:
         """
         Rejects with a message, it only works for `MockClient` when testing.
@@ -110,17 +379,72 @@ class Client(ABC):
 
         return await self.send(message, is_rejected=True)
 
+    async def wait_for_reply(self, timeout: float) -> MessageEvent:
+        """
+        Waits for the next message from the sender of the current message in the same conversation.
+        The reply is sent to the waiting receiver directly, so it will not be matched by any addon.
+        If there are more than one receiver waiting for the conversation, the earliest one gets it.
+        :param timeout: the timeout in seconds.
+        :return: the reply.
+        :raise asyncio.TimeoutError: there is no reply in time.
+        """
+
+        if not isinstance(event := self.curr_event, MessageEvent):
+            raise RuntimeError('the current event is not message event')
+
+        future: asyncio.Future[MessageEvent] = asyncio.get_running_loop().create_future()
+        waiters = self._sessions.setdefault(key := event.session_key, deque())
+        waiters.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # Expired sessions are removed at once, so the index only contains waiting ones.
+            waiters.remove(future)
+            if not waiters:
+                del self._sessions[key]
+
+    def _resume_session(self, event: Event | None) -> bool:
+        if not isinstance(event, MessageEvent) or not (waiters := self._sessions.get(event.session_key)):
+            return False
+
+        for future in waiters:
+            if not future.done():
+                future.set_result(event)
+                return True
+        return False
+
     async def apply_addons(self) -> None:
         """
-        Applies all addons.
+        Applies all addons, unless the event is a reply which a receiver is waiting for.
         """
 
+        if self._resume_session(self.curr_event):
+            return
+
+        event = self.curr_event
+        group_id: int | None = getattr(event, 'group_id', None)
+        user_id: int | None = getattr(event, 'user_id', None)
+        if isinstance(event, MessageEvent):
+            group_id, user_id = event.session_key
+
         # Normally the addon.do_match() won't modify the pool, but to
         # improve the robustness, I cache the pool first.
-        addons = tuple(self._pool.get_enabled_addons())
-        selectors = await asyncio.gather(*(addon.do_match() for addon in addons))
+        addons = tuple(self._pool.get_enabled_addons(group_id=group_id, user_id=user_id))
+
+        # Addons are sorted by priority, so each group is a tier with the same priority.
+        # Lower tiers are not matched at all once a blocking addon received the event.
+        for _, group in groupby(addons, key=lambda a: a.priority):
+            tier = tuple(group)
+            states = await asyncio.gather(*(addon.do_match() for addon in tier))
+
+            # Using asyncio.gather to run receivers in parallel may make outputs unordered.
+            # However, matchers usually have no output, so they can be run in parallel.
+            blocked = False
+            for addon, state in zip(tier, states):
+                if state is None:
+                    continue
+                await addon.do_receive(state)
+                blocked = blocked or addon.block
 
-        # Using asyncio.gather to run receivers in parallel may make outputs unordered.
-        # However, matchers usually have no output, so they can be run in parallel.
-        for addon in compress(addons, selectors):
-            await addon.do_receive()
+            if blocked:
+                break
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any
+
+
+class HeartbeatTimeoutError(Exception):
+    pass
+
+
+class HeartbeatMonitor:
+    """
+    The monitor to find half-dead connections, which are not closed but receive nothing.
+    Once a heartbeat meta event tells the interval, the connection is considered dead
+    if nothing is received for the interval times the tolerance.
+    """
+
+    def __init__(self, tolerance: float) -> None:
+        """
+        Initializes the monitor.
+        :param tolerance: the count of heartbeat intervals to wait, or 0 to disable it.
+        """
+
+        self._tolerance = tolerance
+        self._loop = asyncio.get_running_loop()
+        self._last_received = self._loop.time()
+        self._timeout: float | None = None
+
+    def feed(self, data: dict[str, Any]) -> None:
+        """
+        Records the received frame.
+        :param data: the frame data.
+        """
+
+        self._last_received = self._loop.time()
+        if data.get('meta_event_type') == 'heartbeat' and (interval := data.get('interval')):
+            self._timeout = interval / 1000 * self._tolerance
+
+    async def watch(self) -> None:
+        """
+        Waits until the connection is considered dead, which runs forever if it is disabled.
+        :raise HeartbeatTimeoutError: the connection is dead.
+        """
+
+        while True:
+            if not self._tolerance or self._timeout is None:
+                await asyncio.sleep(1.)
+            elif (elapsed := self._loop.time() - self._last_received) >= self._timeout:
+                raise HeartbeatTimeoutError(f'nothing received for {elapsed:.1f} seconds')
+            else:
+                await asyncio.sleep(self._timeout - elapsed)
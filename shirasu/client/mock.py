@@ -5,6 +5,8 @@ from asyncio.queues import Queue
 from .client import Client, ClientActionError
 from ..addon import AddonPool
 from ..config import GlobalConfig
+from ..storage import Storage
+from ..scheduler import Scheduler
 from ..event import Event, MessageEvent, mock_message_event
 from ..message import Message, MessageSegment
 
@@ -14,15 +16,25 @@ class MockClient(Client):
     The mock client used for testing.
     """
 
-    def __init__(self, pool: AddonPool, global_config: GlobalConfig | None = None) -> None:
+    def __init__(
+            self,
+            pool: AddonPool,
+            global_config: GlobalConfig | None = None,
+            storage: Storage | None = None,
+            scheduler: Scheduler | None = None,
+    ) -> None:
         """
         Initializes the MockClient.
         If you do not specify global config, it will use the default.
+        If you do not specify storage, it will use a temporary one in memory.
+        The scheduler is not started unless it is started explicitly, and jobs can be run by `Scheduler.run`.
         :param pool: the addon pool.
         :param global_config: the global config.
+        :param storage: the storage.
+        :param scheduler: the scheduler.
         """
 
-        super().__init__(pool, global_config or GlobalConfig())
+        super().__init__(pool, global_config or GlobalConfig(), storage or Storage(':memory:'), scheduler)
         self._message_event_queue: Queue[MessageEvent] = Queue()
 
     async def call_action(self, action: str, **params: Any) -> dict[str, Any]:
@@ -74,6 +86,23 @@ class MockClient(Client):
         ))
         return -1
 
+    async def send_forward(self, nodes: list[MessageSegment]) -> int:
+        """
+        Sends forwarded-message nodes, which are got as one message consisting of the nodes.
+        :param nodes: the nodes.
+        :return: the message id.
+        """
+
+        if not isinstance(event := self.curr_event, MessageEvent):
+            return -1
+        return await self.send_msg(
+            message_type=event.message_type,
+            user_id=event.user_id,
+            group_id=event.group_id,
+            message=Message(*nodes),
+            is_rejected=False,
+        )
+
     async def get_message_event(self, timeout: float = .1) -> MessageEvent:
         """
         Gets the message event.
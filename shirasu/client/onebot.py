@@ -1,40 +1,220 @@
 import ujson
+import signal
 import asyncio
+import contextlib
 
 from pathlib import Path
-from typing import cast, Any, Literal
-from websockets.exceptions import ConnectionClosedError
+from typing import cast, Any, AsyncIterator, Callable, Coroutine, Iterator, Literal, Protocol
+from websockets.exceptions import ConnectionClosedError, ConnectionClosedOK, InvalidHandshake
+from websockets.frames import Opcode
+from websockets.legacy.framing import Frame
 from websockets.legacy.client import connect, WebSocketClientProtocol
 
 from .client import Client, ClientActionError
+from .heartbeat import HeartbeatMonitor, HeartbeatTimeoutError
+from .outbox import Outbox, OutboxClosedError
 from ..addon import AddonPool
-from ..config import load_config, GlobalConfig
-from ..logger import logger
-from ..util import FutureTable, retry
-from ..event import MessageEvent, NoticeEvent, RequestEvent, MetaEvent
+from ..config import ConfigService, GlobalConfig
+from ..logger import logger, sampled
+from ..storage import Storage
+from ..scheduler import Scheduler
+from ..record import FrameRecorder
+from ..util import DedupWindow, FutureTable, retry
+from ..event import MessageEvent, event_from_data
+from ..health import Health
 from ..message import Message
 
 
+# Reconnect quickly at first, and back off if the server keeps failing.
+_reconnect = retry(timeout=.5, max_timeout=30., jitter=.5, messages={
+    ConnectionClosedError: 'Connection closed',
+    ConnectionClosedOK: 'Connection closed by the server',
+    HeartbeatTimeoutError: 'Heartbeat timed out',
+    ConnectionRefusedError: 'Connection refused',
+    InvalidHandshake: 'Handshake failed',
+    asyncio.TimeoutError: 'Connection timed out',
+    OSError: 'Connection failed',
+})
+
+
+# The control frame from a sharded worker, after which other workers reload the settings of addons.
+_RELOAD_ENABLEMENT = ujson.dumps({'shirasu': 'reload_enablement'})
+
+
+def _is_duplicate(dedup: DedupWindow | None, data: dict[str, Any]) -> bool:
+    # Message ids are unique for each account, and other events have no ids to tell duplicates.
+    if not dedup or data.get('post_type') != 'message' or (message_id := data.get('message_id')) is None:
+        return False
+    return dedup.seen((data.get('self_id'), message_id))
+
+
+def _frame_template(action: str, params: dict[str, Any]) -> Callable[[str], str]:
+    """
+    Creates the function encoding the frame of the action with its echo. Messages in the parameters
+    are not encoded again, but their cached encodings are spliced into the frame.
+    """
+
+    messages = {k: v.encoded for k, v in params.items() if isinstance(v, Message)}
+    if not messages:
+        return lambda echo: ujson.dumps({'action': action, 'params': params, 'echo': echo})
+
+    encoded = ujson.dumps({k: v for k, v in params.items() if k not in messages}, ensure_ascii=False)
+    fields = [encoded[1:-1], *(f'{ujson.dumps(k)}:{v}' for k, v in messages.items())]
+    head = f'{{"action":{ujson.dumps(action)},"params":{{{",".join(f for f in fields if f)}}},"echo":'
+    return lambda echo: f'{head}{ujson.dumps(echo)}}}'
+
+
+@contextlib.contextmanager
+def _handle_signals(shutdown: asyncio.Event) -> Iterator[None]:
+    """
+    Sets the shutdown event on SIGTERM or SIGINT, and cancels the current task on the second one.
+    """
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+
+    def handle() -> None:
+        if shutdown.is_set() and task:
+            logger.warning('Received the signal again, stopping immediately.')
+            task.cancel()
+        else:
+            logger.info('Received the signal, shutting down.')
+            shutdown.set()
+
+    installed = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        # Signals are handled only in the main thread of platforms supporting them.
+        with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+            loop.add_signal_handler(sig, handle)
+            installed.append(sig)
+    try:
+        yield
+    finally:
+        for sig in installed:
+            loop.remove_signal_handler(sig)
+
+
+async def _run_until_shutdown(
+        connection: Coroutine[Any, Any, None],
+        shutdown: asyncio.Event,
+        health: Health,
+        timeout: float,
+) -> None:
+    """
+    Runs the connection until it ends or the shutdown event is set. The connected client drains
+    by itself on shutdown, which is waited within the timeout, while reconnecting is canceled.
+    """
+
+    task = asyncio.create_task(connection)
+    waiter = asyncio.create_task(shutdown.wait())
+    try:
+        await asyncio.wait((task, waiter), return_when=asyncio.FIRST_COMPLETED)
+        if not task.done() and health.ready:
+            health.ready = False
+            # The client has its own deadline, and the margin is for closing the connection.
+            await asyncio.wait((task,), timeout=timeout + 1.)
+        if not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        else:
+            task.result()
+    finally:
+        waiter.cancel()
+        task.cancel()
+
+
+class Transport(Protocol):
+    """
+    The duplex channel of OneBot frames, which is the websocket connection by default.
+    """
+
+    async def send_many(self, messages: list[str]) -> None: ...
+
+    def __aiter__(self) -> AsyncIterator[str | bytes]: ...
+
+
+class WebSocketTransport:
+    """
+    The transport over the websocket connection, which writes a batch of messages
+    to the socket in one write, and waits for flow control only once.
+    """
+
+    def __init__(self, ws: WebSocketClientProtocol) -> None:
+        self._ws = ws
+
+    async def send_many(self, messages: list[str]) -> None:
+        ws = self._ws
+        await ws.ensure_open()
+        chunks: list[bytes] = []
+        for message in messages:
+            # Frames are encoded in order, as extensions like compression keep states between them.
+            Frame(True, Opcode.TEXT, message.encode('utf8')).write(chunks.append, mask=ws.is_client, extensions=ws.extensions)
+        ws.transport.write(b''.join(chunks))
+        await ws.drain()
+
+    def __aiter__(self) -> AsyncIterator[str | bytes]:
+        return aiter(self._ws)
+
+
 class OneBotClient(Client):
     """
     The onebot client. Use classmethod `listen` to create a connection.
     >>> await OneBotClient.listen(pool=...)
     """
 
-    def __init__(self, ws: WebSocketClientProtocol, pool: AddonPool, global_config: GlobalConfig):
-        super().__init__(pool, global_config)
+    def __init__(
+            self,
+            ws: Transport,
+            pool: AddonPool,
+            global_config: GlobalConfig,
+            storage: Storage | None = None,
+            recorder: FrameRecorder | None = None,
+            dedup: DedupWindow | None = None,
+            scheduler: Scheduler | None = None,
+            echo_prefix: str = '',
+    ):
+        """
+        Initializes the client.
+        :param ws: the connection.
+        :param pool: the addon pool.
+        :param global_config: the global configurations.
+        :param storage: optional, the storage.
+        :param recorder: optional, the recorder of received frames.
+        :param dedup: optional, the window to drop message events received again.
+        :param scheduler: optional, the scheduler.
+        :param echo_prefix: the prefix of echo fields, which tells sharded workers apart.
+        """
+
+        super().__init__(pool, global_config, storage, scheduler)
+        self._recorder = recorder
+        self._dedup = dedup
+        self._echo_prefix = echo_prefix
         self._ws = ws
         self._futures = FutureTable()
         self._tasks: set[asyncio.Task[None]] = set()
+        self._outbox = Outbox(global_config.send_queue_size, global_config.send_batch_size)
+        # Whether new events are dropped, while responses of actions are still received.
+        self._draining = False
+
+    @property
+    def outbound_depth(self) -> int:
+        """
+        The count of frames waiting to be sent, which grows if the peer is slow.
+        """
+
+        return self._outbox.depth
 
     async def call_action(self, action: str, **params: Any) -> dict[str, Any]:
-        logger.info(f'Calling action {action}.')
+        if sampled(self._global_config.log_sample_rate):
+            logger.info('Calling action {}.', action)
+        encode = _frame_template(action, params)
         future_id = self._futures.register()
-        await self._ws.send(ujson.dumps({
-            'action': action,
-            'params': params,
-            'echo': str(future_id),
-        }))
+        try:
+            await self._outbox.put(encode(f'{self._echo_prefix}{future_id}'))
+        except OutboxClosedError:
+            self._futures.discard(future_id)
+            raise ClientActionError({'msg': 'CONNECTION_CLOSED', 'wording': 'connection closed'})
 
         data = await self._futures.get(future_id, self._global_config.action_timeout)
         if data.get('status') == 'failed':
@@ -42,63 +222,207 @@ class OneBotClient(Client):
 
         return data.get('data', {})
 
+    async def save_enablement(self) -> None:
+        await super().save_enablement()
+        if self._echo_prefix:
+            # Other workers reload the settings from the storage, so they are written first.
+            await self.storage.flush()
+            await self._outbox.put(_RELOAD_ENABLEMENT)
+
     async def _handle(self, data: dict[str, Any]) -> None:
         if echo := data.get('echo'):
-            self._futures.set(int(echo), data)
+            self._futures.set(int(str(echo).removeprefix(self._echo_prefix)), data)
             return
 
-        post_type = data.get('post_type')
-
-        self.curr_event = None
-        # Shut up, mypy.
-        event: Any
-        if post_type == 'message':
-            event = MessageEvent.from_data(data)
-            logger.info(f'Received {event.message_type} message from {event.user_id}: {event.raw_message}')
-        elif post_type == 'request':
-            event = RequestEvent.from_data(data)
-        elif post_type == 'notice':
-            event = NoticeEvent.from_data(data)
-        elif post_type == 'meta_event':
-            event = MetaEvent.from_data(data)
-        else:
-            logger.warning(f'Ignoring unknown event {post_type}.')
+        if data.get('shirasu') == 'reload_enablement':
+            await self._pool.load_enablement(self.storage)
             return
 
+        if not (event := event_from_data(data)):
+            logger.warning(f'Ignoring unknown event {data.get("post_type")}.')
+            return
+
+        if isinstance(event, MessageEvent) and sampled(self._global_config.log_sample_rate):
+            logger.info('Received {} message from {}: {}', event.message_type, event.user_id, event.raw_message)
+
         self.curr_event = event
 
         await self.apply_addons()
 
-    async def _do_listen(self) -> None:
-        if count := len(self._tasks):
-            logger.warning(f'Canceling {count} undone tasks')
-            for task in self._tasks:
-                task.cancel()
-            self._tasks.clear()
-
+    async def _receive(self, monitor: HeartbeatMonitor | None) -> None:
         async for message in self._ws:
+            if self._recorder:
+                self._recorder.write(message)
             if isinstance(message, bytes):
                 message = message.decode('utf8')
-            task = asyncio.create_task(self._handle(ujson.loads(message)))
+            data = ujson.loads(message)
+            if monitor:
+                monitor.feed(data)
+            if _is_duplicate(self._dedup, data):
+                logger.debug('Dropping duplicate message {}.', data['message_id'])
+                continue
+            if self._draining and not data.get('echo'):
+                continue
+            task = asyncio.create_task(self._handle(data))
             self._tasks.add(task)
             task.add_done_callback(self._tasks.discard)
 
+    async def drain(self, timeout: float) -> None:
+        """
+        Stops handling new events, and waits for the events in progress and the frames queued
+        to be sent, while responses of actions are still received. Events not finished before
+        the deadline are canceled.
+        :param timeout: the max seconds to wait.
+        """
+
+        self._draining = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if tasks := set(self._tasks):
+            logger.info(f'Waiting for {len(tasks)} events in progress.')
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                logger.warning(f'Canceling {len(pending)} events not finished in {timeout}s.')
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(self._outbox.join(), max(deadline - loop.time(), 0.))
+        except asyncio.TimeoutError:
+            logger.warning(f'Dropping {self._outbox.depth} frames not sent in {timeout}s.')
+
+    async def _drain_on(self, shutdown: asyncio.Event) -> None:
+        await shutdown.wait()
+        await self.drain(self._global_config.shutdown_timeout)
+
+    async def _do_listen(self, monitor: HeartbeatMonitor | None = None, shutdown: asyncio.Event | None = None) -> None:
+        # Reloading addons does not affect the connection, and it stops when the connection is closed.
+        watcher = asyncio.create_task(self._pool.watch(self._global_config.watch_interval)) \
+            if self._global_config.watch_addons else None
+
+        tasks = [asyncio.create_task(self._receive(monitor)), asyncio.create_task(self._outbox.run(self._ws.send_many))]
+        if monitor:
+            tasks.append(asyncio.create_task(monitor.watch()))
+        if shutdown:
+            # Listening stops once drained, and the connection is closed after that.
+            tasks.append(asyncio.create_task(self._drain_on(shutdown)))
+
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if watcher:
+                watcher.cancel()
+            # Responses of pending actions will never come.
+            self._outbox.close()
+            self._futures.fail_all(ClientActionError({'msg': 'CONNECTION_CLOSED', 'wording': 'connection closed'}))
+            await self._close_tasks()
+
+    async def _close_tasks(self, grace: float = 1.) -> None:
+        """
+        Lets events in progress handle the failures of their actions within the grace period, and cancels
+        the others, so that nothing of the closed connection is left running after reconnecting.
+        """
+
+        if not (tasks := set(self._tasks)):
+            return
+
+        _, pending = await asyncio.wait(tasks, timeout=grace)
+        if pending:
+            logger.warning(f'Canceling {len(pending)} undone tasks.')
+            for task in pending:
+                task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            # Actions failing because of the closed connection are expected.
+            if isinstance(result, Exception) and not isinstance(result, ClientActionError):
+                logger.opt(exception=result).error('Failed to handle the event.')
+
     @classmethod
-    @retry(timeout=5., messages={
-        ConnectionClosedError: 'Connection closed',
-        ConnectionRefusedError: 'Connection refused',
-    })
-    async def listen(cls, pool: AddonPool, config: str | Path = 'shirasu.yml') -> None:
+    async def listen(
+            cls,
+            pool: AddonPool,
+            config: str | Path = 'shirasu.yml',
+            *,
+            shutdown: asyncio.Event | None = None,
+    ) -> None:
         """
-        Start listening the websocket url.
+        Start listening the websocket url. If `watch_config` is turned on, the config
+        file will be reloaded once it is modified, without reconnecting.
+        On SIGTERM, SIGINT or the shutdown event, new events are dropped, and it returns once
+        the events in progress and the frames queued are done, or `shutdown_timeout` passes.
         :param pool: the addon pool, which can be used to preload plugins.
         :param config: the path to config file.
+        :param shutdown: optional, the event to shut down, besides signals.
         """
 
-        conf = load_config(config)
-        async with connect(conf.ws) as ws:
+        service = ConfigService(config)
+        conf = service.config
+        # The storage, the recorder, the dedup window and the scheduler are kept across reconnections,
+        # because messages may be received again after reconnecting, and jobs run without connections.
+        # The scheduler is started once the first client is created, which jobs of addons get injected.
+        storage = Storage(conf.storage)
+        recorder = FrameRecorder(conf.record, compress=conf.record_compress) if conf.record else None
+        dedup = DedupWindow(conf.dedup_window) if conf.dedup_window else None
+        # Restore the addons disabled by commands before any event or job.
+        await pool.load_enablement(storage)
+        scheduler = Scheduler(storage, max_concurrency=conf.scheduler_concurrency)
+        shutdown = shutdown or asyncio.Event()
+        health = Health()
+        if conf.health_port is not None:
+            await health.start(conf.health_host, conf.health_port)
+        watcher = asyncio.create_task(service.watch()) if conf.watch_config else None
+        try:
+            with _handle_signals(shutdown):
+                connection = cls._connect(pool, service, storage, recorder, dedup, scheduler, health, shutdown)
+                await _run_until_shutdown(connection, shutdown, health, service.config.shutdown_timeout)
+        finally:
+            if watcher:
+                watcher.cancel()
+            await health.close()
+            await scheduler.close()
+            if recorder:
+                recorder.close()
+            # Pending writes of the storage and the logs are flushed at last.
+            await storage.close()
+            await logger.complete()
+            logger.success('Shut down.')
+
+    @classmethod
+    @_reconnect
+    async def _connect(
+            cls,
+            pool: AddonPool,
+            service: ConfigService,
+            storage: Storage,
+            recorder: FrameRecorder | None,
+            dedup: DedupWindow | None,
+            scheduler: Scheduler,
+            health: Health,
+            shutdown: asyncio.Event,
+    ) -> None:
+        async with connect(service.config.ws, **service.config.ws_options) as ws:
             logger.success('Connected to websocket.')
-            await cls(ws, pool, conf)._do_listen()
+            client = cls(WebSocketTransport(ws), pool, service.config, storage, recorder, dedup, scheduler)
+            service.subscribe(client.update_config)
+            if not scheduler.started:
+                await scheduler.start(pool)
+            health.ready = not shutdown.is_set()
+            try:
+                await client._do_listen(HeartbeatMonitor(service.config.heartbeat_tolerance), shutdown)
+                if not shutdown.is_set():
+                    # The server closed the connection cleanly, e.g. it is restarting, so it reconnects.
+                    await ws.ensure_open()
+            except HeartbeatTimeoutError:
+                # The server does not respond, so the closing handshake is skipped.
+                ws.fail_connection()
+                raise
+            finally:
+                health.ready = False
+                service.unsubscribe(client.update_config)
 
     async def send_msg(
             self,
@@ -111,7 +435,7 @@ class OneBotClient(Client):
     ) -> int:
         res = await self.call_action(
             action='send_msg',
-            message=message.to_json_obj(),
+            message=message,
             user_id=user_id,
             group_id=group_id,
             message_type=message_type,
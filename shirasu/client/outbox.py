@@ -0,0 +1,96 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable
+
+from ..logger import logger
+
+
+class OutboxClosedError(Exception):
+    pass
+
+
+class Outbox:
+    """
+    The bounded queue of outgoing frames, which are written by one writer in batches, so that
+    frames sent at the same time are coalesced into fewer writes and waits on flow control.
+    Senders wait once the queue is full, so a slow peer does not grow the memory without limit,
+    while receiving events is not affected.
+    """
+
+    def __init__(self, max_size: int = 1024, batch_size: int = 64) -> None:
+        """
+        Initializes the outbox.
+        :param max_size: the max count of frames waiting to be written.
+        :param batch_size: the max count of frames written at once.
+        """
+
+        self._max_size = max_size
+        self._batch_size = batch_size
+        self._frames: deque[str] = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        # Whether all frames are written.
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+
+    @property
+    def depth(self) -> int:
+        """
+        The count of frames waiting to be written.
+        """
+
+        return len(self._frames)
+
+    async def put(self, frame: str) -> None:
+        """
+        Puts the frame, which waits while the queue is full.
+        :param frame: the frame.
+        :raise OutboxClosedError: the outbox is closed.
+        """
+
+        while not self._closed and len(self._frames) >= self._max_size:
+            if self._not_full.is_set():
+                logger.warning(f'Outbox is full with {len(self._frames)} frames, senders are waiting.')
+                self._not_full.clear()
+            await self._not_full.wait()
+
+        if self._closed:
+            raise OutboxClosedError('the outbox is closed')
+        self._frames.append(frame)
+        self._idle.clear()
+        self._not_empty.set()
+
+    async def run(self, write: Callable[[list[str]], Awaitable[None]]) -> None:
+        """
+        Writes frames in batches until it is canceled.
+        :param write: the function writing a batch, which waits for flow control.
+        """
+
+        while True:
+            await self._not_empty.wait()
+            batch = [self._frames.popleft() for _ in range(min(len(self._frames), self._batch_size))]
+            if not self._frames:
+                self._not_empty.clear()
+            self._not_full.set()
+            await write(batch)
+            if not self._frames:
+                self._idle.set()
+
+    async def join(self) -> None:
+        """
+        Waits until all frames put are written.
+        """
+
+        await self._idle.wait()
+
+    def close(self) -> None:
+        """
+        Closes the outbox, dropping frames not written, and waiting senders raise `OutboxClosedError`.
+        """
+
+        self._closed = True
+        self._frames.clear()
+        self._not_full.set()
+        self._idle.set()
@@ -0,0 +1,316 @@
+import os
+import ujson
+import signal
+import socket
+import struct
+import asyncio
+import multiprocessing
+
+from pathlib import Path
+from dataclasses import dataclass
+from multiprocessing.process import BaseProcess
+from typing import Any, AsyncIterator, Callable, Sequence
+from websockets.legacy.client import connect, WebSocketClientProtocol
+
+from .onebot import OneBotClient, _RELOAD_ENABLEMENT, _handle_signals, _is_duplicate, _reconnect, _run_until_shutdown
+from .heartbeat import HeartbeatMonitor, HeartbeatTimeoutError
+from .outbox import Outbox
+from ..addon import AddonPool
+from ..config import ConfigService
+from ..health import Health
+from ..logger import logger
+from ..storage import Storage
+from ..scheduler import Scheduler
+from ..record import FrameRecorder
+from ..util import DedupWindow
+
+
+# Each frame is prefixed with the length of it.
+_HEADER = struct.Struct('>I')
+
+
+class _Channel:
+    """
+    The channel of raw OneBot frames between the supervisor and a worker over a Unix socket.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(cls, sock: socket.socket) -> '_Channel':
+        return cls(*await asyncio.open_unix_connection(sock=sock))
+
+    async def send_many(self, messages: Sequence[str | bytes]) -> None:
+        chunks: list[bytes] = []
+        for message in messages:
+            if isinstance(message, str):
+                message = message.encode('utf8')
+            chunks += _HEADER.pack(len(message)), message
+        self._writer.write(b''.join(chunks))
+        await self._writer.drain()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                length, = _HEADER.unpack(await self._reader.readexactly(_HEADER.size))
+                yield await self._reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def conversation_key(data: dict[str, Any]) -> int:
+    """
+    Gets the key of the conversation which the event belongs to, that is, the group for
+    group events, the user for private ones, and 0 for the others, such as meta events.
+    :param data: the event data.
+    :return: the key.
+    """
+
+    return int(data.get('group_id') or data.get('user_id') or 0)
+
+
+def _worker_index(echo: Any, workers: int) -> int | None:
+    # Workers prefix echo fields with their indexes, and other echo fields are not from them.
+    prefix, separator, _ = str(echo).partition(':')
+    if not separator or not prefix.isdigit() or (index := int(prefix)) >= workers:
+        return None
+    return index
+
+
+def _run_worker(index: int, sock: socket.socket, pool_factory: Callable[[], AddonPool], config: str) -> None:
+    # The supervisor stops workers by SIGTERM or closing their channels, so they ignore Ctrl+C sent to the process group.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_worker(index, sock, pool_factory, config))
+
+
+async def _serve_worker(index: int, sock: socket.socket, pool_factory: Callable[[], AddonPool], config: str) -> None:
+    service = ConfigService(config)
+    # Other workers write to the same database, so values are not cached.
+    storage = Storage(service.config.storage, cache_size=0)
+    pool = pool_factory()
+    await pool.load_enablement(storage)
+    scheduler = Scheduler(storage, max_concurrency=service.config.scheduler_concurrency)
+    channel = await _Channel.open(sock)
+    client = OneBotClient(channel, pool, service.config, storage, scheduler=scheduler, echo_prefix=f'{index}:')
+    # Jobs of addons only run in the first worker, while jobs added at runtime run in their own workers.
+    # They are started after the client is created, which jobs get injected.
+    await scheduler.start(pool if index == 0 else None)
+    service.subscribe(client.update_config)
+    watcher = asyncio.create_task(service.watch()) if service.config.watch_config else None
+    # The worker drains its events in progress on SIGTERM sent by the supervisor.
+    shutdown = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, shutdown.set)
+    logger.success(f'Worker {index} is started.')
+
+    try:
+        await client._do_listen(shutdown=shutdown)
+    finally:
+        if watcher:
+            watcher.cancel()
+        await scheduler.close()
+        await storage.close()
+        channel.close()
+        await logger.complete()
+
+
+@dataclass
+class _Worker:
+    process: BaseProcess
+    channel: _Channel
+    # Frames to the worker are written by its own writer, so a slow worker does not block the others.
+    outbox: Outbox
+
+
+class OneBotSupervisor:
+    """
+    The supervisor, which owns the websocket connection, and shards events to worker processes
+    running addons, so that the addon pipeline is not limited to one CPU core.
+    On shutdown, new events are dropped, and workers drain their events in progress on SIGTERM,
+    while the supervisor still routes the responses of their actions.
+
+    Events of a conversation are always sent to the same worker in order, and actions called
+    by workers are sent back through the supervisor. Each worker has its own addon pool, so once
+    addons are enabled or disabled by commands in a worker, the others reload the settings.
+    >>> await OneBotSupervisor.listen(functools.partial(AddonPool.from_modules, ...))
+    """
+
+    def __init__(
+            self,
+            ws: WebSocketClientProtocol,
+            workers: list[_Worker],
+            recorder: FrameRecorder | None,
+            dedup: DedupWindow | None,
+    ) -> None:
+        self._ws = ws
+        self._workers = workers
+        self._recorder = recorder
+        self._dedup = dedup
+        self._draining = False
+
+    async def _forward_actions(self, index: int) -> None:
+        reload_enablement = _RELOAD_ENABLEMENT.encode('utf8')
+        async for frame in self._workers[index].channel:
+            if frame == reload_enablement:
+                for worker in self._workers:
+                    if worker is not self._workers[index]:
+                        await worker.outbox.put(_RELOAD_ENABLEMENT)
+                continue
+            await self._ws.send(frame.decode('utf8'))
+        if not self._draining:
+            raise RuntimeError(f'Worker {index} exited unexpectedly.')
+
+    async def _dispatch(self, monitor: HeartbeatMonitor) -> None:
+        async for message in self._ws:
+            if self._recorder:
+                self._recorder.write(message)
+
+            data = ujson.loads(message)
+            monitor.feed(data)
+            if _is_duplicate(self._dedup, data):
+                logger.debug('Dropping duplicate message {}.', data['message_id'])
+                continue
+
+            if echo := data.get('echo'):
+                if (index := _worker_index(echo, len(self._workers))) is None:
+                    logger.warning('Ignoring the response with unknown echo {}.', echo)
+                    continue
+            elif self._draining:
+                continue
+            else:
+                index = conversation_key(data) % len(self._workers)
+            await self._workers[index].outbox.put(message if isinstance(message, str) else message.decode('utf8'))
+
+    async def _drain_on(self, shutdown: asyncio.Event, forwarders: list[asyncio.Task[None]], timeout: float) -> None:
+        await shutdown.wait()
+        self._draining = True
+        for worker in self._workers:
+            worker.process.terminate()
+        # Workers exit once drained, which closes their channels.
+        _, pending = await asyncio.wait(forwarders, timeout=timeout + 1.)
+        if pending:
+            logger.warning(f'{len(pending)} workers are not drained in {timeout}s.')
+
+    async def _do_listen(self, monitor: HeartbeatMonitor, shutdown: asyncio.Event, timeout: float) -> None:
+        forwarders = [asyncio.create_task(self._forward_actions(i)) for i in range(len(self._workers))]
+        tasks = [
+            asyncio.create_task(self._dispatch(monitor)),
+            asyncio.create_task(monitor.watch()),
+            asyncio.create_task(self._drain_on(shutdown, forwarders, timeout)),
+            *(asyncio.create_task(worker.outbox.run(worker.channel.send_many)) for worker in self._workers),
+        ]
+        pending = {*tasks, *forwarders}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+                # Forwarders finish while draining, which does not stop listening.
+                if not done.issubset(forwarders):
+                    break
+        finally:
+            for task in tasks + forwarders:
+                task.cancel()
+
+    @classmethod
+    async def listen(
+            cls,
+            pool_factory: Callable[[], AddonPool],
+            config: str | Path = 'shirasu.yml',
+            workers: int | None = None,
+            *,
+            shutdown: asyncio.Event | None = None,
+    ) -> None:
+        """
+        Starts workers and listens the websocket url.
+        :param pool_factory: the picklable function creating the addon pool in each worker.
+        :param config: the path to config file.
+        :param workers: the count of worker processes, or the count of CPU cores by default.
+        :param shutdown: optional, the event to shut down, besides SIGTERM and SIGINT.
+        """
+
+        service = ConfigService(config)
+        conf = service.config
+        recorder = FrameRecorder(conf.record, compress=conf.record_compress) if conf.record else None
+        dedup = DedupWindow(conf.dedup_window) if conf.dedup_window else None
+        watcher = asyncio.create_task(service.watch()) if conf.watch_config else None
+        started = [cls._start_worker(i, pool_factory, config) for i in range(workers or os.cpu_count() or 1)]
+        running = [
+            _Worker(process, await _Channel.open(sock), Outbox(conf.send_queue_size, conf.send_batch_size))
+            for process, sock in started
+        ]
+        shutdown = shutdown or asyncio.Event()
+        health = Health()
+        if conf.health_port is not None:
+            await health.start(conf.health_host, conf.health_port)
+        try:
+            with _handle_signals(shutdown):
+                connection = cls._connect(service, running, recorder, dedup, health, shutdown)
+                await _run_until_shutdown(connection, shutdown, health, service.config.shutdown_timeout)
+        finally:
+            if watcher:
+                watcher.cancel()
+            await health.close()
+            await cls._stop_workers(running)
+            if recorder:
+                recorder.close()
+            await logger.complete()
+
+    @staticmethod
+    def _start_worker(
+            index: int,
+            pool_factory: Callable[[], AddonPool],
+            config: str | Path,
+    ) -> tuple[BaseProcess, socket.socket]:
+        parent, child = socket.socketpair()
+        # Spawned workers do not inherit the event loop and threads of the supervisor.
+        process = multiprocessing.get_context('spawn').Process(
+            target=_run_worker,
+            args=(index, child, pool_factory, str(config)),
+            name=f'shirasu-worker-{index}',
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        return process, parent
+
+    @staticmethod
+    async def _stop_workers(workers: list[_Worker], timeout: float = 5.) -> None:
+        for worker in workers:
+            worker.channel.close()
+        for worker in workers:
+            await asyncio.to_thread(worker.process.join, timeout)
+            if worker.process.is_alive():
+                logger.warning(f'Terminating {worker.process.name}.')
+                worker.process.terminate()
+
+    @classmethod
+    @_reconnect
+    async def _connect(
+            cls,
+            service: ConfigService,
+            workers: list[_Worker],
+            recorder: FrameRecorder | None,
+            dedup: DedupWindow | None,
+            health: Health,
+            shutdown: asyncio.Event,
+    ) -> None:
+        async with connect(service.config.ws, **service.config.ws_options) as ws:
+            logger.success(f'Connected to websocket, dispatching to {len(workers)} workers.')
+            supervisor = cls(ws, workers, recorder, dedup)
+            health.ready = not shutdown.is_set()
+            try:
+                monitor = HeartbeatMonitor(service.config.heartbeat_tolerance)
+                await supervisor._do_listen(monitor, shutdown, service.config.shutdown_timeout)
+                if not shutdown.is_set():
+                    # The server closed the connection cleanly, e.g. it is restarting, so it reconnects.
+                    await ws.ensure_open()
+            except HeartbeatTimeoutError:
+                ws.fail_connection()
+                raise
+            finally:
+                health.ready = False
@@ -0,0 +1,38 @@
+import re
+
+
+class CommandParser:
+    """
+    The parser of commands, with the prefixes and the compiled separator.
+    It is created once for each global config, see `GlobalConfig.command_parser`.
+    """
+
+    def __init__(self, command_prefixes: list[str], command_separator: str) -> None:
+        """
+        Initializes the parser.
+        :param command_prefixes: the prefixes of commands.
+        :param command_separator: the separator of commands, using regex.
+        """
+
+        self._prefixes = tuple(command_prefixes)
+        self._separator = re.compile(command_separator)
+
+    def parse(self, text: str) -> dict[str, tuple[str, tuple[str, ...]]]:
+        """
+        Parses the text into the map from commands to their arguments. The command is the first
+        token after the prefix, so if there are multiple prefixes matched, for example, `''` and
+        `'/'`, there will be multiple commands, and rules can find their command in one lookup.
+        :param text: the plain text of message.
+        :return: the map from commands to the argument and split arguments.
+        """
+
+        commands: dict[str, tuple[str, tuple[str, ...]]] = {}
+        for prefix in self._prefixes:
+            if not text.startswith(prefix):
+                continue
+
+            cmd, *rest = self._separator.split(text[len(prefix):], maxsplit=1)
+            if cmd not in commands:
+                arg = rest[0].strip() if rest else ''
+                commands[cmd] = arg, tuple(self._separator.split(arg))
+        return commands
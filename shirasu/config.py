@@ -1,7 +1,11 @@
-import yaml
-from typing import Any
+import asyncio
+from typing import Any, Callable
 from pathlib import Path
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+from .logger import logger, configure_logger
+from .util import FileWatcher
+from .command import CommandParser
 
 
 class GlobalConfig(BaseModel):
@@ -10,12 +14,157 @@ class GlobalConfig(BaseModel):
     """
 
     ws: str = 'ws://127.0.0.1:8080'
+    ws_compression: bool = True
+    ws_max_size: int | None = 2 ** 20
+    ws_max_queue: int | None = 32
+    ws_read_limit: int = 2 ** 16
+    ws_write_limit: int = 2 ** 16
+    ws_ping_interval: float | None = 20.
+    ws_ping_timeout: float | None = 20.
     addons: dict[str, dict[str, Any]] = {}
     superusers: list[int] = []
     action_timeout: float = 30.
+    send_queue_size: int = 1024
+    send_batch_size: int = 64
+    heartbeat_tolerance: float = 3.
+    shutdown_timeout: float = 10.
+    health_host: str = '127.0.0.1'
+    health_port: int | None = None
+    dedup_window: float = 60.
     command_prefixes: list[str] = ['/']
     command_separator: str = '\\s+'
+    storage: str = 'shirasu.db'
+    scheduler_concurrency: int = 4
+    broadcast_concurrency: int = 16
+    broadcast_rate: float = 20.
+    max_message_length: int = 3000
+    max_message_segments: int = 50
+    max_forward_nodes: int = 100
+    record: str | None = None
+    record_compress: bool = False
+    watch_config: bool = True
+    watch_addons: bool = False
+    watch_interval: float = 1.
+    log_level: str = 'DEBUG'
+    log_json: bool = False
+    log_batched: bool = False
+    log_sample_rate: float = 1.
+
+    _command_parser: CommandParser | None = PrivateAttr(None)
+
+    @property
+    def command_parser(self) -> CommandParser:
+        """
+        The parser of commands, which is created only once because the config is replaced when reloaded.
+        """
+
+        if not self._command_parser:
+            self._command_parser = CommandParser(self.command_prefixes, self.command_separator)
+        return self._command_parser
+
+    @property
+    def ws_options(self) -> dict[str, Any]:
+        """
+        The options of the websocket connection, which are the arguments of `websockets.connect`.
+        """
+
+        return {
+            'compression': 'deflate' if self.ws_compression else None,
+            'max_size': self.ws_max_size,
+            'max_queue': self.ws_max_queue,
+            'read_limit': self.ws_read_limit,
+            'write_limit': self.ws_write_limit,
+            'ping_interval': self.ws_ping_interval,
+            'ping_timeout': self.ws_ping_timeout,
+        }
 
 
 def load_config(path: str | Path) -> GlobalConfig:
+    # Importing yaml takes time, so it is only imported when the config file is loaded.
+    import yaml
     return GlobalConfig.parse_obj(yaml.safe_load(Path(path).read_text('utf8')))
+
+
+class ConfigService:
+    """
+    The service to hold the global config loaded from file, which reloads the config
+    once the file is modified, and notifies the listeners with the new config.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """
+        Initializes the service and loads the config.
+        :param path: the path to config file.
+        """
+
+        self._path = Path(path)
+        self._watcher = FileWatcher()
+        self._watcher.watch(self._path)
+        self._config = load_config(self._path)
+        self._listeners: list[Callable[[GlobalConfig], None]] = []
+        self._configure_logger()
+
+    def _configure_logger(self) -> None:
+        configure_logger(level=self._config.log_level, serialize=self._config.log_json, batched=self._config.log_batched)
+
+    @property
+    def config(self) -> GlobalConfig:
+        return self._config
+
+    def subscribe(self, listener: Callable[[GlobalConfig], None]) -> None:
+        """
+        Registers the listener, which will be called with the new config after it is reloaded.
+        :param listener: the listener.
+        """
+
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[GlobalConfig], None]) -> None:
+        """
+        Removes the listener.
+        :param listener: the listener.
+        """
+
+        self._listeners.remove(listener)
+
+    def reload(self) -> bool:
+        """
+        Reloads the config. If the new config is invalid, or any listener rejects it, the old one is kept.
+        :return: whether the config is reloaded.
+        """
+
+        try:
+            config = load_config(self._path)
+        except Exception as e:
+            logger.error(f'Failed to reload config {self._path}, keeping the old one: {e}')
+            return False
+
+        applied: list[Callable[[GlobalConfig], None]] = []
+        try:
+            for listener in list(self._listeners):
+                listener(config)
+                applied.append(listener)
+        except Exception as e:
+            logger.error(f'Failed to apply reloaded config {self._path}, keeping the old one: {e}')
+            # The old config has been applied before, so the listeners accept it again.
+            for listener in applied:
+                listener(self._config)
+            return False
+
+        # The config object is never modified, but replaced, so that dependents are
+        # able to know whether it is changed by its identity.
+        self._config = config
+        self._configure_logger()
+        logger.success(f'Reloaded config {self._path}.')
+        return True
+
+    async def watch(self) -> None:
+        """
+        Watches the config file, and reloads it once it is modified.
+        It runs forever, so it should be run as a task.
+        """
+
+        while True:
+            await asyncio.sleep(self._config.watch_interval)
+            if self._watcher.changed():
+                self.reload()
@@ -1,6 +1,6 @@
 import asyncio
 import inspect
-from typing import cast, Any, Callable, Awaitable, TypeVar, ParamSpec
+from typing import cast, get_origin, Any, Callable, Awaitable, TypeVar, ParamSpec
 from .logger import logger
 
 
@@ -78,7 +78,8 @@ class DependencyInjector:
             if anno == inspect.Parameter.empty:
                 continue
 
-            if not isinstance(val := args[dep], expected := anno):
+            # Only the origin of generic types is checked, e.g. list for list[str].
+            if not isinstance(val := args[dep], expected := get_origin(anno) or anno):
                 module = inspect.getmodule(func)
                 module_name = module.__name__ if module else '<unknown module>'
                 module_func_name = f'{module_name}:{func.__name__}'
@@ -1,10 +1,13 @@
-import re
-from typing import Any, Literal
+from typing import cast, Any, Callable, Literal, TypeVar
 from datetime import datetime
+from .command import CommandParser
+from .pattern import PatternIndex, PatternScan
 from .message import Message, MessageSegment, text, parse_cq_message
 
 
 class Event:
+    __slots__ = ('data', 'time', 'self_id', 'post_type')
+
     def __init__(self, **params: Any) -> None:
         self.data = params
         self.time: int = params['time']
@@ -31,8 +34,8 @@ class MessageEvent(Event):
         self.user_id: int = params['user_id']
         self.group_id: int | None = params.get('group_id')
         self.is_rejected: bool = bool(params.get('is_rejected'))
-        self.arg: str = ''
-        self.args: list[str] = []
+        self._commands: dict[str, tuple[str, tuple[str, ...]]] | None = None
+        self._pattern_scan: tuple[PatternIndex, PatternScan] | None = None
 
     @classmethod
     def from_data(cls, data: dict[str, Any]) -> 'MessageEvent':
@@ -41,18 +44,44 @@ class MessageEvent(Event):
             **data,
         )
 
-    def match_command(self, cmd: str, command_prefixes: list[str], command_separator: str) -> bool:
-        t = self.message.plain_text
-        for start in command_prefixes:
-            prefix = start + cmd
-            if t.startswith(prefix):
-                self.arg = t.removeprefix(prefix).strip()
-                self.args = re.split(command_separator, self.arg)
-                return True
-        return False
+    @property
+    def session_key(self) -> tuple[int | None, int]:
+        """
+        The key of the conversation with the sender, that is, the group and the sender for
+        group messages, and the sender only for private messages.
+        """
+
+        return self.group_id if self.message_type == 'group' else None, self.user_id
+
+    def parse_commands(self, parser: CommandParser) -> dict[str, tuple[str, tuple[str, ...]]]:
+        """
+        Parses the commands of this message only once, and the result is shared by all addons.
+        :param parser: the command parser.
+        :return: the map from commands to the argument and split arguments.
+        """
+
+        if self._commands is None:
+            self._commands = parser.parse(self.message.plain_text)
+        return self._commands
+
+    def scan_patterns(self, index: PatternIndex) -> PatternScan:
+        """
+        Scans this message by the pattern index only once, and the result is shared by all addons.
+        :param index: the pattern index.
+        :return: the result.
+        """
+
+        if not self._pattern_scan or self._pattern_scan[0] is not index:
+            self._pattern_scan = index, index.scan(self.message.plain_text)
+        return self._pattern_scan[1]
 
 
 class NoticeEvent(Event):
+    """
+    The notice event, which is created as the subclass of its notice type if it is registered.
+    """
+
+    __slots__ = ('notice_type',)
     post_type: Literal['notice']
 
     def __init__(self, **params: Any) -> None:
@@ -61,6 +90,11 @@ class NoticeEvent(Event):
 
 
 class RequestEvent(Event):
+    """
+    The request event, which is created as the subclass of its request type if it is registered.
+    """
+
+    __slots__ = ('request_type',)
     post_type: Literal['request']
 
     def __init__(self, **params: Any) -> None:
@@ -69,6 +103,7 @@ class RequestEvent(Event):
 
 
 class MetaEvent(Event):
+    __slots__ = ('meta_event_type', 'sub_type', 'status', 'interval')
     post_type: Literal['meta_event']
 
     def __init__(self, **params: Any) -> None:
@@ -79,6 +114,211 @@ class MetaEvent(Event):
         self.interval: int = params.get('interval', -1)
 
 
+# The events by their post types and the types of each post type, where None is for other types.
+_EVENT_CLASSES: dict[tuple[str, str | None], type[Event]] = {
+    ('message', 'private'): MessageEvent,
+    ('message', 'group'): MessageEvent,
+    ('message', None): MessageEvent,
+    ('notice', None): NoticeEvent,
+    ('request', None): RequestEvent,
+    ('meta_event', 'heartbeat'): MetaEvent,
+    ('meta_event', 'lifecycle'): MetaEvent,
+    ('meta_event', None): MetaEvent,
+}
+
+_TYPE_FIELDS = {
+    'message': 'message_type',
+    'notice': 'notice_type',
+    'request': 'request_type',
+    'meta_event': 'meta_event_type',
+}
+
+E = TypeVar('E', bound=Event)
+
+
+def register_event(post_type: str, subtype: str) -> Callable[[type[E]], type[E]]:
+    """
+    Registers the event class for the type of the post type, such as notices extended by the OneBot
+    implementation, so the events are created as it.
+    >>> @register_event('notice', 'group_card')
+    ... class GroupCardNotice(NoticeEvent):
+    ...     ...
+
+    :param post_type: the post type.
+    :param subtype: the type, that is, the notice type for notices and the request type for requests.
+    :return: the decorator.
+    """
+
+    def decorator(cls: type[E]) -> type[E]:
+        _EVENT_CLASSES[post_type, subtype] = cls
+        return cls
+    return decorator
+
+
+def event_class(post_type: str, subtype: str | None = None) -> type[Event] | None:
+    """
+    Gets the event class of the type of the post type.
+    :param post_type: the post type.
+    :param subtype: optional, the type.
+    :return: the class, or None if the post type is unknown.
+    """
+
+    return _EVENT_CLASSES.get((post_type, subtype)) or _EVENT_CLASSES.get((post_type, None))
+
+
+def event_from_data(data: dict[str, Any]) -> Event | None:
+    """
+    Creates the event of its post type and its type from the data received.
+    :param data: the data.
+    :return: the event, or None if the post type is unknown.
+    """
+
+    post_type = data.get('post_type', '')
+    if (cls := event_class(post_type, data.get(_TYPE_FIELDS.get(post_type, '')))) is None:
+        return None
+    try:
+        return cls.from_data(data)
+    except (KeyError, TypeError):
+        # The implementation omits some fields of the type, so it is created as the event of the post type.
+        if (base := event_class(post_type)) is None or base is cls:
+            raise
+        return base.from_data(data)
+
+
+@register_event('notice', 'group_upload')
+class GroupUploadNotice(NoticeEvent):
+    __slots__ = ('group_id', 'user_id', 'file')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.group_id: int = params['group_id']
+        self.user_id: int = params['user_id']
+        self.file: dict[str, Any] = params['file']
+
+
+@register_event('notice', 'group_admin')
+class GroupAdminNotice(NoticeEvent):
+    __slots__ = ('sub_type', 'group_id', 'user_id')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.sub_type: Literal['set', 'unset'] = params['sub_type']
+        self.group_id: int = params['group_id']
+        self.user_id: int = params['user_id']
+
+
+@register_event('notice', 'group_decrease')
+class GroupDecreaseNotice(NoticeEvent):
+    __slots__ = ('sub_type', 'group_id', 'operator_id', 'user_id')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.sub_type: Literal['leave', 'kick', 'kick_me'] = params['sub_type']
+        self.group_id: int = params['group_id']
+        # Some implementations omit the operator, such as when the member leaves.
+        self.operator_id: int | None = params.get('operator_id')
+        self.user_id: int = params['user_id']
+
+
+@register_event('notice', 'group_increase')
+class GroupIncreaseNotice(NoticeEvent):
+    __slots__ = ('sub_type', 'group_id', 'operator_id', 'user_id')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.sub_type: Literal['approve', 'invite'] = params['sub_type']
+        self.group_id: int = params['group_id']
+        self.operator_id: int | None = params.get('operator_id')
+        self.user_id: int = params['user_id']
+
+
+@register_event('notice', 'group_ban')
+class GroupBanNotice(NoticeEvent):
+    __slots__ = ('sub_type', 'group_id', 'operator_id', 'user_id', 'duration')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.sub_type: Literal['ban', 'lift_ban'] = params['sub_type']
+        self.group_id: int = params['group_id']
+        self.operator_id: int | None = params.get('operator_id')
+        # The whole group is muted or unmuted if it is 0.
+        self.user_id: int = params['user_id']
+        self.duration: int = params.get('duration', 0)
+
+
+@register_event('notice', 'friend_add')
+class FriendAddNotice(NoticeEvent):
+    __slots__ = ('user_id',)
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.user_id: int = params['user_id']
+
+
+@register_event('notice', 'group_recall')
+class GroupRecallNotice(NoticeEvent):
+    __slots__ = ('group_id', 'user_id', 'operator_id', 'message_id')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.group_id: int = params['group_id']
+        self.user_id: int = params['user_id']
+        self.operator_id: int | None = params.get('operator_id')
+        self.message_id: int = params['message_id']
+
+
+@register_event('notice', 'friend_recall')
+class FriendRecallNotice(NoticeEvent):
+    __slots__ = ('user_id', 'message_id')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.user_id: int = params['user_id']
+        self.message_id: int = params['message_id']
+
+
+@register_event('notice', 'notify')
+class NotifyNotice(NoticeEvent):
+    """
+    The notify notice, including pokes, lucky kings of red packets and changes of group honors.
+    """
+
+    __slots__ = ('sub_type', 'group_id', 'user_id', 'target_id', 'honor_type')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.sub_type: Literal['poke', 'lucky_king', 'honor'] = params['sub_type']
+        # Pokes in private chats have no groups.
+        self.group_id: int | None = params.get('group_id')
+        self.user_id: int = params['user_id']
+        self.target_id: int | None = params.get('target_id')
+        self.honor_type: Literal['talkative', 'performer', 'emotion'] | None = params.get('honor_type')
+
+
+@register_event('request', 'friend')
+class FriendRequest(RequestEvent):
+    __slots__ = ('user_id', 'comment', 'flag')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.user_id: int = params['user_id']
+        self.comment: str = params.get('comment', '')
+        self.flag: str = params['flag']
+
+
+@register_event('request', 'group')
+class GroupRequest(RequestEvent):
+    __slots__ = ('sub_type', 'group_id', 'user_id', 'comment', 'flag')
+
+    def __init__(self, **params: Any) -> None:
+        super().__init__(**params)
+        self.sub_type: Literal['add', 'invite'] = params['sub_type']
+        self.group_id: int = params['group_id']
+        self.user_id: int = params['user_id']
+        self.comment: str = params.get('comment', '')
+        self.flag: str = params['flag']
+
+
 MOCK_SELF_ID = 1883
 MOCK_USER_ID = 1884
 MOCK_GROUP_ID = 1885
@@ -123,7 +363,7 @@ def mock_message_event(
 
 
 def mock_notice_event(notice_type: str, **params: Any) -> NoticeEvent:
-    return NoticeEvent(
+    return cast(type[NoticeEvent], event_class('notice', notice_type))(
         notice_type=notice_type,
         **mock_event(post_type='notice').data,
         **params,
@@ -131,7 +371,7 @@ def mock_notice_event(notice_type: str, **params: Any) -> NoticeEvent:
 
 
 def mock_request_event(request_type: str, **params: Any) -> RequestEvent:
-    return RequestEvent(
+    return cast(type[RequestEvent], event_class('request', request_type))(
         request_type=request_type,
         **mock_event(post_type='request').data,
         **params,
@@ -0,0 +1,69 @@
+import asyncio
+import contextlib
+
+from .logger import logger
+
+
+class Health:
+    """
+    The readiness and liveness of the bot for rolling restarts. It is ready while connected and
+    not shutting down, and alive while the event loop answers the probes in time. Both are served
+    by a tiny HTTP server if the port is set, where `GET /ready` and `GET /live` answer 200 or 503.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self._server: asyncio.Server | None = None
+
+    async def _answer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            path = request.split()[1].decode() if len(request.split()) > 1 else ''
+            if path == '/live':
+                ok = True
+            elif path == '/ready':
+                ok = self.ready
+            else:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+
+            body = b'ok' if ok else b'unavailable'
+            status = b'200 OK' if ok else b'503 Service Unavailable'
+            writer.write(b'HTTP/1.1 %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s' % (status, len(body), body))
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str, port: int) -> None:
+        """
+        Starts serving the probes.
+        :param host: the host.
+        :param port: the port, or 0 for a random one.
+        """
+
+        self._server = await asyncio.start_server(self._answer, host, port)
+        logger.info(f'Health probes are served on {host}:{self.port}.')
+
+    @property
+    def port(self) -> int | None:
+        """
+        The port serving the probes, or None if not started.
+        """
+
+        if not self._server:
+            return None
+        return int(next(iter(self._server.sockets)).getsockname()[1])
+
+    async def close(self) -> None:
+        """
+        Stops serving the probes, and it is no longer ready.
+        """
+
+        self.ready = False
+        if self._server:
+            self._server.close()
+            with contextlib.suppress(Exception):
+                await self._server.wait_closed()
+            self._server = None
@@ -1,21 +1,168 @@
 import sys
-from typing import TYPE_CHECKING, Any
+import ujson
+import random
+import asyncio
+import threading
+import traceback
+from collections import deque
+from typing import TYPE_CHECKING, Any, TextIO
 from loguru import logger as logger
 
 if TYPE_CHECKING:
-    from loguru import Logger
-
-
-logger.configure(
-    handlers=[{
-        'sink': sys.stdout,
-        'level': 'DEBUG',
-        'format': '<green>{time:YY-MM-DD HH:mm:ss}</green> | '
-                  '<level>{level: <8}</level> | '
-                  '<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - '
-                  '<level>{message}</level>',
-    }]
-)
+    from loguru import Logger, Message, Record
+
+
+_FORMAT = '<green>{time:YY-MM-DD HH:mm:ss}</green> | ' \
+          '<level>{level: <8}</level> | ' \
+          '<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - ' \
+          '<level>{message}</level>'
+
+
+def _format_exception(record: 'Record') -> str:
+    if not (exception := record['exception']):
+        return ''
+    return ''.join(traceback.format_exception(exception.type, exception.value, exception.traceback))
+
+
+def _format_text(record: 'Record') -> str:
+    return (f'{record["time"]:%y-%m-%d %H:%M:%S} | {record["level"].name: <8} | '
+            f'{record["name"]}:{record["function"]}:{record["line"]} - {record["message"]}\n'
+            f'{_format_exception(record)}')
+
+
+def _format_json(record: 'Record') -> str:
+    return ujson.dumps({
+        'time': record['time'].isoformat(),
+        'level': record['level'].name,
+        'name': record['name'],
+        'function': record['function'],
+        'line': record['line'],
+        'message': record['message'],
+        'extra': record['extra'],
+        'exception': _format_exception(record) or None,
+    }, default=str, ensure_ascii=False) + '\n'
+
+
+class BatchedSink:
+    """
+    The sink of loguru, which only enqueues records, and a background thread formats and
+    writes them in batches, so that logging costs little on the event loop. Records are
+    dropped if the thread cannot keep up with them.
+    """
+
+    def __init__(
+            self,
+            stream: TextIO,
+            *,
+            serialize: bool = False,
+            batch_size: int = 512,
+            flush_interval: float = .1,
+            max_pending: int = 65536,
+    ) -> None:
+        """
+        Initializes the sink and starts the writer thread.
+        :param stream: the stream to write.
+        :param serialize: whether to write records as JSON lines.
+        :param batch_size: the count of pending records to wake the writer up.
+        :param flush_interval: the max delay in seconds before writing pending records.
+        :param max_pending: the max count of pending records.
+        """
+
+        self._stream = stream
+        self._format = _format_json if serialize else _format_text
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._pending: deque['Record'] = deque()
+        self._max_pending = max_pending
+        self._dropped = 0
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='shirasu-logger', daemon=True)
+        self._thread.start()
+
+    def write(self, message: 'Message') -> None:
+        if len(self._pending) >= self._max_pending:
+            self._dropped += 1
+            return
+
+        self._pending.append(message.record)
+        if len(self._pending) >= self._batch_size:
+            self._wakeup.set()
+
+    def _write_pending(self) -> None:
+        with self._lock:
+            lines = []
+            while self._pending:
+                lines.append(self._format(self._pending.popleft()))
+            if self._dropped:
+                lines.append(f'{self._dropped} log records are dropped.\n')
+                self._dropped = 0
+            if lines:
+                self._stream.write(''.join(lines))
+                self._stream.flush()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            self._write_pending()
+
+    async def complete(self) -> None:
+        """
+        Writes all pending records, which is called by `logger.complete()`.
+        """
+
+        await asyncio.to_thread(self._write_pending)
+
+    def stop(self) -> None:
+        """
+        Stops the writer thread after writing all pending records, which is called when the sink is removed.
+        """
+
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        self._write_pending()
+
+
+_options: tuple[str, bool, bool] | None = None
+
+
+def configure_logger(*, level: str = 'DEBUG', serialize: bool = False, batched: bool = False) -> None:
+    """
+    Replaces the handler of the logger, which writes to stdout, unless the options are unchanged.
+    :param level: the minimal level, and lower calls return before formatting their arguments.
+    :param serialize: whether to write records as JSON lines.
+    :param batched: whether to format and write records in a background thread.
+    """
+
+    global _options
+    if _options == (options := (level, serialize, batched)):
+        return
+    _options = options
+
+    if batched:
+        # The record is formatted by the sink, so the message is only used as is.
+        handler: dict[str, Any] = {'sink': BatchedSink(sys.stdout, serialize=serialize), 'format': lambda _: '{message}'}
+    elif serialize:
+        handler = {'sink': lambda m: sys.stdout.write(_format_json(m.record)), 'format': lambda _: '{message}'}
+    else:
+        handler = {'sink': sys.stdout, 'format': _FORMAT}
+    logger.configure(handlers=[{**handler, 'level': level}])
+
+
+def sampled(rate: float) -> bool:
+    """
+    Decides whether to log a frequent message, such as the one of each received message.
+    :param rate: the sample rate between 0 and 1.
+    :return: whether to log it.
+    """
+
+    return rate >= 1. or random.random() < rate
+
+
+configure_logger()
 
 
 def logger_deco(f: Any) -> 'Logger':
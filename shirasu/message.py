@@ -1,13 +1,13 @@
 import re
 import ujson
 import base64
-from typing import Any, Iterable
+from typing import Any, Iterable, Iterator
 from pathlib import Path
-from functools import reduce
+from functools import reduce, cached_property
 from dataclasses import dataclass
 
 
-@dataclass()
+@dataclass(frozen=True)
 class MessageSegment:
     type: str
     data: dict[str, Any]
@@ -17,22 +17,157 @@ class MessageSegment:
 
 
 class Message:
+    """
+    The immutable message. Its JSON is built and encoded only once, so sending the same
+    message again, such as static help text, costs nothing to serialize it.
+    Do not modify the data of its segments once it is created.
+    """
+
+    _segments: tuple[MessageSegment, ...]
+
     def __init__(self, *segments: MessageSegment):
-        self._segments = segments
+        object.__setattr__(self, '_segments', segments)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
 
     @property
     def segments(self) -> tuple[MessageSegment, ...]:
         return self._segments
 
-    @property
+    @cached_property
     def plain_text(self) -> str:
         return ''.join(seg.data['text'] for seg in self._segments if seg.type == 'text')
 
-    def to_json_obj(self) -> Any:
+    @cached_property
+    def _json_obj(self) -> Any:
         if len(self._segments) == 1:
             return self._segments[0].to_json_obj()
         return [seg.to_json_obj() for seg in self._segments]
 
+    def to_json_obj(self) -> Any:
+        """
+        Gets the JSON object of the message, which is cached and should not be modified.
+        :return: the JSON object.
+        """
+
+        return self._json_obj
+
+    @cached_property
+    def encoded(self) -> str:
+        """
+        The message encoded as JSON, which is spliced into frames sending it.
+        """
+
+        return ujson.dumps(self._json_obj, ensure_ascii=False)
+
+
+Chunk = str | MessageSegment
+
+
+class MessageBuilder:
+    """
+    The builder of messages from chunks, which starts a new message once the current one would
+    exceed the max length of text or the max count of segments. Text chunks are joined by the
+    separator, and a text chunk longer than the max length is cut into pieces.
+    >>> builder = MessageBuilder(max_length=100)
+    >>> for line in lines:
+    ...     for message in builder.append(line):
+    ...         await client.send(message)
+    >>> if message := builder.build():
+    ...     await client.send(message)
+    """
+
+    def __init__(self, *, max_length: int = 3000, max_segments: int = 50, separator: str = '\n') -> None:
+        """
+        Initializes the builder.
+        :param max_length: the max length of text in a message.
+        :param max_segments: the max count of segments in a message.
+        :param separator: the separator between text chunks.
+        """
+
+        if max_length <= 0 or max_segments <= 0:
+            raise ValueError('the max length and the max count of segments should be positive')
+
+        self._max_length = max_length
+        self._max_segments = max_segments
+        self._separator = separator
+        self._segments: list[MessageSegment] = []
+        # The text after the last segment, which is joined into one text segment.
+        self._text: list[str] = []
+        self._length = 0
+
+    def _take(self) -> Message:
+        self._flush_text()
+        message = Message(*self._segments)
+        self._segments = []
+        self._length = 0
+        return message
+
+    def _flush_text(self) -> None:
+        if self._text:
+            self._segments.append(text(''.join(self._text)))
+            self._text = []
+
+    def append(self, chunk: Chunk) -> Iterator[Message]:
+        """
+        Appends the chunk.
+        :param chunk: the text or the segment.
+        :return: the messages which are full.
+        """
+
+        if isinstance(chunk, MessageSegment) and chunk.type == 'text':
+            chunk = chunk.data['text']
+        if isinstance(chunk, str):
+            yield from self._append_text(chunk)
+            return
+
+        self._flush_text()
+        if len(self._segments) >= self._max_segments:
+            yield self._take()
+        self._segments.append(chunk)
+
+    def _append_text(self, content: str) -> Iterator[Message]:
+        if not self._text and len(self._segments) >= self._max_segments:
+            yield self._take()
+
+        content = f'{self._separator}{content}' if self._text else content
+        if self._length + len(content) > self._max_length:
+            if self._segments or self._text:
+                yield self._take()
+                content = content.removeprefix(self._separator)
+            while len(content) > self._max_length:
+                self._text.append(content[:self._max_length])
+                content = content[self._max_length:]
+                yield self._take()
+
+        if content:
+            self._text.append(content)
+            self._length += len(content)
+
+    def build(self) -> Message | None:
+        """
+        Builds the rest of chunks.
+        :return: the message, or None if there is nothing left.
+        """
+
+        return self._take() if self._segments or self._text else None
+
+
+def split_message(chunks: Iterable[Chunk], **kwargs: Any) -> Iterator[Message]:
+    """
+    Splits the chunks into messages lazily, see `MessageBuilder`.
+    :param chunks: the chunks.
+    :param kwargs: the arguments of `MessageBuilder`.
+    :return: the messages.
+    """
+
+    builder = MessageBuilder(**kwargs)
+    for chunk in chunks:
+        yield from builder.append(chunk)
+    if message := builder.build():
+        yield message
+
 
 def _unescape(content: str) -> str:
     fragments = {
@@ -82,6 +217,10 @@ def json(data: dict[str, Any]) -> MessageSegment:
     return MessageSegment(type='json', data={'data': ujson.dumps(data)})
 
 
+def node(content: Message, name: str, uin: int) -> MessageSegment:
+    return MessageSegment(type='node', data={'name': name, 'uin': uin, 'content': content.to_json_obj()})
+
+
 def parse_cq_message(msg: str) -> Message:
     def iter_message() -> Iterable[tuple[str, str]]:
         text_begin = 0
@@ -0,0 +1,127 @@
+import re
+import warnings
+from typing import Iterable
+
+from .util import AhoCorasick
+
+try:
+    from re import _parser as _sre_parse  # type: ignore[attr-defined]
+except ImportError:
+    import sre_parse as _sre_parse
+
+
+# Backreferences and conditional groups refer to groups by their numbers or names,
+# which are changed when patterns are combined, so these patterns are matched alone.
+_UNCOMBINABLE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+_SCOPED_FLAGS = {
+    re.IGNORECASE: 'i',
+    re.MULTILINE: 'm',
+    re.DOTALL: 's',
+    re.VERBOSE: 'x',
+}
+
+
+def _wrap(pattern: re.Pattern[str]) -> str | None:
+    flags = pattern.flags & ~re.UNICODE
+    if _UNCOMBINABLE.search(pattern.pattern) or flags & ~sum(_SCOPED_FLAGS):
+        return None
+
+    letters = ''.join(letter for flag, letter in _SCOPED_FLAGS.items() if flags & flag)
+    # The line break ends the comment at the end of verbose patterns.
+    source = f'(?{letters}:{pattern.pattern}\n)' if flags & re.VERBOSE else f'(?{letters}:{pattern.pattern})'
+
+    # Patterns with global inline flags, e.g. (?i), cannot be combined. They are parsed without
+    # the cache of `re`, and Python 3.10 only warns about them, which is turned into an error.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            _sre_parse.parse(f'(?:)|{source}')
+        except (re.error, DeprecationWarning):
+            return None
+    return source
+
+
+class PatternScan:
+    """
+    The result of scanning a text by `PatternIndex`.
+    """
+
+    def __init__(self, matches: dict[re.Pattern[str], re.Match[str] | None], keywords: set[str]) -> None:
+        self.matches = matches
+        self.keywords = keywords
+
+
+class PatternIndex:
+    """
+    The index of all regex patterns and keywords of addons, which scans a text for
+    all of them at once, instead of matching them one by one for each addon.
+
+    The combinable patterns are joined into an alternation with named groups. As the
+    alternation tries its branches in order, the branches before the matched one do not
+    match, so it only needs one pass for a text matching none of them, which is common,
+    and one more pass for each matched pattern. Keywords are found by Aho-Corasick.
+    """
+
+    def __init__(self, patterns: Iterable[re.Pattern[str]] = (), keywords: Iterable[str] = ()) -> None:
+        """
+        Builds the index.
+        :param patterns: the patterns.
+        :param keywords: the keywords.
+        """
+
+        self._patterns: list[re.Pattern[str]] = []
+        self._alone: list[re.Pattern[str]] = []
+        sources: list[str] = []
+        group_names: set[str] = set()
+
+        for pattern in dict.fromkeys(patterns):
+            source = _wrap(pattern)
+            if source is None or group_names & pattern.groupindex.keys():
+                self._alone.append(pattern)
+                continue
+            group_names |= pattern.groupindex.keys()
+            sources.append(source)
+            self._patterns.append(pattern)
+
+        self._sources = sources
+        # Rules check whether their patterns are indexed for each event, so it is a set.
+        self._indexed = frozenset((*self._patterns, *self._alone))
+        self._combined: dict[int, re.Pattern[str]] = {}
+        self._keywords = frozenset(keywords)
+        self._automaton = AhoCorasick(self._keywords) if self._keywords else None
+
+    def __contains__(self, item: re.Pattern[str] | str) -> bool:
+        if isinstance(item, str):
+            return item in self._keywords
+        return item in self._indexed
+
+    def _get_combined(self, begin: int) -> re.Pattern[str]:
+        if (combined := self._combined.get(begin)) is None:
+            combined = re.compile('|'.join(
+                f'(?P<_shirasu_{i}>{source})' for i, source in enumerate(self._sources[begin:], begin)
+            ))
+            self._combined[begin] = combined
+        return combined
+
+    def scan(self, text: str) -> PatternScan:
+        """
+        Matches all patterns from the beginning of the text, and finds all keywords in it.
+        :param text: the text.
+        :return: the result.
+        """
+
+        matches: dict[re.Pattern[str], re.Match[str] | None] = dict.fromkeys(self._patterns)
+        begin = 0
+        while begin < len(self._patterns) and (m := self._get_combined(begin).match(text)):
+            # The wrapping group is the outermost one, so it is the last matched group.
+            index = int(str(m.lastgroup).removeprefix('_shirasu_'))
+            # Match it again to get the match object with its own groups.
+            pattern = self._patterns[index]
+            matches[pattern] = pattern.match(text)
+            begin = index + 1
+
+        for pattern in self._alone:
+            matches[pattern] = pattern.match(text)
+
+        return PatternScan(matches, self._automaton.find(text) if self._automaton else set())
@@ -0,0 +1,138 @@
+import gzip
+import time
+import ujson
+import struct
+import asyncio
+import statistics
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterator, cast
+from dataclasses import dataclass
+
+from .event import event_from_data
+
+if TYPE_CHECKING:
+    from .client import MockClient
+
+
+# Each frame is the received time and the length of payload, followed by the payload.
+_HEADER = struct.Struct('>dI')
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+class FrameRecorder:
+    """
+    The recorder to append raw frames to a compact log, which can be replayed by `replay`.
+    """
+
+    def __init__(self, path: str | Path, *, compress: bool = False) -> None:
+        """
+        Opens the log to append. Compressed frames are appended as a new gzip member,
+        so the log should not be switched between compressed and uncompressed.
+        :param path: the path to the log.
+        :param compress: whether to compress the log by gzip.
+        """
+
+        self._file = cast(BinaryIO, gzip.open(path, 'ab') if compress else open(path, 'ab'))
+
+    def write(self, frame: str | bytes, received: float | None = None) -> None:
+        """
+        Appends the frame.
+        :param frame: the raw frame.
+        :param received: optional, the received time, or now by default.
+        """
+
+        if isinstance(frame, str):
+            frame = frame.encode('utf8')
+        self._file.write(_HEADER.pack(time.time() if received is None else received, len(frame)))
+        self._file.write(frame)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_frames(path: str | Path) -> Iterator[tuple[float, bytes]]:
+    """
+    Reads frames from the log, whether it is compressed or not.
+    :param path: the path to the log.
+    :return: the received time and the payload of each frame.
+    """
+
+    with open(path, 'rb') as raw:
+        compressed = raw.read(2) == _GZIP_MAGIC
+
+    with gzip.open(path, 'rb') if compressed else open(path, 'rb') as f:
+        while header := f.read(_HEADER.size):
+            received, length = _HEADER.unpack(header)
+            yield received, f.read(length)
+
+
+@dataclass(frozen=True)
+class ReplayReport:
+    """
+    The report of replaying, where latencies are in seconds.
+    """
+
+    events: int
+    duration: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+    @property
+    def throughput(self) -> float:
+        return self.events / self.duration if self.duration else 0.
+
+    def __str__(self) -> str:
+        return (f'{self.events} events in {self.duration:.3f}s, {self.throughput:.1f} events/s, '
+                f'latency p50 {self.p50 * 1000:.2f}ms, p90 {self.p90 * 1000:.2f}ms, '
+                f'p99 {self.p99 * 1000:.2f}ms, max {self.max * 1000:.2f}ms')
+
+
+async def replay(client: 'MockClient', path: str | Path, *, speed: float = 1.) -> ReplayReport:
+    """
+    Replays the log through the client, keeping the intervals between frames divided by speed,
+    and measures the latency of the whole addon pipeline for each event, including parsing.
+    Action responses in the log are skipped.
+    :param client: the client.
+    :param path: the path to the log.
+    :param speed: the speed, for example, 2 for 2x, or 0 for the maximum speed.
+    :return: the report.
+    """
+
+    loop = asyncio.get_running_loop()
+    latencies: list[float] = []
+    tasks: set[asyncio.Task[None]] = set()
+
+    async def handle(frame: bytes, scheduled: float) -> None:
+        if 'echo' in (data := ujson.loads(frame)):
+            return
+
+        if event := event_from_data(data):
+            await client.post_event(event)
+            latencies.append(loop.time() - scheduled)
+
+    begin = loop.time()
+    first: float | None = None
+    for received, frame in read_frames(path):
+        if first is None:
+            first = received
+
+        scheduled = begin + (received - first) / speed if speed else loop.time()
+        if (delay := scheduled - loop.time()) > 0:
+            await asyncio.sleep(delay)
+
+        task = asyncio.create_task(handle(frame, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+    duration = loop.time() - begin
+    if not latencies:
+        return ReplayReport(0, duration, 0., 0., 0., 0.)
+
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return ReplayReport(len(latencies), duration, quantiles[49], quantiles[89], quantiles[98], max(latencies))
@@ -0,0 +1,367 @@
+import time
+import heapq
+import random
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Awaitable, Callable, cast
+
+from .logger import logger
+from .storage import Storage
+
+if TYPE_CHECKING:
+    from .addon import Addon, AddonPool
+
+
+class Trigger(ABC):
+    """
+    The trigger deciding when a job runs.
+    """
+
+    @abstractmethod
+    def next_after(self, t: float) -> float | None:
+        """
+        Gets the time of the next run.
+        :param t: the timestamp after which the job runs.
+        :return: the timestamp, or None if the job will never run again.
+        """
+
+        raise NotImplementedError()
+
+
+class Interval(Trigger):
+    def __init__(self, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError(f'the interval should be positive: {seconds}')
+        self._seconds = seconds
+
+    def next_after(self, t: float) -> float:
+        return t + self._seconds
+
+
+class At(Trigger):
+    def __init__(self, timestamp: float) -> None:
+        self._timestamp = timestamp
+
+    def next_after(self, t: float) -> float | None:
+        return self._timestamp if self._timestamp > t else None
+
+
+def _parse_field(field: str, low: int, high: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in field.split(','):
+        expr, _, step = part.partition('/')
+        if expr == '*':
+            begin, end = low, high
+        elif '-' in expr:
+            begin, end = map(int, expr.split('-', 1))
+        else:
+            begin = end = int(expr)
+
+        if not low <= begin <= end <= high or (step and int(step) <= 0):
+            raise ValueError(f'invalid cron field: {field}')
+        values.update(range(begin, end + 1, int(step or 1)))
+    return frozenset(values)
+
+
+class Cron(Trigger):
+    """
+    The trigger by a cron expression in local time, which consists of minute, hour, day of month,
+    month and day of week, where Sunday is 0 or 7. Each field supports `*`, `a`, `a-b`, steps like
+    `*/n` and lists like `a,b`. If both days are restricted, either of them matches.
+    """
+
+    def __init__(self, expr: str) -> None:
+        if len(fields := expr.split()) != 5:
+            raise ValueError(f'invalid cron expression: {expr}')
+
+        self._minutes = _parse_field(fields[0], 0, 59)
+        self._hours = _parse_field(fields[1], 0, 23)
+        self._days = _parse_field(fields[2], 1, 31)
+        self._months = _parse_field(fields[3], 1, 12)
+        # Convert to the weekday of Python, where Monday is 0.
+        self._weekdays = frozenset((d - 1) % 7 for d in _parse_field(fields[4], 0, 7))
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _match_day(self, dt: datetime) -> bool:
+        in_days, in_weekdays = dt.day in self._days, dt.weekday() in self._weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, t: float) -> float:
+        dt = datetime.fromtimestamp(t).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Any valid expression matches in 5 years, including February 29.
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self._months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._match_day(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self._hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self._minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError('the cron expression never matches')
+
+
+def every(seconds: float) -> Interval:
+    """
+    Runs the job every given seconds.
+    :param seconds: the interval.
+    :return: the trigger.
+    """
+
+    return Interval(seconds)
+
+
+def cron(expr: str) -> Cron:
+    """
+    Runs the job at the times matching the cron expression, see `Cron`.
+    :param expr: the cron expression, for example, `0 8 * * 1-5` for 8:00 on weekdays.
+    :return: the trigger.
+    """
+
+    return Cron(expr)
+
+
+def at(timestamp: float) -> At:
+    """
+    Runs the job once at the given time.
+    :param timestamp: the timestamp.
+    :return: the trigger.
+    """
+
+    return At(timestamp)
+
+
+class Job:
+    """
+    The job scheduled by `Scheduler`.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            trigger: Trigger,
+            func: Callable[[], Awaitable[None]],
+            jitter: float = 0.,
+            addon: str | None = None,
+    ) -> None:
+        self.name = name
+        self.trigger = trigger
+        self.func = func
+        self.jitter = jitter
+        self.addon = addon
+        self.scheduled: float | None = None
+        """
+        The time of the next run by the trigger.
+        """
+        self.next_run: float | None = None
+        """
+        The time of the next run with jitter.
+        """
+        self.running = False
+
+
+class Scheduler:
+    """
+    The scheduler running jobs of addons and jobs added at runtime, with one timer for the
+    earliest job in a heap. Times of next runs are saved in the storage, so that the jobs
+    missed when the bot is down run once it is started again. It is injected by `scheduler`.
+    """
+
+    _NAMESPACE = 'shirasu.scheduler'
+
+    def __init__(self, storage: Storage | None = None, *, max_concurrency: int = 4) -> None:
+        """
+        Initializes the scheduler.
+        :param storage: optional, the storage to save times of next runs.
+        :param max_concurrency: the max count of jobs running at the same time.
+        """
+
+        self._storage = storage
+        self._jobs: dict[str, Job] = {}
+        self._heap: list[tuple[float, int, Job]] = []
+        self._counter = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._running: set[asyncio.Task[None]] = set()
+        self._pool: AddonPool | None = None
+        self._synced: dict[str, tuple['Addon', str, Trigger, float]] = {}
+
+    @property
+    def jobs(self) -> dict[str, Job]:
+        return dict(self._jobs)
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def _schedule(self, job: Job, scheduled: float | None) -> None:
+        job.scheduled = scheduled
+        if scheduled is None:
+            # The job will never run again.
+            if self._jobs.get(job.name) is job:
+                del self._jobs[job.name]
+            job.next_run = None
+            return
+
+        job.next_run = scheduled + random.uniform(0, job.jitter)
+        self._counter += 1
+        heapq.heappush(self._heap, (job.next_run, self._counter, job))
+        self._wakeup.set()
+
+    def add(
+            self,
+            name: str,
+            trigger: Trigger,
+            func: Callable[[], Awaitable[None]],
+            *,
+            jitter: float = 0.,
+    ) -> Job:
+        """
+        Adds the job, which replaces the job with the same name.
+        :param name: the unique name of the job.
+        :param trigger: the trigger.
+        :param func: the job function.
+        :param jitter: the max random delay in seconds of each run.
+        :return: the job.
+        """
+
+        return self._add(Job(name, trigger, func, jitter))
+
+    def _add(self, job: Job) -> Job:
+        self.remove(job.name)
+        self._jobs[job.name] = job
+        self._schedule(job, job.trigger.next_after(time.time()))
+        return job
+
+    def remove(self, name: str) -> None:
+        """
+        Removes the job if it exists, and its running one is not affected.
+        :param name: the name of the job.
+        """
+
+        # Entries in the heap are skipped once their jobs are removed.
+        if job := self._jobs.pop(name, None):
+            job.scheduled = job.next_run = None
+
+    def _sync(self) -> None:
+        if not self._pool:
+            return
+
+        jobs = {f'{addon.name}.{name}': (addon, name, trigger, jitter)
+                for addon in self._pool.get_enabled_addons() for name, (trigger, jitter) in addon.jobs.items()}
+        if jobs == self._synced:
+            return
+        self._synced = jobs
+
+        for name in [name for name, job in self._jobs.items() if job.addon and name not in jobs]:
+            self.remove(name)
+
+        for name, (addon, job_name, trigger, jitter) in jobs.items():
+            func = _job_func(addon, job_name)
+            if (job := self._jobs.get(name)) and job.addon and job.trigger is trigger:
+                # Keep the time of next run of the reloaded or re-enabled addon.
+                job.func = func
+            else:
+                self._add(Job(name, trigger, func, jitter, addon.name))
+
+    async def start(self, pool: 'AddonPool | None' = None) -> None:
+        """
+        Starts running jobs, and runs the jobs missed since the last time once.
+        Jobs of addons get the client injected, so it should be started after the client is created.
+        :param pool: optional, the pool whose enabled addons' jobs are scheduled, following changes of the pool.
+            Jobs of lazy addons are scheduled once their modules are imported.
+        """
+
+        self._pool = pool
+        self._sync()
+        now = time.time()
+        if self._storage:
+            for job in list(self._jobs.values()):
+                if (saved := await self._storage.get(self._NAMESPACE, job.name)) is not None:
+                    # All missed runs are merged into one run now.
+                    self._schedule(job, max(saved, now))
+        self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        """
+        Stops the timer and cancels running jobs.
+        """
+
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in self._running:
+            task.cancel()
+
+    async def _loop(self) -> None:
+        while True:
+            self._sync()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, job = heapq.heappop(self._heap)
+                # Skip entries replaced by later ones, and removed jobs.
+                if job.next_run != due:
+                    continue
+
+                self._spawn(job)
+                # Runs missed while the loop was blocked are merged into this one.
+                scheduled = job.trigger.next_after(cast(float, job.scheduled))
+                while scheduled is not None and scheduled <= now:
+                    scheduled = job.trigger.next_after(scheduled)
+                self._schedule(job, scheduled)
+                await self._save(job)
+
+            self._wakeup.clear()
+            # Wake up at least every second to follow changes of the pool.
+            timeout = min(self._heap[0][0] - now, 1.) if self._heap else 1.
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _save(self, job: Job) -> None:
+        if not self._storage:
+            return
+        if job.scheduled is None:
+            await self._storage.delete(self._NAMESPACE, job.name)
+        else:
+            await self._storage.set(self._NAMESPACE, job.name, job.scheduled)
+
+    def _spawn(self, job: Job) -> None:
+        if job.running:
+            logger.warning(f'Skipping job {job.name} because its last run has not finished.')
+            return
+
+        task = asyncio.create_task(self._run(job))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, job: Job) -> None:
+        job.running = True
+        try:
+            async with self._semaphore:
+                await job.func()
+        except Exception:
+            logger.exception(f'Failed to run job {job.name}.')
+        finally:
+            job.running = False
+
+    async def run(self, name: str) -> None:
+        """
+        Runs the job now regardless of its trigger, which is useful for testing.
+        :param name: the name of the job.
+        """
+
+        await self._run(self._jobs[name])
+
+
+def _job_func(addon: 'Addon', name: str) -> Callable[[], Awaitable[None]]:
+    return lambda: addon.do_job(name)
@@ -0,0 +1,243 @@
+import time
+import ujson
+import random
+import asyncio
+from typing import Any, Callable, Literal
+from websockets.exceptions import ConnectionClosed
+from websockets.legacy.server import serve, WebSocketServer, WebSocketServerProtocol
+
+from .logger import logger
+
+
+ActionHandler = Callable[[dict[str, Any]], Any]
+
+
+class OneBotServer:
+    """
+    The local stand-in of OneBot v11 implementations, which speaks the real websocket protocol,
+    so that `OneBotClient` can be tested and benchmarked end to end, including JSON encoding,
+    correlation of action responses and websocket framing.
+
+    >>> async with OneBotServer(latency=.01, failure_rate=.1) as server:
+    >>>     ...  # Connect to server.url, then post events by server.post_message.
+    """
+
+    def __init__(
+            self,
+            *,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            self_id: int = 1883,
+            latency: float | tuple[float, float] = 0.,
+            failure_rate: float = 0.,
+            seed: int | None = None,
+    ) -> None:
+        """
+        Initializes the server.
+        :param host: the host to bind.
+        :param port: the port to bind, or 0 for a random one.
+        :param self_id: the account of the bot.
+        :param latency: the latency in seconds of answering actions, or the range of random latency.
+        :param failure_rate: the probability of answering actions with failure.
+        :param seed: optional, the random seed of latency and failures.
+        """
+
+        self._host = host
+        self._port = port
+        self._self_id = self_id
+        self._latency = latency
+        self._failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._server: WebSocketServer | None = None
+        self._clients: set[WebSocketServerProtocol] = set()
+        self._connected = asyncio.Event()
+        self._message_id = 0
+        self._handlers: dict[str, ActionHandler] = {
+            'send_msg': self._handle_send_msg,
+            'get_login_info': lambda _: {'user_id': self._self_id, 'nickname': 'shirasu'},
+        }
+        self.actions: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        """
+        The actions called by clients, with their parameters.
+        """
+        self.connections = 0
+        """
+        The count of connections accepted, including closed ones.
+        """
+
+    @property
+    def url(self) -> str:
+        if not self._server:
+            raise RuntimeError('the server is not started')
+        host, port = next(iter(self._server.sockets)).getsockname()[:2]
+        return f'ws://{host}:{port}'
+
+    def on(self, action: str, handler: ActionHandler) -> None:
+        """
+        Registers the handler of the action, whose return value is the data of response.
+        Unknown actions are answered with failure.
+        :param action: the action.
+        :param handler: the handler, which takes the parameters.
+        """
+
+        self._handlers[action] = handler
+
+    def _next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    def _handle_send_msg(self, _: dict[str, Any]) -> dict[str, Any]:
+        return {'message_id': self._next_message_id()}
+
+    async def start(self) -> None:
+        self._server = await serve(self._serve, self._host, self._port)
+        logger.success(f'OneBot server is listening on {self.url}.')
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> 'OneBotServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.close()
+
+    async def disconnect(self, code: int = 1001, reason: str = 'going away') -> None:
+        """
+        Closes all connections cleanly, like an implementation restarting.
+        :param code: the close code.
+        :param reason: the close reason.
+        """
+
+        await asyncio.gather(*(ws.close(code, reason) for ws in list(self._clients)))
+
+    async def wait_connected(self) -> None:
+        """
+        Waits until a client is connected.
+        """
+
+        await self._connected.wait()
+
+    async def _serve(self, ws: WebSocketServerProtocol, _: str) -> None:
+        self._clients.add(ws)
+        self.connections += 1
+        self._connected.set()
+        tasks: set[asyncio.Task[None]] = set()
+        try:
+            await ws.send(ujson.dumps(self._meta_event('lifecycle', sub_type='connect')))
+            async for frame in ws:
+                task = asyncio.create_task(self._answer(ws, ujson.loads(frame)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionClosed:
+            pass
+        finally:
+            self._clients.discard(ws)
+            if not self._clients:
+                self._connected.clear()
+
+    async def _answer(self, ws: WebSocketServerProtocol, frame: dict[str, Any]) -> None:
+        action, params = frame.get('action', ''), frame.get('params', {})
+        await self.actions.put({'action': action, **params})
+
+        latency = self._random.uniform(*self._latency) if isinstance(self._latency, tuple) else self._latency
+        if latency:
+            await asyncio.sleep(latency)
+
+        if (handler := self._handlers.get(action)) is None:
+            response = {'status': 'failed', 'retcode': 1404, 'msg': 'API_NOT_FOUND', 'wording': 'unknown action'}
+        elif self._random.random() < self._failure_rate:
+            response = {'status': 'failed', 'retcode': 100, 'msg': 'SIMULATED_FAILURE', 'wording': 'simulated failure'}
+        else:
+            response = {'status': 'ok', 'retcode': 0, 'data': handler(params)}
+
+        if 'echo' in frame:
+            response['echo'] = frame['echo']
+
+        try:
+            await ws.send(ujson.dumps(response))
+        except ConnectionClosed:
+            pass
+
+    def _event(self, post_type: str, **params: Any) -> dict[str, Any]:
+        return {'time': int(time.time()), 'self_id': self._self_id, 'post_type': post_type, **params}
+
+    def _meta_event(self, meta_event_type: str, **params: Any) -> dict[str, Any]:
+        return self._event('meta_event', meta_event_type=meta_event_type, **params)
+
+    async def post_event(self, data: dict[str, Any]) -> None:
+        """
+        Posts the raw event to all connected clients.
+        :param data: the event data.
+        """
+
+        frame = ujson.dumps(data)
+        await asyncio.gather(*(ws.send(frame) for ws in self._clients), return_exceptions=True)
+
+    async def post_message(
+            self,
+            raw_message: str,
+            message_type: Literal['private', 'group'] = 'private',
+            *,
+            user_id: int = 1884,
+            group_id: int = 1885,
+            message_id: int | None = None,
+    ) -> int:
+        """
+        Posts a message event.
+        :param raw_message: the message in CQ code.
+        :param message_type: the message type.
+        :param user_id: the sender.
+        :param group_id: the group, only for group messages.
+        :param message_id: optional, the message id to post a message again, or a new one by default.
+        :return: the message id.
+        """
+
+        message_id = message_id or self._next_message_id()
+        await self.post_event(self._event(
+            'message',
+            message_type=message_type,
+            sub_type='friend' if message_type == 'private' else 'normal',
+            message_id=message_id,
+            user_id=user_id,
+            message=raw_message,
+            raw_message=raw_message,
+            font=0,
+            sender={'user_id': user_id, 'nickname': f'user {user_id}'},
+            **({'group_id': group_id} if message_type == 'group' else {}),
+        ))
+        return message_id
+
+    async def post_heartbeat(self, interval: int = 5000) -> None:
+        """
+        Posts a heartbeat meta event.
+        :param interval: the interval of heartbeats in milliseconds.
+        """
+
+        await self.post_event(self._meta_event('heartbeat', interval=interval, status={'online': True, 'good': True}))
+
+    async def generate_load(self, messages: list[str], count: int, rate: float = 0.) -> float:
+        """
+        Posts message events picked from messages randomly, from random users and groups.
+        :param messages: the messages to pick.
+        :param count: the count of events.
+        :param rate: the events per second, or 0 to post them as fast as possible.
+        :return: the elapsed seconds.
+        """
+
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        for i in range(count):
+            if rate and (delay := begin + i / rate - loop.time()) > 0:
+                await asyncio.sleep(delay)
+            await self.post_message(
+                self._random.choice(messages),
+                self._random.choice(['private', 'group']),
+                user_id=self._random.randrange(10000, 20000),
+                group_id=self._random.randrange(20000, 20100),
+            )
+        return loop.time() - begin
@@ -0,0 +1,243 @@
+import ujson
+import sqlite3
+import asyncio
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from .logger import logger
+
+
+T = TypeVar('T')
+
+_Key = tuple[str, str]
+
+_MISSING: Any = object()
+
+
+class Storage:
+    """
+    The persistent key-value storage backed by SQLite in WAL mode.
+
+    All database operations run on a dedicated thread, so they never block the event loop.
+    Writes are batched into one transaction, and reads go through an LRU cache, which also
+    remembers absent keys. Values are encoded as JSON, so they should be JSON-serializable.
+    """
+
+    def __init__(
+            self,
+            path: str | Path,
+            *,
+            cache_size: int = 4096,
+            batch_size: int = 256,
+            flush_interval: float = .1,
+    ) -> None:
+        """
+        Initializes the storage. The database is opened when it is used for the first time.
+        :param path: the path to the database, or `:memory:` for a temporary one.
+        :param cache_size: the max count of cached keys.
+        :param batch_size: the max count of pending writes before flushing them.
+        :param flush_interval: the max delay in seconds before flushing pending writes.
+        """
+
+        self._path = str(path)
+        self._cache_size = cache_size
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shirasu-storage')
+        self._conn: sqlite3.Connection | None = None
+        # Encoded values, and None for absent keys.
+        self._cache: OrderedDict[_Key, str | None] = OrderedDict()
+        self._pending: dict[_Key, str | None] = {}
+        # The counts of reads in progress, and the keys written while being read, whose rows are stale.
+        self._reading: dict[_Key, int] = {}
+        self._written_while_reading: set[_Key] = set()
+        self._flush_task: asyncio.Task[None] | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._conn:
+            self._conn = sqlite3.connect(self._path)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS kv ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                'PRIMARY KEY (namespace, key)) WITHOUT ROWID'
+            )
+        return self._conn
+
+    async def _run(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, lambda: func(self._connect()))
+
+    def _cache_put(self, key: _Key, value: str | None) -> None:
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    async def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """
+        Gets the value.
+        :param namespace: the namespace.
+        :param key: the key.
+        :param default: the value returned if the key is absent.
+        :return: the value.
+        """
+
+        k = namespace, key
+        while (value := self._pending.get(k, _MISSING)) is _MISSING:
+            if (value := self._cache.get(k, _MISSING)) is not _MISSING:
+                self._cache.move_to_end(k)
+                break
+            # If the key is written while reading it, the row is stale, and the new value is looked up again.
+            if (value := await self._read(k)) is not _MISSING:
+                self._cache_put(k, value)
+                break
+
+        return default if value is None else ujson.loads(value)
+
+    async def _read(self, k: _Key) -> Any:
+        """
+        Reads the encoded value from the database, or `_MISSING` if the key is written meanwhile.
+        """
+
+        self._reading[k] = self._reading.get(k, 0) + 1
+        try:
+            row = await self._run(lambda conn: conn.execute(
+                'SELECT value FROM kv WHERE namespace = ? AND key = ?', k
+            ).fetchone())
+        finally:
+            stale = k in self._written_while_reading
+            if count := self._reading.pop(k) - 1:
+                self._reading[k] = count
+            else:
+                self._written_while_reading.discard(k)
+        if stale:
+            return _MISSING
+        return row[0] if row else None
+
+    def _write(self, namespace: str, key: str, value: str | None) -> None:
+        if (namespace, key) in self._reading:
+            self._written_while_reading.add((namespace, key))
+        self._pending[namespace, key] = value
+        self._cache_put((namespace, key), value)
+
+        if len(self._pending) >= self._batch_size:
+            self._flush_task = asyncio.create_task(self.flush())
+        elif not self._flush_task or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def set(self, namespace: str, key: str, value: Any) -> None:
+        """
+        Sets the value, which will be written to the database later.
+        :param namespace: the namespace.
+        :param key: the key.
+        :param value: the JSON-serializable value.
+        """
+
+        self._write(namespace, key, ujson.dumps(value))
+
+    async def delete(self, namespace: str, key: str) -> None:
+        """
+        Deletes the key, which will be deleted from the database later.
+        :param namespace: the namespace.
+        :param key: the key.
+        """
+
+        self._write(namespace, key, None)
+
+    async def keys(self, namespace: str) -> list[str]:
+        """
+        Gets all keys in the namespace.
+        :param namespace: the namespace.
+        :return: the keys.
+        """
+
+        await self.flush()
+        rows = await self._run(lambda conn: conn.execute(
+            'SELECT key FROM kv WHERE namespace = ? ORDER BY key', (namespace,)
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self._flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Writes all pending writes to the database in one transaction.
+        """
+
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+
+        def write(conn: sqlite3.Connection) -> None:
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)',
+                    [(*k, v) for k, v in pending.items() if v is not None],
+                )
+                conn.executemany(
+                    'DELETE FROM kv WHERE namespace = ? AND key = ?',
+                    [k for k, v in pending.items() if v is None],
+                )
+
+        try:
+            await self._run(write)
+        except Exception:
+            # Keep the failed writes unless they are overwritten, so that they can be retried.
+            self._pending = pending | self._pending
+            logger.exception('Failed to flush the storage.')
+            raise
+
+    async def close(self) -> None:
+        """
+        Flushes pending writes and closes the database.
+        """
+
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+        if self._conn:
+            await self._run(lambda conn: conn.close())
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+    def namespace(self, namespace: str) -> 'StorageNamespace':
+        """
+        Gets the view of the namespace.
+        :param namespace: the namespace.
+        :return: the view.
+        """
+
+        return StorageNamespace(self, namespace)
+
+
+class StorageNamespace:
+    """
+    The view of a namespace in the storage. Each addon gets the namespace of its name by DI.
+    """
+
+    def __init__(self, storage: Storage, namespace: str) -> None:
+        self._storage = storage
+        self._namespace = namespace
+
+    @property
+    def namespace(self) -> str:
+        return self._namespace
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return await self._storage.get(self._namespace, key, default)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._storage.set(self._namespace, key, value)
+
+    async def delete(self, key: str) -> None:
+        await self._storage.delete(self._namespace, key)
+
+    async def keys(self) -> list[str]:
+        return await self._storage.keys(self._namespace)
@@ -1,10 +1,18 @@
 from .future_table import FutureTable as FutureTable
 from .asyncify import asyncify as asyncify
 from .retry import retry as retry
+from .watch import FileWatcher as FileWatcher
+from .aho_corasick import AhoCorasick as AhoCorasick
+from .dedup import DedupWindow as DedupWindow
+from .token_bucket import TokenBuckets as TokenBuckets
 
 
 __all__ = [
     'FutureTable',
     'asyncify',
     'retry',
+    'FileWatcher',
+    'AhoCorasick',
+    'DedupWindow',
+    'TokenBuckets',
 ]
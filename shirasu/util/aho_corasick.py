@@ -0,0 +1,63 @@
+from collections import deque
+from typing import Iterable
+
+
+class AhoCorasick:
+    """
+    The Aho-Corasick automaton to find all keywords in the text in a single pass.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        """
+        Builds the automaton.
+        :param keywords: the keywords to find, and empty ones are ignored.
+        """
+
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[set[str]] = [set()]
+
+        for keyword in keywords:
+            if keyword:
+                self._add(keyword)
+        self._build()
+
+    def _add(self, keyword: str) -> None:
+        state = 0
+        for char in keyword:
+            if (next_state := self._goto[state].get(char)) is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = next_state
+        self._output[state].add(keyword)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> set[str]:
+        """
+        Finds the keywords in the text.
+        :param text: the text.
+        :return: the keywords found.
+        """
+
+        found: set[str] = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found |= self._output[state]
+        return found
@@ -0,0 +1,40 @@
+import time
+from typing import Hashable
+
+
+class DedupWindow:
+    """
+    The window to find keys seen recently. Keys are kept in two generations, and the older one
+    is dropped once the newer one is older than the ttl or full, so that it takes O(1) time and
+    bounded memory. A key is remembered for at least the ttl unless the window is full.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 65536) -> None:
+        """
+        Initializes the window.
+        :param ttl: the time in seconds to remember keys.
+        :param max_size: the max count of keys in each generation.
+        """
+
+        self._ttl = ttl
+        self._max_size = max_size
+        self._current: set[Hashable] = set()
+        self._previous: set[Hashable] = set()
+        self._rotated = time.monotonic()
+
+    def seen(self, key: Hashable) -> bool:
+        """
+        Checks whether the key is seen in the window, and remembers it.
+        :param key: the key.
+        :return: whether it is seen.
+        """
+
+        if key in self._current or key in self._previous:
+            return True
+
+        now = time.monotonic()
+        if len(self._current) >= self._max_size or now - self._rotated > self._ttl:
+            self._previous, self._current = self._current, set()
+            self._rotated = now
+        self._current.add(key)
+        return False
@@ -14,9 +14,27 @@ class FutureTable:
         return self._future_id
 
     def set(self, echo: int, data: dict[str, Any]) -> None:
-        if future := self._futures.get(echo):
+        if (future := self._futures.get(echo)) and not future.done():
             future.set_result(data)
 
+    def discard(self, future_id: int) -> None:
+        """
+        Removes the future whose request is never sent.
+        :param future_id: the future id.
+        """
+
+        self._futures.pop(future_id, None)
+
+    def fail_all(self, exception: BaseException) -> None:
+        """
+        Fails all pending futures, so that callers do not wait for responses that never come.
+        :param exception: the exception to raise in callers.
+        """
+
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(exception)
+
     async def get(self, future_id: int, timeout: float) -> dict[str, Any]:
         if not (future := self._futures.get(future_id)):
             raise KeyError(f'future id {future_id} does not exist')
@@ -1,22 +1,46 @@
+import random
 import asyncio
 import functools
 from typing import Type, Callable, Any
 from ..logger import logger_deco
 
 
-def retry(*, timeout: float, messages: dict[Type[BaseException], str]) -> Callable[[Any], Any]:
+def retry(
+        *,
+        timeout: float,
+        messages: dict[Type[BaseException], str],
+        max_timeout: float | None = None,
+        jitter: float = 0.,
+) -> Callable[[Any], Any]:
+    """
+    Retries the coroutine function when it raises the exceptions in messages, including their subclasses.
+    :param timeout: the delay in seconds before the first retry.
+    :param messages: the exception types and the messages to log, and the first matched one is used.
+    :param max_timeout: optional, the delay doubles after each retry up to it, or it is fixed by default.
+        The delay is reset once an attempt has run for longer than it, e.g. a connection that was healthy.
+    :param jitter: the share of the delay to be randomly cut, so that clients do not retry at the same time.
+    """
+
     def wrapper(f: Any) -> Any:
         @functools.wraps(f)
         async def inner(*args: Any, **kwargs: Any) -> Any:
+            loop = asyncio.get_running_loop()
+            delay = timeout
             while True:
+                begin = loop.time()
                 try:
                     return await f(*args, **kwargs)
                 except BaseException as e:
-                    if not (msg := messages.get(e.__class__)):
+                    if not (msg := next((m for t, m in messages.items() if isinstance(e, t)), None)):
                         raise
 
-                    logger_deco(f).warning(f'{msg}, retrying in {timeout} seconds.')
-                    await asyncio.sleep(timeout)
+                    if max_timeout is not None and loop.time() - begin > max_timeout:
+                        delay = timeout
+                    sleep = delay * (1 - random.uniform(0, jitter))
+                    logger_deco(f).warning(f'{msg}, retrying in {sleep:.2f} seconds.')
+                    await asyncio.sleep(sleep)
+                    if max_timeout is not None:
+                        delay = min(delay * 2, max_timeout)
         return inner
 
     return wrapper
@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TokenBuckets:
+    """
+    The store of token buckets by keys with bounded memory. The least recently used bucket
+    is dropped when it is full, and a dropped bucket is regarded as full when used again.
+    """
+
+    def __init__(self, max_size: int = 65536) -> None:
+        """
+        Initializes the store.
+        :param max_size: the max count of buckets.
+        """
+
+        self._max_size = max_size
+        # The tokens and the time they are counted.
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _tokens(self, key: Hashable, capacity: float, rate: float, now: float) -> float:
+        if (bucket := self._buckets.get(key)) is None:
+            return capacity
+        tokens, counted = bucket
+        return min(capacity, tokens + (now - counted) * rate)
+
+    def peek(self, key: Hashable, capacity: float, rate: float) -> bool:
+        """
+        Checks whether there is a token without taking it.
+        :param key: the key of the bucket.
+        :param capacity: the max count of tokens.
+        :param rate: the tokens added per second.
+        :return: whether there is a token.
+        """
+
+        return self._tokens(key, capacity, rate, time.monotonic()) >= 1
+
+    def acquire(self, key: Hashable, capacity: float, rate: float) -> bool:
+        """
+        Takes a token if there is one.
+        :param key: the key of the bucket.
+        :param capacity: the max count of tokens.
+        :param rate: the tokens added per second.
+        :return: whether the token is taken.
+        """
+
+        now = time.monotonic()
+        if (tokens := self._tokens(key, capacity, rate, now)) < 1:
+            return False
+
+        self._buckets[key] = tokens - 1, now
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self._max_size:
+            self._buckets.popitem(last=False)
+        return True
@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import Iterable
+
+
+class FileWatcher:
+    """
+    Detects changes of files by polling their modification time,
+    so that no third-party dependency is required.
+    """
+
+    def __init__(self) -> None:
+        self._mtimes: dict[Path, float] = {}
+
+    @staticmethod
+    def _mtime(path: Path) -> float:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return -1.
+
+    def watch(self, path: Path) -> None:
+        """
+        Starts watching the file, remembering its current modification time.
+        :param path: the file to watch.
+        """
+
+        self._mtimes[path] = self._mtime(path)
+
+    def unwatch(self, path: Path) -> None:
+        """
+        Stops watching the file.
+        :param path: the file to stop watching.
+        """
+
+        self._mtimes.pop(path, None)
+
+    def changed(self, paths: Iterable[Path] | None = None) -> list[Path]:
+        """
+        Gets the files modified since the last check. Files that are not watched
+        yet will be watched and considered as unchanged.
+        :param paths: optional, the files to check, or all watched files by default.
+        :return: the modified files.
+        """
+
+        result = []
+        for path in list(self._mtimes) if paths is None else paths:
+            mtime = self._mtime(path)
+            if self._mtimes.setdefault(path, mtime) != mtime:
+                self._mtimes[path] = mtime
+                result.append(path)
+        return result
@@ -1,8 +1,9 @@
 import pytest
 import asyncio
-from shirasu import MockClient, AddonPool, at
+from shirasu import Addon, Client, MockClient, AddonPool, at, command, cooldown, rate_limit
 from shirasu.config import GlobalConfig
-from shirasu.event import MOCK_SELF_ID, MOCK_USER_ID
+from shirasu.event import MOCK_SELF_ID, MOCK_USER_ID, MOCK_GROUP_ID
+from shirasu.storage import Storage
 from shirasu.addon import (
     DuplicateAddonError,
     LoadAddonError,
@@ -120,3 +121,202 @@ async def test_manage() -> None:
     await client.post_message('/echo foo')
     foo_msg = await client.get_message()
     assert foo_msg.plain_text == 'foo'
+
+
+@pytest.mark.asyncio
+async def test_manage_scoped() -> None:
+    pool = AddonPool.from_modules(
+        'shirasu.addons.echo',
+        'shirasu.addons.manage',
+    )
+    config = GlobalConfig(superusers=[MOCK_USER_ID])
+    storage = Storage(':memory:')
+    client = MockClient(pool, config, storage)
+
+    for invalid_command in ('/manage disable echo group', '/manage disable echo group a', '/manage reload echo here'):
+        await client.post_message(invalid_command)
+        rejected_msg = await client.get_message_event()
+        assert rejected_msg.is_rejected
+
+    # The setting for the user would apply in all groups, which is not here.
+    await client.post_message('/manage disable echo here')
+    assert (await client.get_message_event()).is_rejected
+    await client.post_message('/echo foo', message_type='group')
+    assert (await client.get_message()).plain_text == 'foo'
+
+    await client.post_message('/manage disable echo here', message_type='group')
+    disabled_msg = await client.get_message_event()
+    assert not disabled_msg.is_rejected
+
+    # Disabled in the group only.
+    await client.post_message('/echo foo', message_type='group')
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_message()
+    await client.post_message('/echo foo', message_type='group', group_id=MOCK_GROUP_ID + 1)
+    assert (await client.get_message()).plain_text == 'foo'
+    await client.post_message('/echo foo')
+    assert (await client.get_message()).plain_text == 'foo'
+
+    # The user is allowed everywhere, which goes before the group.
+    await client.post_message(f'/manage enable echo user {MOCK_USER_ID}')
+    await client.get_message_event()
+    await client.post_message('/echo foo', message_type='group')
+    assert (await client.get_message()).plain_text == 'foo'
+
+    await client.post_message('/manage disable echo global')
+    await client.get_message_event()
+    await client.post_message('/echo foo', user_id=MOCK_USER_ID + 1)
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_message()
+
+    # Settings are restored from the storage by another pool.
+    restored = AddonPool.from_modules('shirasu.addons.echo')
+    await restored.load_enablement(storage)
+    assert restored.get_addon_disabled('echo')
+    assert restored.get_addon_disabled('echo', group_id=MOCK_GROUP_ID)
+    assert not restored.get_addon_disabled('echo', group_id=MOCK_GROUP_ID, user_id=MOCK_USER_ID)
+    assert not restored.get_addon_disabled('echo', user_id=MOCK_USER_ID)
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_enablement_concurrent() -> None:
+    storage = Storage(':memory:')
+    first = AddonPool.from_modules('shirasu.addons.echo', 'shirasu.addons.square')
+    second = AddonPool.from_modules('shirasu.addons.echo', 'shirasu.addons.square')
+
+    # Two processes change global settings of different addons at the same time.
+    first.set_addon_disabled('echo', True)
+    second.set_addon_disabled('square', True)
+    await first.save_enablement(storage)
+    await second.save_enablement(storage)
+    for pool in (first, second):
+        await pool.load_enablement(storage)
+        assert pool.get_addon_disabled('echo') and pool.get_addon_disabled('square')
+
+    # Enabling is reloaded by the other one too.
+    first.set_addon_disabled('echo', False)
+    await first.save_enablement(storage)
+    await second.load_enablement(storage)
+    assert not second.get_addon_disabled('echo') and second.get_addon_disabled('square')
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_help_split() -> None:
+    pool = AddonPool.from_modules(
+        'shirasu.addons.echo',
+        'shirasu.addons.help',
+        'shirasu.addons.manage',
+        'shirasu.addons.square',
+    )
+    config = GlobalConfig(max_message_length=30)
+    client = MockClient(pool, config)
+    pool.set_addon_disabled('echo', True, group_id=MOCK_GROUP_ID)
+
+    await client.post_message('/help', message_type='group')
+    first, second = await client.get_message(), await client.get_message()
+    assert first.plain_text == 'echo disabled\nhelp enabled'
+    assert second.plain_text == 'manage enabled\nsquare enabled'
+
+    config.addons = {'help': {'forward_addon_list': True}}
+    client.update_config(config)
+    await client.post_message('/help')
+    forward = await client.get_message()
+    assert [seg.type for seg in forward.segments] == ['node', 'node']
+    assert forward.segments[0].data['content'] == {'type': 'text', 'data': {'text': 'echo enabled\nhelp enabled'}}
+
+
+@pytest.mark.asyncio
+async def test_priority_block() -> None:
+    pool = AddonPool.from_modules(
+        'shirasu.addons.echo',
+        'shirasu.addons.reject_tome',
+    )
+    client = MockClient(pool)
+
+    # The echo blocks the event, so reject_tome with lower priority should not receive it.
+    await client.post_message('/echo hello')
+    echo_msg = await client.get_message_event()
+    assert echo_msg.message.plain_text == 'hello'
+    assert not echo_msg.is_rejected
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_message()
+
+    # Nothing in the first tier received it, so reject_tome still works.
+    await client.post_message('hello')
+    rejected_msg = await client.get_message_event()
+    assert rejected_msg.is_rejected
+
+
+def test_priority_order() -> None:
+    pool = AddonPool.from_modules(
+        'shirasu.addons.reject_tome',
+        'shirasu.addons.echo',
+        'shirasu.addons.square',
+    )
+    assert [addon.name for addon in pool.get_addons()] == ['echo', 'square', 'reject_tome']
+
+
+@pytest.mark.asyncio
+async def test_cached_config() -> None:
+    pool = AddonPool.from_modules('shirasu.addons.square')
+    config = GlobalConfig(addons={'square': {'precision': 3}})
+    client = MockClient(pool, config)
+
+    await client.post_message('/square 1.0001')
+    assert (await client.get_message()).plain_text == '1'
+
+    square = pool.get_addon('square')
+    assert square
+    square_config = square.get_config(config)
+    assert square_config is square.get_config(config)
+    with pytest.raises(TypeError):
+        square_config.precision = 4  # type: ignore[attr-defined]
+
+    # The configurations are validated again only when they are reloaded.
+    config.addons['square']['precision'] = 4
+    await client.post_message('/square 1.0001')
+    assert (await client.get_message()).plain_text == '1'
+
+    pool.reload_config(config)
+    await client.post_message('/square 1.0001')
+    assert (await client.get_message()).plain_text == '1.0002'
+
+
+limited = Addon(name='limited', usage='/limited', description='Rate limited.')
+
+
+@limited.receive(rate_limit(2, 60) & command('limited') | cooldown(60, scope='group') & command('cooled'))
+async def handle_limited(client: Client) -> None:
+    await client.send('ok')
+
+
+@pytest.mark.asyncio
+async def test_rate_limit() -> None:
+    client = MockClient(AddonPool().load(limited))
+
+    # Messages not matching the whole rule do not take tokens.
+    for _ in range(3):
+        await client.post_message('hello')
+    for _ in range(2):
+        await client.post_message('/limited')
+        assert (await client.get_message()).plain_text == 'ok'
+    await client.post_message('/limited')
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_message()
+
+    # Limits are separate for each user.
+    await client.post_message('/limited', user_id=1)
+    assert (await client.get_message()).plain_text == 'ok'
+
+    # The cooldown is shared by the group.
+    await client.post_message('/cooled', 'group', user_id=1)
+    assert (await client.get_message()).plain_text == 'ok'
+    await client.post_message('/cooled', 'group', user_id=2)
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_message()
+
+    # The cooldown does not take tokens of the rate limit in the other branch.
+    await client.post_message('/limited', user_id=1)
+    assert (await client.get_message()).plain_text == 'ok'
@@ -0,0 +1,96 @@
+import pytest
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from shirasu import AddonPool, MockClient
+from shirasu.client import BroadcastResult, BroadcastTarget, ClientActionError
+from shirasu.storage import Storage
+from shirasu.util import token_bucket
+
+
+class FlakyClient(MockClient):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.failing: set[int] = set()
+        self.sent: list[int] = []
+        self.latency = 0.
+
+    async def send_msg(self, **params: Any) -> int:
+        target_id = params['group_id'] or params['user_id']
+        await asyncio.sleep(self.latency)
+        if target_id in self.failing:
+            raise ClientActionError({'msg': 'SIMULATED_FAILURE'})
+        self.sent.append(target_id)
+        return await super().send_msg(**params)
+
+
+@pytest.mark.asyncio
+async def test_broadcast() -> None:
+    client = FlakyClient(AddonPool())
+    targets: list[BroadcastTarget] = [('group', i) for i in range(1, 51)] + [('private', 100)]
+    results = [result async for result in client.broadcast('hello', targets, concurrency=8, rate=0)]
+    assert sorted(r.target for r in results) == sorted(targets)
+    assert all(r.ok for r in results)
+
+    msg = await client.get_message_event()
+    assert msg.message.plain_text == 'hello'
+
+
+@pytest.mark.asyncio
+async def test_broadcast_rate(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The clock of the buckets only moves when it is told to, so the pacing does not depend on the load.
+    now = 0.
+    monkeypatch.setattr(token_bucket, 'time', SimpleNamespace(monotonic=lambda: now))
+    client = FlakyClient(AddonPool())
+
+    async def collect() -> list[BroadcastResult]:
+        return [result async for result in client.broadcast('hello', [('group', i) for i in range(1, 16)], rate=10)]
+
+    task = asyncio.create_task(collect())
+    try:
+        # A burst of 10 is allowed at once.
+        await asyncio.sleep(.3)
+        assert len(client.sent) == 10
+
+        # The other 5 are allowed in 0.5 seconds.
+        now += .5
+        assert len(await asyncio.wait_for(task, 5)) == 15
+    finally:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resume() -> None:
+    storage = Storage(':memory:')
+    client = FlakyClient(AddonPool(), storage=storage)
+    client.failing = {3, 4}
+    targets: list[BroadcastTarget] = [('group', i) for i in range(1, 6)]
+
+    results = [result async for result in client.broadcast('hello', targets, key='news')]
+    assert {r.target[1] for r in results if not r.ok} == {3, 4}
+    assert isinstance(next(r for r in results if not r.ok).error, ClientActionError)
+
+    # Only the failed targets are sent again.
+    client.failing.clear()
+    client.sent.clear()
+    results = [result async for result in client.broadcast('hello', targets, key='news')]
+    assert sorted(r.target[1] for r in results) == [3, 4]
+    assert sorted(client.sent) == [3, 4]
+
+    # The progress is removed once all targets are sent.
+    assert await storage.keys('shirasu.broadcast.news') == []
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_close() -> None:
+    client = FlakyClient(AddonPool())
+    client.latency = .01
+    results = client.broadcast('hello', [('group', i) for i in range(1, 101)], concurrency=2, rate=0)
+    async for _ in results:
+        break
+    await results.aclose()
+
+    # Pending sends are canceled.
+    await asyncio.sleep(.05)
+    assert len(client.sent) < 5
@@ -0,0 +1,30 @@
+import pytest
+from shirasu import MockClient, AddonPool
+from shirasu.config import GlobalConfig
+from shirasu.command import CommandParser
+
+
+def test_parse_command() -> None:
+    parser = CommandParser(['', '/'], '\\s+')
+    assert parser.parse('/echo  hello world ') == {
+        '/echo': ('hello world', ('hello', 'world')),
+        'echo': ('hello world', ('hello', 'world')),
+    }
+    assert parser.parse('help') == {'help': ('', ('',))}
+    assert CommandParser(['/'], ',').parse('/manage,disable,echo') == {
+        'manage': ('disable,echo', ('disable', 'echo')),
+    }
+    assert CommandParser(['/'], '\\s+').parse('echo hello') == {}
+
+
+@pytest.mark.asyncio
+async def test_command_prefixes() -> None:
+    pool = AddonPool.from_modules('shirasu.addons.echo', 'shirasu.addons.square')
+    client = MockClient(pool, GlobalConfig(command_prefixes=['', '/']))
+
+    for cmd in ('echo hello', '/echo hello'):
+        await client.post_message(cmd)
+        assert (await client.get_message()).plain_text == 'hello'
+
+    await client.post_message('/square 3')
+    assert (await client.get_message()).plain_text == '9'
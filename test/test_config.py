@@ -0,0 +1,89 @@
+import os
+import asyncio
+import pytest
+from pathlib import Path
+from shirasu import MockClient, AddonPool
+from shirasu.config import ConfigService, GlobalConfig
+
+
+def write_config(path: Path, content: str) -> None:
+    path.write_text(content)
+    # Make sure the modification time changes even if the file system is coarse.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reload_config(tmp_path: Path) -> None:
+    write_config(path := tmp_path / 'shirasu.yml', 'command_prefixes: ["/"]')
+    service = ConfigService(path)
+    old_config = service.config
+
+    reloaded: list[GlobalConfig] = []
+    service.subscribe(reloaded.append)
+
+    write_config(path, 'command_prefixes: ["!"]')
+    assert service.reload()
+    assert service.config is not old_config
+    assert service.config.command_prefixes == ['!']
+    assert reloaded == [service.config]
+
+    # Invalid config should not replace the old one.
+    write_config(path, 'command_prefixes: 1')
+    assert not service.reload()
+    assert service.config.command_prefixes == ['!']
+    assert len(reloaded) == 1
+
+
+def test_reload_config_atomic(tmp_path: Path) -> None:
+    write_config(path := tmp_path / 'shirasu.yml', 'addons: {help: {forward_addon_list: false}}')
+    service = ConfigService(path)
+    pool = AddonPool.from_modules('shirasu.addons.help', 'shirasu.addons.square')
+    client = MockClient(pool, service.config)
+    service.subscribe(client.update_config)
+    help_addon, square = pool.get_addon('help'), pool.get_addon('square')
+    assert help_addon and square
+    help_config = help_addon.get_config(service.config)
+
+    # The square rejects the config, so neither the help nor the client takes it.
+    write_config(path, 'addons: {help: {forward_addon_list: true}, square: {precision: a}}')
+    old_config = service.config
+    assert not service.reload()
+    assert service.config is old_config
+    assert client.global_config is old_config
+    assert help_addon.get_config(old_config) is help_config
+
+    write_config(path, 'addons: {help: {forward_addon_list: true}, square: {precision: 3}}')
+    assert service.reload()
+    assert client.global_config is service.config
+    assert help_addon.get_config(service.config).forward_addon_list  # type: ignore[attr-defined]
+
+
+@pytest.mark.asyncio
+async def test_watch_config(tmp_path: Path) -> None:
+    write_config(path := tmp_path / 'shirasu.yml', 'watch_interval: 0.01\naddons: {square: {precision: 0}}')
+    service = ConfigService(path)
+    client = MockClient(AddonPool.from_modules('shirasu.addons.square'), service.config)
+    service.subscribe(client.update_config)
+    watcher = asyncio.create_task(service.watch())
+
+    try:
+        await client.post_message('/square 1.1')
+        assert (await client.get_message()).plain_text == '1'
+
+        write_config(path, 'watch_interval: 0.01\naddons: {square: {precision: 2}}')
+        await asyncio.sleep(.05)
+        assert client.global_config is service.config
+
+        await client.post_message('/square 1.1')
+        assert (await client.get_message()).plain_text == '1.21'
+    finally:
+        watcher.cancel()
+
+
+def test_ws_options(tmp_path: Path) -> None:
+    write_config(path := tmp_path / 'shirasu.yml', 'ws_compression: false\nws_max_size: 16777216\nws_ping_interval: null')
+    options = ConfigService(path).config.ws_options
+    assert options['compression'] is None
+    assert options['max_size'] == 2 ** 24
+    assert options['ping_interval'] is None
+    assert GlobalConfig().ws_options['compression'] == 'deflate'
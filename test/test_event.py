@@ -0,0 +1,109 @@
+import pytest
+from shirasu import Addon, AddonPool, MockClient, NoticeEvent, RequestEvent, notice, request
+from shirasu.event import (
+    MOCK_SELF_ID,
+    GroupDecreaseNotice,
+    GroupIncreaseNotice,
+    GroupRequest,
+    NotifyNotice,
+    event_from_data,
+    mock_notice_event,
+    mock_request_event,
+    register_event,
+)
+
+
+def test_typed_events() -> None:
+    event = event_from_data({
+        'time': 0,
+        'self_id': MOCK_SELF_ID,
+        'post_type': 'notice',
+        'notice_type': 'group_increase',
+        'sub_type': 'approve',
+        'group_id': 1,
+        'operator_id': 2,
+        'user_id': 3,
+    })
+    assert isinstance(event, GroupIncreaseNotice)
+    assert (event.group_id, event.operator_id, event.user_id) == (1, 2, 3)
+    assert not hasattr(event, '__dict__')
+
+    poke = event_from_data({
+        'time': 0,
+        'self_id': MOCK_SELF_ID,
+        'post_type': 'notice',
+        'notice_type': 'notify',
+        'sub_type': 'poke',
+        'user_id': 3,
+        'target_id': MOCK_SELF_ID,
+    })
+    assert isinstance(poke, NotifyNotice) and poke.group_id is None
+
+    # Unknown types fall back to the event of the post type.
+    unknown = event_from_data({'time': 0, 'self_id': MOCK_SELF_ID, 'post_type': 'notice', 'notice_type': 'essence'})
+    assert type(unknown) is NoticeEvent
+
+
+def test_omitted_fields() -> None:
+    leave = event_from_data({
+        'time': 0,
+        'self_id': MOCK_SELF_ID,
+        'post_type': 'notice',
+        'notice_type': 'group_decrease',
+        'sub_type': 'leave',
+        'group_id': 1,
+        'user_id': 3,
+    })
+    assert isinstance(leave, GroupDecreaseNotice) and leave.operator_id is None
+
+    # Events missing the fields required by their types fall back to the event of the post type.
+    request = event_from_data({'time': 0, 'self_id': MOCK_SELF_ID, 'post_type': 'request', 'request_type': 'group'})
+    assert type(request) is RequestEvent and request.request_type == 'group'
+
+
+@register_event('notice', 'group_card')
+class GroupCardNotice(NoticeEvent):
+    __slots__ = ('card_new',)
+
+    def __init__(self, **params: object) -> None:
+        super().__init__(**params)
+        self.card_new = params['card_new']
+
+
+received: list[str] = []
+
+welcome = Addon(name='welcome', usage='', description='Welcomes new members.')
+card = Addon(name='card', usage='', description='Records new cards.')
+essence = Addon(name='essence', usage='', description='Records essence notices.')
+join = Addon(name='join', usage='', description='Records join requests.')
+
+
+@welcome.receive(notice('group_increase'))
+async def handle_increase(event: GroupIncreaseNotice) -> None:
+    received.append(f'welcome {event.user_id}')
+
+
+@card.receive(notice('group_card'))
+async def handle_card(event: GroupCardNotice) -> None:
+    received.append(f'card {event.card_new}')
+
+
+@essence.receive(notice('essence'))
+async def handle_essence() -> None:
+    received.append('essence')
+
+
+@join.receive(request('group'))
+async def handle_request(event: GroupRequest) -> None:
+    received.append(f'request {event.flag}')
+
+
+@pytest.mark.asyncio
+async def test_typed_rules() -> None:
+    client = MockClient(AddonPool().load(welcome).load(card).load(essence).load(join))
+    await client.post_event(mock_notice_event('group_increase', sub_type='invite', group_id=1, operator_id=2, user_id=3))
+    await client.post_event(mock_notice_event('group_card', group_id=1, user_id=3, card_new='taffy'))
+    await client.post_event(mock_notice_event('essence'))
+    await client.post_event(mock_request_event('group', sub_type='add', group_id=1, user_id=3, flag='f'))
+    await client.post_event(mock_request_event('friend', user_id=3, flag='g'))
+    assert received == ['welcome 3', 'card taffy', 'essence', 'request f']
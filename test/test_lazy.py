@@ -0,0 +1,75 @@
+import sys
+import pytest
+import asyncio
+from pathlib import Path
+from shirasu import MockClient, AddonPool, LazyAddon
+
+
+ADDON_MODULE = '''
+from shirasu import Addon, Client, command
+
+lazy_echo = Addon(name='lazy_echo', usage='/lazy text', description='Lazy echo.')
+
+
+@lazy_echo.receive(command('lazy'))
+async def handle_lazy(client: Client) -> None:
+    await client.send('lazy')
+'''
+
+MANIFEST = '''
+- module: lazy_echo_module
+  name: lazy_echo
+  usage: /lazy text
+  description: Lazy echo.
+  commands: [lazy]
+'''
+
+
+@pytest.mark.asyncio
+async def test_lazy_addon(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / 'lazy_echo_module.py').write_text(ADDON_MODULE)
+    (manifest := tmp_path / 'manifest.yml').write_text(MANIFEST)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    pool = AddonPool.from_manifest(manifest)
+    addon = pool.get_addon('lazy_echo')
+    assert isinstance(addon, LazyAddon)
+    assert addon.usage == '/lazy text'
+
+    client = MockClient(pool)
+    await client.post_message('/echo hello')
+    assert not addon.loaded
+    assert 'lazy_echo_module' not in sys.modules
+
+    await client.post_message('/lazy')
+    lazy_msg = await client.get_message()
+    assert lazy_msg.plain_text == 'lazy'
+    assert addon.loaded
+
+
+BROKEN_MANIFEST = '''
+- module: does_not_exist_module
+  name: broken
+- module: shirasu.addons.echo
+  name: echo
+  commands: [echo]
+'''
+
+
+@pytest.mark.asyncio
+async def test_lazy_addon_broken(tmp_path: Path) -> None:
+    (manifest := tmp_path / 'manifest.yml').write_text(BROKEN_MANIFEST)
+    pool = AddonPool.from_manifest(manifest)
+    broken = pool.get_addon('broken')
+    assert isinstance(broken, LazyAddon)
+    client = MockClient(pool)
+
+    # The broken addon does not break other addons, and it is not imported again.
+    for _ in range(2):
+        await client.post_message('/echo hi')
+        assert (await client.get_message()).plain_text == 'hi'
+    assert not broken.loaded
+
+    await client.post_message('hello')
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_message()
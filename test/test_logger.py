@@ -0,0 +1,40 @@
+import io
+import ujson
+from shirasu import logger
+from shirasu.logger import BatchedSink
+
+
+def test_batched_sink() -> None:
+    stream = io.StringIO()
+    handler = logger.add(BatchedSink(stream), format=lambda _: '{message}', level='INFO')
+    try:
+        logger.info('Received {} message from {}: {}', 'group', 1884, '/echo {hello}')
+        logger.debug('Ignored')
+    finally:
+        logger.remove(handler)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert '| INFO     | test_logger:test_batched_sink:' in lines[0]
+    assert lines[0].endswith(' - Received group message from 1884: /echo {hello}')
+
+
+def test_batched_sink_json() -> None:
+    stream = io.StringIO()
+    handler = logger.add(BatchedSink(stream, serialize=True), format=lambda _: '{message}')
+    try:
+        logger.bind(user_id=1884).warning('hello')
+        try:
+            raise ValueError('oops')
+        except ValueError:
+            logger.exception('failed')
+    finally:
+        logger.remove(handler)
+
+    first, second = map(ujson.loads, stream.getvalue().splitlines())
+    assert first['level'] == 'WARNING'
+    assert first['message'] == 'hello'
+    assert first['extra'] == {'user_id': 1884}
+    assert first['exception'] is None
+    assert second['level'] == 'ERROR'
+    assert 'ValueError: oops' in second['exception']
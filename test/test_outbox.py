@@ -0,0 +1,83 @@
+import pytest
+import asyncio
+from shirasu.client.outbox import Outbox, OutboxClosedError
+
+
+@pytest.mark.asyncio
+async def test_coalesce() -> None:
+    batches: list[list[str]] = []
+
+    async def write(batch: list[str]) -> None:
+        batches.append(batch)
+        await asyncio.sleep(.01)
+
+    outbox = Outbox(batch_size=3)
+    writer = asyncio.create_task(outbox.run(write))
+    for i in range(7):
+        await outbox.put(str(i))
+    assert outbox.depth == 7
+
+    await asyncio.sleep(.05)
+    # Frames put while the writer is busy are written together.
+    assert batches == [['0', '1', '2'], ['3', '4', '5'], ['6']]
+    assert outbox.depth == 0
+    writer.cancel()
+
+
+@pytest.mark.asyncio
+async def test_backpressure() -> None:
+    written = asyncio.Event()
+
+    async def write(_: list[str]) -> None:
+        await written.wait()
+
+    outbox = Outbox(max_size=2, batch_size=1)
+    writer = asyncio.create_task(outbox.run(write))
+    await outbox.put('0')
+    await asyncio.sleep(0)
+    await outbox.put('1')
+    await outbox.put('2')
+
+    # The queue is full, so the sender waits.
+    sending = asyncio.create_task(outbox.put('3'))
+    await asyncio.sleep(.01)
+    assert not sending.done() and outbox.depth == 2
+
+    written.set()
+    await asyncio.wait_for(sending, 1)
+
+    outbox.close()
+    with pytest.raises(OutboxClosedError):
+        await outbox.put('4')
+    writer.cancel()
+
+
+@pytest.mark.asyncio
+async def test_close_wakes_senders() -> None:
+    outbox = Outbox(max_size=1)
+    await outbox.put('0')
+    sending = asyncio.create_task(outbox.put('1'))
+    await asyncio.sleep(0)
+    outbox.close()
+    with pytest.raises(OutboxClosedError):
+        await sending
+
+
+@pytest.mark.asyncio
+async def test_join() -> None:
+    written: list[str] = []
+
+    async def write(batch: list[str]) -> None:
+        await asyncio.sleep(.01)
+        written.extend(batch)
+
+    outbox = Outbox(batch_size=2)
+    await asyncio.wait_for(outbox.join(), 1)
+    writer = asyncio.create_task(outbox.run(write))
+    for i in range(5):
+        await outbox.put(str(i))
+
+    # Frames being written are not done yet.
+    await asyncio.wait_for(outbox.join(), 1)
+    assert written == ['0', '1', '2', '3', '4']
+    writer.cancel()
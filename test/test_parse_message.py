@@ -1,4 +1,11 @@
+import ujson
+import pytest
 from shirasu.message import (
+    Message,
+    MessageBuilder,
+    at,
+    text,
+    split_message,
     parse_cq_message,
 )
 
@@ -56,3 +63,34 @@ def test_multiple() -> None:
     assert segments[0].type == 'image'
     assert segments[1].type == 'text'
     assert segments[2].type == 'at'
+
+
+def test_encoded() -> None:
+    msg = Message(text('你好'), at(1883))
+    assert msg.to_json_obj() is msg.to_json_obj()
+    assert msg.encoded is msg.encoded
+    assert ujson.loads(msg.encoded) == [
+        {'type': 'text', 'data': {'text': '你好'}},
+        {'type': 'at', 'data': {'qq': 1883, 'name': ''}},
+    ]
+
+    with pytest.raises(AttributeError):
+        msg._segments = ()
+
+
+def test_split_by_length() -> None:
+    messages = split_message(['aaa', 'bb', 'c' * 7, 'd'], max_length=5)
+    assert [m.plain_text for m in messages] == ['aaa', 'bb', 'ccccc', 'cc\nd']
+
+
+def test_split_by_segments() -> None:
+    messages = list(split_message(['a', at(1), 'b', at(2), at(3), 'c'], max_segments=2))
+    assert [[seg.type for seg in m.segments] for m in messages] == [['text', 'at'], ['text', 'at'], ['at', 'text']]
+
+
+def test_builder_lazy() -> None:
+    builder = MessageBuilder(max_length=3, separator='')
+    assert list(builder.append('ab')) == []
+    assert [m.plain_text for m in builder.append('cd')] == ['ab']
+    assert builder.build().plain_text == 'cd'  # type: ignore[union-attr]
+    assert builder.build() is None
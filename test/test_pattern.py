@@ -0,0 +1,68 @@
+import re
+import pytest
+import warnings
+from types import SimpleNamespace
+from shirasu import Addon, AddonPool, Client, MockClient, regex, keyword
+from shirasu import pattern
+from shirasu.pattern import PatternIndex
+
+
+def test_pattern_index() -> None:
+    patterns = [re.compile(p) for p in ('ab', 'a(?P<b>b)', r'(a)\1', '(?i)AB', 'c')]
+    patterns.append(re.compile('A B  # comment', re.IGNORECASE | re.VERBOSE))
+    index = PatternIndex(patterns, ['hello', 'lo', 'world'])
+
+    scan = index.scan('ab hello')
+    assert {p.pattern for p, m in scan.matches.items() if m} == {'ab', 'a(?P<b>b)', '(?i)AB', patterns[-1].pattern}
+    assert (m := scan.matches[patterns[1]]) and m.group('b') == 'b'
+    assert scan.keywords == {'hello', 'lo'}
+
+    scan = index.scan('aa')
+    assert {p.pattern for p, m in scan.matches.items() if m} == {r'(a)\1'}
+    assert not scan.keywords
+
+    # Both combined and alone patterns are indexed.
+    assert all(p in index for p in patterns)
+    assert re.compile('d') not in index
+    assert 'hello' in index and 'ab' not in index
+
+
+def test_global_flags(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert pattern._wrap(re.compile('(?i)ab')) is None
+    assert pattern._wrap(re.compile('ab')) == '(?:ab)'
+
+    # Python 3.10 only warns about global flags not at the start.
+    def parse(source: str) -> None:
+        warnings.warn('Flags not at the start of the expression', DeprecationWarning)
+
+    monkeypatch.setattr(pattern, '_sre_parse', SimpleNamespace(parse=parse))
+    assert pattern._wrap(re.compile('ab')) is None
+
+
+greet = Addon(name='greet', usage='hi name', description='Greets.')
+
+
+@greet.receive(regex(r'hi (?P<name>\w+)'))
+async def handle_greet(client: Client, match: re.Match[str]) -> None:
+    await client.send(f'hello {match.group("name")}')
+
+
+bye = Addon(name='bye', usage='bye', description='Says goodbye.')
+
+
+@bye.receive(keyword('bye', 'see you'))
+async def handle_bye(client: Client) -> None:
+    await client.send('bye')
+
+
+@pytest.mark.asyncio
+async def test_regex_keyword() -> None:
+    pool = AddonPool().load(greet).load(bye)
+    assert pool.pattern_index.scan('hi taffy, see you').keywords == {'see you'}
+    client = MockClient(pool)
+
+    await client.post_message('hi taffy')
+    assert (await client.get_message()).plain_text == 'hello taffy'
+
+    await client.post_message('ok, see you')
+    assert (await client.get_message()).plain_text == 'bye'
@@ -0,0 +1,39 @@
+import ujson
+import pytest
+from pathlib import Path
+from shirasu import AddonPool, MockClient
+from shirasu.event import mock_message_event
+from shirasu.record import FrameRecorder, read_frames, replay
+
+
+def message_frame(raw_message: str, user_id: int) -> str:
+    event = mock_message_event('private', raw_message, raw_message=raw_message, user_id=user_id)
+    return ujson.dumps({k: v for k, v in event.data.items() if k != 'parsed_message'})
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_record(tmp_path: Path, compress: bool) -> None:
+    recorder = FrameRecorder(path := tmp_path / 'frames.log', compress=compress)
+    recorder.write('{"echo": "1"}', 1.)
+    recorder.write(b'{"post_type": "meta_event"}', 2.5)
+    recorder.close()
+
+    assert list(read_frames(path)) == [(1., b'{"echo": "1"}'), (2.5, b'{"post_type": "meta_event"}')]
+
+
+@pytest.mark.asyncio
+async def test_replay(tmp_path: Path) -> None:
+    recorder = FrameRecorder(path := tmp_path / 'frames.log')
+    for i in range(10):
+        recorder.write(message_frame(f'/echo {i}', user_id=i), i * .001)
+    recorder.write('{"echo": "1", "status": "ok"}', .01)
+    recorder.close()
+
+    client = MockClient(AddonPool.from_modules('shirasu.addons.echo'))
+    report = await replay(client, path, speed=0)
+    assert report.events == 10
+    assert report.max >= report.p50 > 0
+
+    # Each reply should be sent to the sender of its own event.
+    replies = {(e := await client.get_message_event()).user_id: e.message.plain_text for _ in range(10)}
+    assert replies == {i: str(i) for i in range(10)}
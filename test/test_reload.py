@@ -0,0 +1,139 @@
+import sys
+import asyncio
+import pytest
+from pathlib import Path
+from typing import Iterator
+from shirasu import MockClient, AddonPool
+from shirasu.addon import DuplicateAddonError, LoadAddonError
+from shirasu.config import GlobalConfig
+from shirasu.event import MOCK_USER_ID
+
+
+ADDON_MODULE = '''
+import asyncio
+from shirasu import Addon, Client, command
+
+version = Addon(name='version', usage='/version', description='Sends the version.')
+started = asyncio.Event()
+gate = asyncio.Event()
+VERSION = '{version}'
+
+
+@version.receive(command('version'))
+async def handle_version(client: Client) -> None:
+    started.set()
+    await gate.wait()
+    await client.send(VERSION)
+'''
+
+
+@pytest.fixture
+def addon_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (file := tmp_path / 'version_addon.py').write_text(ADDON_MODULE.format(version='old'))
+    yield file
+    sys.modules.pop('version_addon', None)
+
+
+@pytest.mark.asyncio
+async def test_reload_module(addon_file: Path) -> None:
+    pool = AddonPool.from_modules('version_addon')
+    client = MockClient(pool)
+
+    # The sizes of versions differ so that the cached bytecode is not used.
+    # The event in progress should finish on the old version.
+    in_progress = asyncio.create_task(client.post_message('/version'))
+    old_module = sys.modules['version_addon']
+    await asyncio.wait_for(old_module.started.wait(), 1)
+
+    addon_file.write_text(ADDON_MODULE.format(version='new version'))
+    pool.reload_module('version_addon')
+    assert sys.modules['version_addon'] is not old_module
+    old_module.gate.set()
+    await in_progress
+    assert (await client.get_message()).plain_text == 'old'
+
+    new_module = sys.modules['version_addon']
+    new_module.gate.set()
+    await client.post_message('/version')
+    assert (await client.get_message()).plain_text == 'new version'
+
+    # A failed reload keeps both the old addon and the old module.
+    addon_file.write_text('raise RuntimeError("broken version")')
+    with pytest.raises(LoadAddonError):
+        pool.reload_module('version_addon')
+    assert sys.modules['version_addon'] is new_module
+    await client.post_message('/version')
+    assert (await client.get_message()).plain_text == 'new version'
+
+    pool.unload_module('version_addon')
+    assert not pool.has_addon('version')
+    await client.post_message('/version')
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_message()
+
+
+@pytest.mark.asyncio
+async def test_manage_reload(addon_file: Path) -> None:
+    pool = AddonPool.from_modules('shirasu.addons.manage', 'version_addon')
+    client = MockClient(pool, GlobalConfig(superusers=[MOCK_USER_ID]))
+
+    addon_file.write_text(ADDON_MODULE.format(version='new version'))
+    await client.post_message('/manage reload version')
+    assert not (await client.get_message_event()).is_rejected
+
+    sys.modules['version_addon'].gate.set()
+    await client.post_message('/version')
+    assert (await client.get_message()).plain_text == 'new version'
+
+    await client.post_message('/manage unload version')
+    assert not (await client.get_message_event()).is_rejected
+    assert not pool.has_addon('version')
+
+    await client.post_message('/manage load version_addon')
+    assert not (await client.get_message_event()).is_rejected
+    assert pool.has_addon('version')
+
+
+@pytest.mark.asyncio
+async def test_reload_errors(addon_file: Path, tmp_path: Path) -> None:
+    pool = AddonPool.from_modules('version_addon')
+    old_module = sys.modules['version_addon']
+
+    # Errors when executing the module are load errors.
+    (tmp_path / 'broken_addon.py').write_text('raise NameError("broken")')
+    with pytest.raises(LoadAddonError):
+        pool.load_module('broken_addon')
+    assert 'broken_addon' not in sys.modules
+
+    # The module is imported, but its addons are rejected, so the module is not kept.
+    (tmp_path / 'other_version_addon.py').write_text(ADDON_MODULE.format(version='other'))
+    with pytest.raises(DuplicateAddonError):
+        pool.load_module('other_version_addon')
+    assert 'other_version_addon' not in sys.modules
+
+    duplicate = ADDON_MODULE.format(version='new version').replace("'version'", "'square'")
+    addon_file.write_text(duplicate)
+    pool.load_module('shirasu.addons.square')
+    with pytest.raises(DuplicateAddonError):
+        pool.reload_module('version_addon')
+    assert sys.modules['version_addon'] is old_module
+
+    # The watcher keeps running after failed reloads.
+    addon_file.write_text(ADDON_MODULE.format(version='old'))
+    watcher = asyncio.create_task(pool.watch(.01))
+    try:
+        await asyncio.sleep(.05)
+        addon_file.write_text(duplicate)
+        await asyncio.sleep(.05)
+        assert not watcher.done()
+        assert sys.modules['version_addon'] is old_module
+
+        addon_file.write_text(ADDON_MODULE.format(version='watched'))
+        for _ in range(100):
+            if sys.modules['version_addon'] is not old_module:
+                break
+            await asyncio.sleep(.01)
+        assert sys.modules['version_addon'].VERSION == 'watched'
+    finally:
+        watcher.cancel()
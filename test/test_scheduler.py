@@ -0,0 +1,96 @@
+import time
+import asyncio
+import pytest
+from datetime import datetime
+from shirasu import Addon, AddonPool, MockClient, every, cron
+from shirasu.storage import Storage, StorageNamespace
+from shirasu.scheduler import Scheduler, at
+
+
+digest = Addon(name='digest', usage='', description='Counts the digests.')
+
+
+@digest.schedule(every(3600), name='post')
+async def post_digest(storage: StorageNamespace) -> None:
+    await storage.set('count', await storage.get('count', 0) + 1)
+
+
+def test_cron() -> None:
+    def next_after(expr: str, dt: datetime) -> datetime:
+        return datetime.fromtimestamp(cron(expr).next_after(dt.timestamp()))
+
+    # 2026-10-19 is Monday.
+    assert next_after('0 8 * * 1-5', datetime(2026, 10, 19, 7, 59, 30)) == datetime(2026, 10, 19, 8, 0)
+    assert next_after('0 8 * * 1-5', datetime(2026, 10, 23, 8, 0)) == datetime(2026, 10, 26, 8, 0)
+    assert next_after('*/15 * * * *', datetime(2026, 10, 19, 7, 50)) == datetime(2026, 10, 19, 8, 0)
+    assert next_after('30 0 29 2 *', datetime(2026, 10, 19)) == datetime(2028, 2, 29, 0, 30)
+    # Either the day of month or the day of week matches if both are restricted.
+    assert next_after('0 0 1 * 0', datetime(2026, 10, 19)) == datetime(2026, 10, 25, 0, 0)
+
+    with pytest.raises(ValueError):
+        cron('60 * * * *')
+    with pytest.raises(ValueError):
+        cron('* * *')
+
+
+@pytest.mark.asyncio
+async def test_scheduler() -> None:
+    scheduler = Scheduler()
+    runs: list[str] = []
+
+    async def record(name: str) -> None:
+        runs.append(name)
+
+    scheduler.add('interval', every(.05), lambda: record('interval'))
+    scheduler.add('once', at(time.time() + .05), lambda: record('once'))
+    await scheduler.start()
+    try:
+        await asyncio.sleep(.18)
+    finally:
+        await scheduler.close()
+
+    assert 2 <= runs.count('interval') <= 3
+    assert runs.count('once') == 1
+    assert set(scheduler.jobs) == {'interval'}
+
+
+@pytest.mark.asyncio
+async def test_addon_job() -> None:
+    pool = AddonPool().load(digest)
+    client = MockClient(pool)
+    await client.scheduler.start(pool)
+    try:
+        assert set(client.scheduler.jobs) == {'digest.post'}
+        await client.scheduler.run('digest.post')
+        assert await client.storage.get('digest', 'count') == 1
+
+        # Jobs of disabled addons are removed.
+        pool.set_addon_disabled('digest', True)
+        for _ in range(30):
+            if not client.scheduler.jobs:
+                break
+            await asyncio.sleep(.1)
+        assert client.scheduler.jobs == {}
+    finally:
+        await client.scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_missed_run() -> None:
+    storage = Storage(':memory:')
+    pool = AddonPool().load(digest)
+    client = MockClient(pool, storage=storage)
+    await client.scheduler.start(pool)
+    await client.scheduler.close()
+
+    # The job should have run an hour ago while the bot was down.
+    await storage.set('shirasu.scheduler', 'digest.post', time.time() - 3600)
+    scheduler = Scheduler(storage)
+    await scheduler.start(pool)
+    try:
+        await asyncio.sleep(.05)
+        assert await storage.get('digest', 'count') == 1
+        assert await storage.get('shirasu.scheduler', 'digest.post') > time.time()
+    finally:
+        await scheduler.close()
+        await storage.close()
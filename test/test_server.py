@@ -0,0 +1,280 @@
+import time
+import ujson
+import asyncio
+import pytest
+import contextlib
+from pathlib import Path
+from shirasu import Addon, AddonPool, Client, OneBotClient, command, every
+from shirasu.di import di
+from shirasu.client import ClientActionError
+from shirasu.client.onebot import _frame_template
+from shirasu.health import Health
+from shirasu.message import Message, text
+from shirasu.server import OneBotServer
+from shirasu.storage import Storage
+
+
+ids = Addon(name='ids', usage='/ids', description='Sends the id of the first message.')
+
+
+@ids.receive(command('ids'))
+async def handle_ids(client: Client) -> None:
+    try:
+        message_id = await client.send('first')
+    except ClientActionError as e:
+        await client.send(f'failed: {e.msg}')
+        return
+    await client.send(str(message_id))
+
+
+errors: list[str] = []
+
+slow = Addon(name='slow', usage='/slow', description='Calls a slow action.')
+
+
+@slow.receive(command('slow'))
+async def handle_slow(client: Client) -> None:
+    try:
+        await client.call_action('slow')
+    except ClientActionError as e:
+        errors.append(e.msg)
+
+
+stuck = Addon(name='stuck', usage='/stuck', description='Never finishes.')
+stopped: list[str] = []
+
+
+@stuck.receive(command('stuck'))
+async def handle_stuck() -> None:
+    try:
+        await asyncio.sleep(60)
+    finally:
+        stopped.append('stuck')
+
+
+announce = Addon(name='announce', usage='/announce', description='Announces to groups.')
+announced: list[int | None] = []
+
+
+@announce.receive(command('announce'))
+async def handle_announce(client: Client) -> None:
+    async for result in client.broadcast('news', [('group', 1), ('group', 2), ('private', 3)]):
+        announced.append(result.message_id)
+
+
+reminder = Addon(name='reminder', usage='', description='Posts reminders.')
+
+
+@reminder.schedule(every(3600), name='post')
+async def post_reminder(client: Client) -> None:
+    await client.call_action('send_group_msg', group_id=1, message='reminder')
+
+
+async def start_client(
+        server: OneBotServer,
+        tmp_path: Path,
+        pool: AddonPool,
+        extra: str = '',
+        shutdown: asyncio.Event | None = None,
+) -> asyncio.Task[None]:
+    (config := tmp_path / 'shirasu.yml').write_text(
+        f'ws: {server.url}\nwatch_config: false\nstorage: ":memory:"\n{extra}'
+    )
+    task = asyncio.create_task(OneBotClient.listen(pool, config, shutdown=shutdown))
+    await asyncio.wait_for(server.wait_connected(), 1)
+    return task
+
+
+async def stop_client(task: asyncio.Task[None]) -> None:
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+@pytest.mark.asyncio
+async def test_server(tmp_path: Path) -> None:
+    async with OneBotServer(latency=(0., .01), seed=1883) as server:
+        task = await start_client(server, tmp_path, AddonPool.from_modules('shirasu.addons.echo').load(ids))
+        try:
+            await server.post_message('/echo hello', 'group')
+            action = await asyncio.wait_for(server.actions.get(), 1)
+            assert action['action'] == 'send_msg'
+            assert action['message_type'] == 'group'
+            assert action['message'] == {'type': 'text', 'data': {'text': 'hello'}}
+
+            # The second message depends on the response of the first one.
+            await server.post_message('/ids')
+            first = await asyncio.wait_for(server.actions.get(), 1)
+            second = await asyncio.wait_for(server.actions.get(), 1)
+            assert first['message']['data']['text'] == 'first'
+            assert second['message']['data']['text'].isdigit()
+        finally:
+            await stop_client(task)
+
+
+@pytest.mark.asyncio
+async def test_server_failure(tmp_path: Path) -> None:
+    async with OneBotServer(failure_rate=1.) as server:
+        task = await start_client(server, tmp_path, AddonPool().load(ids))
+        try:
+            await server.post_message('/ids')
+            await asyncio.wait_for(server.actions.get(), 1)
+            failed = await asyncio.wait_for(server.actions.get(), 1)
+            assert failed['message']['data']['text'] == 'failed: SIMULATED_FAILURE'
+        finally:
+            await stop_client(task)
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_timeout(tmp_path: Path) -> None:
+    async with OneBotServer(latency=10.) as server:
+        server.on('slow', lambda _: {})
+        task = await start_client(server, tmp_path, AddonPool().load(slow).load(stuck), 'heartbeat_tolerance: 2')
+        try:
+            await server.post_heartbeat(interval=100)
+            await server.post_message('/slow')
+            await server.post_message('/stuck')
+            await asyncio.wait_for(server.actions.get(), 1)
+
+            # The server stops responding, so the client reconnects without waiting for the action timeout.
+            for _ in range(200):
+                if server.connections == 2:
+                    break
+                await asyncio.sleep(.02)
+            assert server.connections == 2
+            assert errors == ['CONNECTION_CLOSED']
+            # Events of the closed connection are done before reconnecting.
+            assert stopped == ['stuck']
+        finally:
+            await stop_client(task)
+
+
+@pytest.mark.asyncio
+async def test_server_restart(tmp_path: Path) -> None:
+    async with OneBotServer() as server:
+        task = await start_client(server, tmp_path, AddonPool.from_modules('shirasu.addons.echo'))
+        try:
+            # A clean close is not a shutdown, so the client reconnects.
+            await server.disconnect(1001)
+            for _ in range(200):
+                if server.connections == 2 and not task.done():
+                    break
+                await asyncio.sleep(.02)
+            assert server.connections == 2 and not task.done()
+
+            await asyncio.wait_for(server.wait_connected(), 1)
+            await server.post_message('/echo back')
+            assert (await asyncio.wait_for(server.actions.get(), 1))['message']['data']['text'] == 'back'
+        finally:
+            await stop_client(task)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_message(tmp_path: Path) -> None:
+    async with OneBotServer() as server:
+        # Frames are not compressed either.
+        task = await start_client(server, tmp_path, AddonPool.from_modules('shirasu.addons.echo'), 'ws_compression: false')
+        try:
+            message_id = await server.post_message('/echo first')
+            await server.post_message('/echo first', message_id=message_id)
+            await server.post_message('/echo second')
+
+            first = await asyncio.wait_for(server.actions.get(), 1)
+            second = await asyncio.wait_for(server.actions.get(), 1)
+            assert first['message']['data']['text'] == 'first'
+            assert second['message']['data']['text'] == 'second'
+        finally:
+            await stop_client(task)
+
+
+@pytest.mark.asyncio
+async def test_broadcast(tmp_path: Path) -> None:
+    async with OneBotServer(latency=.01) as server:
+        task = await start_client(server, tmp_path, AddonPool().load(announce))
+        try:
+            await server.post_message('/announce')
+            actions = [await asyncio.wait_for(server.actions.get(), 1) for _ in range(3)]
+            assert {(a['message_type'], a.get('group_id') or a.get('user_id')) for a in actions} == \
+                {('group', 1), ('group', 2), ('private', 3)}
+            assert all(a['message'] == {'type': 'text', 'data': {'text': 'news'}} for a in actions)
+
+            await asyncio.sleep(.05)
+            assert len(announced) == 3 and all(announced)
+        finally:
+            await stop_client(task)
+
+
+@pytest.mark.asyncio
+async def test_graceful_shutdown(tmp_path: Path) -> None:
+    async with OneBotServer(latency=.2) as server:
+        shutdown = asyncio.Event()
+        pool = AddonPool.from_modules('shirasu.addons.echo').load(ids)
+        task = await start_client(server, tmp_path, pool, 'shutdown_timeout: 2', shutdown)
+        try:
+            await server.post_message('/ids')
+            first = await asyncio.wait_for(server.actions.get(), 1)
+            assert first['message']['data']['text'] == 'first'
+
+            # The event in progress still gets the response and finishes, while new events are dropped.
+            shutdown.set()
+            await asyncio.sleep(0)
+            await server.post_message('/echo dropped')
+            await asyncio.wait_for(task, 2)
+            second = server.actions.get_nowait()
+            assert second['message']['data']['text'].isdigit()
+            assert server.actions.empty()
+        finally:
+            await stop_client(task)
+
+
+@pytest.mark.asyncio
+async def test_health() -> None:
+    async def probe(path: str) -> bytes:
+        reader, writer = await asyncio.open_connection('127.0.0.1', health.port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        response = await reader.read()
+        writer.close()
+        return response.split(b'\r\n')[0]
+
+    health = Health()
+    await health.start('127.0.0.1', 0)
+    try:
+        assert await probe('/live') == b'HTTP/1.1 200 OK'
+        assert await probe('/ready') == b'HTTP/1.1 503 Service Unavailable'
+        health.ready = True
+        assert await probe('/ready') == b'HTTP/1.1 200 OK'
+        assert await probe('/metrics') == b'HTTP/1.1 404 Not Found'
+    finally:
+        await health.close()
+
+
+@pytest.mark.asyncio
+async def test_missed_job(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # No client has been created in this process, so nothing provides the client yet.
+    monkeypatch.setattr(di, '_providers', {})
+    storage = Storage(path := tmp_path / 'shirasu.db')
+    await storage.set('shirasu.scheduler', 'reminder.post', time.time() - 3600)
+    await storage.close()
+
+    async with OneBotServer() as server:
+        (config := tmp_path / 'shirasu.yml').write_text(f'ws: {server.url}\nwatch_config: false\nstorage: {path}')
+        task = asyncio.create_task(OneBotClient.listen(AddonPool().load(reminder), config))
+        try:
+            action = await asyncio.wait_for(server.actions.get(), 1)
+            assert action == {'action': 'send_group_msg', 'group_id': 1, 'message': 'reminder'}
+        finally:
+            await stop_client(task)
+
+
+def test_frame_template() -> None:
+    message = Message(text('hello'))
+    encode = _frame_template('send_msg', {'group_id': 1, 'message': message})
+    assert ujson.loads(encode('1:2')) == {
+        'action': 'send_msg',
+        'params': {'group_id': 1, 'message': {'type': 'text', 'data': {'text': 'hello'}}},
+        'echo': '1:2',
+    }
+
+    encode = _frame_template('send_group_forward_msg', {'messages': message})
+    assert ujson.loads(encode('3'))['params'] == {'messages': {'type': 'text', 'data': {'text': 'hello'}}}
+    assert ujson.loads(_frame_template('get_status', {})('4')) == {'action': 'get_status', 'params': {}, 'echo': '4'}
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from shirasu import Addon, AddonPool, MockClient, command
+
+
+ask = Addon(name='ask', usage='/ask', description='Asks the name.')
+
+
+@ask.receive(command('ask'))
+async def handle_ask(client: MockClient) -> None:
+    await client.send('What is your name?')
+    try:
+        reply = await client.wait_for_reply(.1)
+    except asyncio.TimeoutError:
+        await client.reject('Timed out.')
+        return
+    await client.send(f'Hello, {reply.message.plain_text}!')
+
+
+@pytest.mark.asyncio
+async def test_wait_for_reply() -> None:
+    client = MockClient(AddonPool.from_modules('shirasu.addons.echo').load(ask))
+    task = asyncio.create_task(client.post_message('/ask', 'group'))
+    assert (await client.get_message()).plain_text == 'What is your name?'
+
+    # Messages from others are matched as usual.
+    await client.post_message('/echo hi', 'group', user_id=1)
+    assert (await client.get_message()).plain_text == 'hi'
+
+    # The reply is not matched by the echo addon.
+    await client.post_message('/echo kifuan', 'group')
+    await task
+    assert (await client.get_message()).plain_text == 'Hello, /echo kifuan!'
+    assert client._sessions == {}
+
+    await client.post_message('/echo hi', 'group')
+    assert (await client.get_message()).plain_text == 'hi'
+
+
+@pytest.mark.asyncio
+async def test_wait_for_reply_timeout() -> None:
+    client = MockClient(AddonPool().load(ask))
+    await client.post_message('/ask')
+    assert (await client.get_message()).plain_text == 'What is your name?'
+    assert (await client.get_message_event()).is_rejected
+    assert client._sessions == {}
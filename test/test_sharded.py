@@ -0,0 +1,140 @@
+import ujson
+import asyncio
+import pytest
+import functools
+import contextlib
+from pathlib import Path
+from typing import Any, AsyncIterator, Sequence, cast
+from multiprocessing.process import BaseProcess
+from websockets.legacy.client import WebSocketClientProtocol
+from shirasu import AddonPool, OneBotSupervisor
+from shirasu.client.heartbeat import HeartbeatMonitor
+from shirasu.client.outbox import Outbox
+from shirasu.client.sharded import conversation_key, _worker_index, _Channel, _Worker
+from shirasu.server import OneBotServer
+
+
+def test_conversation_key() -> None:
+    assert conversation_key({'post_type': 'message', 'message_type': 'group', 'group_id': 1885, 'user_id': 1}) == 1885
+    assert conversation_key({'post_type': 'message', 'message_type': 'private', 'user_id': 1884}) == 1884
+    assert conversation_key({'post_type': 'meta_event', 'meta_event_type': 'heartbeat'}) == 0
+
+
+def test_worker_index() -> None:
+    assert _worker_index('1:42', 2) == 1
+    assert _worker_index('2:42', 2) is None
+    assert _worker_index('foreign', 2) is None
+    assert _worker_index('a:42', 2) is None
+
+
+@pytest.mark.asyncio
+async def test_supervisor(tmp_path: Path) -> None:
+    async with OneBotServer() as server:
+        (config := tmp_path / 'shirasu.yml').write_text(f'ws: {server.url}\nwatch_config: false\nstorage: ":memory:"')
+        pool_factory = functools.partial(AddonPool.from_modules, 'shirasu.addons.echo')
+        task = asyncio.create_task(OneBotSupervisor.listen(pool_factory, config, workers=2))
+        try:
+            await asyncio.wait_for(server.wait_connected(), 10)
+            # The groups are sent to different workers.
+            for group_id in (1885, 1886):
+                await server.post_message(f'/echo {group_id}', 'group', group_id=group_id)
+
+            actions = [await asyncio.wait_for(server.actions.get(), 10) for _ in range(2)]
+            assert {a['group_id'] for a in actions} == {1885, 1886}
+            assert all(a['message']['data']['text'] == str(a['group_id']) for a in actions)
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+@pytest.mark.asyncio
+async def test_supervisor_shutdown(tmp_path: Path) -> None:
+    async with OneBotServer(latency=.1) as server:
+        (config := tmp_path / 'shirasu.yml').write_text(f'ws: {server.url}\nwatch_config: false\nstorage: ":memory:"')
+        pool_factory = functools.partial(AddonPool.from_modules, 'shirasu.addons.echo')
+        shutdown = asyncio.Event()
+        task = asyncio.create_task(OneBotSupervisor.listen(pool_factory, config, workers=2, shutdown=shutdown))
+        try:
+            await asyncio.wait_for(server.wait_connected(), 10)
+            await server.post_message('/echo hello', 'group')
+            await asyncio.wait_for(server.actions.get(), 10)
+
+            # Workers drain and exit by themselves, and it returns without being canceled.
+            shutdown.set()
+            await asyncio.wait_for(task, 10)
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+@pytest.mark.asyncio
+async def test_supervisor_enablement(tmp_path: Path) -> None:
+    async with OneBotServer() as server:
+        (config := tmp_path / 'shirasu.yml').write_text(
+            f'ws: {server.url}\nwatch_config: false\nstorage: {tmp_path / "shirasu.db"}\nsuperusers: [1884]'
+        )
+        pool_factory = functools.partial(AddonPool.from_modules, 'shirasu.addons.echo', 'shirasu.addons.manage')
+        task = asyncio.create_task(OneBotSupervisor.listen(pool_factory, config, workers=2))
+        try:
+            await asyncio.wait_for(server.wait_connected(), 10)
+            # Responses with echo fields not from workers are ignored.
+            await server.post_event({'status': 'ok', 'retcode': 0, 'data': {}, 'echo': 'foreign'})
+
+            # The groups are handled by different workers, and disabling globally affects both.
+            await server.post_message('/manage disable echo', 'group', group_id=1885)
+            await asyncio.wait_for(server.actions.get(), 10)
+            await asyncio.sleep(.2)
+            await server.post_message('/echo hello', 'group', group_id=1886)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(server.actions.get(), .5)
+
+            await server.post_message('/manage enable echo', 'group', group_id=1885)
+            await asyncio.wait_for(server.actions.get(), 10)
+            await asyncio.sleep(.2)
+            await server.post_message('/echo hello', 'group', group_id=1886)
+            assert (await asyncio.wait_for(server.actions.get(), 10))['message']['data']['text'] == 'hello'
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+class FakeChannel:
+    def __init__(self, slow: bool) -> None:
+        self.slow = slow
+        self.frames: list[Any] = []
+
+    async def send_many(self, messages: Sequence[str | bytes]) -> None:
+        if self.slow:
+            await asyncio.Event().wait()
+        self.frames += messages
+
+
+class FakeConnection:
+    def __init__(self, frames: list[dict[str, Any]]) -> None:
+        self.frames = frames
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        for frame in self.frames:
+            yield ujson.dumps(frame)
+
+
+@pytest.mark.asyncio
+async def test_slow_worker() -> None:
+    slow, fast = FakeChannel(slow=True), FakeChannel(slow=False)
+    workers = [_Worker(cast(BaseProcess, None), cast(_Channel, channel), Outbox()) for channel in (slow, fast)]
+    # The first worker never finishes writing, while events of the other one are not blocked.
+    frames = [{'post_type': 'notice', 'group_id': group_id} for group_id in (2, 2, 2, 1)]
+    ws = cast(WebSocketClientProtocol, FakeConnection(frames))
+    supervisor = OneBotSupervisor(ws, workers, None, None)
+    writers = [asyncio.create_task(worker.outbox.run(worker.channel.send_many)) for worker in workers]
+    try:
+        await asyncio.wait_for(supervisor._dispatch(HeartbeatMonitor(3.)), 1)
+        await asyncio.sleep(.01)
+        assert [ujson.loads(frame)['group_id'] for frame in fast.frames] == [1]
+        assert not slow.frames
+    finally:
+        for writer in writers:
+            writer.cancel()
@@ -0,0 +1,68 @@
+import pytest
+import asyncio
+import threading
+from pathlib import Path
+from shirasu import Addon, AddonPool, Client, MockClient, command
+from shirasu.storage import Storage, StorageNamespace
+
+
+@pytest.mark.asyncio
+async def test_storage(tmp_path: Path) -> None:
+    storage = Storage(path := tmp_path / 'shirasu.db', cache_size=1)
+    await storage.set('foo', 'a', {'value': 1})
+    await storage.set('bar', 'a', [1, 2])
+    await storage.set('foo', 'b', 'deleted')
+    await storage.delete('foo', 'b')
+
+    # Pending writes should be read before they are flushed.
+    assert await storage.get('foo', 'a') == {'value': 1}
+    assert await storage.get('foo', 'b', 'default') == 'default'
+    assert await storage.keys('foo') == ['a']
+    await storage.close()
+
+    storage = Storage(path)
+    assert await storage.get('foo', 'a') == {'value': 1}
+    assert await storage.get('bar', 'a') == [1, 2]
+    assert await storage.get('foo', 'b') is None
+    await storage.close()
+
+
+counter = Addon(name='counter', usage='/count', description='Counts.')
+
+
+@counter.receive(command('count'))
+async def handle_count(client: Client, storage: StorageNamespace) -> None:
+    count = await storage.get('count', 0) + 1
+    await storage.set('count', count)
+    await client.send(str(count))
+
+
+@pytest.mark.asyncio
+async def test_storage_read_race() -> None:
+    storage = Storage(':memory:')
+    gate = threading.Event()
+    # Block the database thread, so that the read is in progress while the key is written and flushed.
+    storage._executor.submit(gate.wait)
+    reading = asyncio.create_task(storage.get('foo', 'a'))
+    await asyncio.sleep(0)
+    await storage.set('foo', 'a', 'new')
+    flushing = asyncio.create_task(storage.flush())
+    await asyncio.sleep(0)
+
+    gate.set()
+    assert await reading == 'new'
+    await flushing
+    # The row read before the write is not cached.
+    assert await storage.get('foo', 'a') == 'new'
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_addon() -> None:
+    client = MockClient(AddonPool().load(counter))
+    for i in range(1, 4):
+        await client.post_message('/count')
+        assert (await client.get_message()).plain_text == str(i)
+
+    assert await client.storage.keys('counter') == ['count']
+    await client.storage.close()